@@ -0,0 +1,107 @@
+"""
+Replays one long session twice through the full agent pipeline with the
+offline stub model: first loading every event each turn, then with a
+token-budgeted ContextWindow. Reports, per window of turns, the turn latency
+percentiles and the estimated size of the model requests (tokens of
+contents per model call) for both runs.
+
+Usage: python benchmarks/bench_context.py [turns] [window] [budget tokens] [corpus.jsonl]
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ["LEARNING_MAS_MODEL"] = "stub"
+
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import statistics
+import tempfile
+import time
+from google.adk.runners import Runner
+from manager_agent.agent import manager_agent
+from sharded_session_service import ShardedSessionService
+from context_window import ContextWindow, content_tokens
+from utils import call_agent_async
+from bench_turns import percentile
+
+logging.getLogger("google.adk").setLevel(logging.ERROR)
+
+APP_NAME = "LearningMASBench"
+USER_ID = "bench"
+
+# Estimated tokens of each model request during the current turn
+prompts = []
+
+
+def measure_prompts(agent):
+    def before_model(callback_context, llm_request):
+        prompts.append(sum(content_tokens(c) for c in llm_request.contents))
+
+    seen, stack = set(), [agent]
+    while stack:
+        a = stack.pop()
+        if id(a) in seen:
+            continue
+        seen.add(id(a))
+        callbacks = a.before_model_callback
+        callbacks = list(callbacks) if isinstance(callbacks, list) else [callbacks] if callbacks else []
+        # Last, so the summary added by the context window is counted
+        a.before_model_callback = callbacks + [before_model]
+        stack.extend(a.sub_agents)
+
+
+async def replay(turns: int, window: int, corpus: list, context) -> list:
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        session_service = ShardedSessionService(db_url=f"sqlite:///{tmp}/bench.db", window=context)
+        session = session_service.create_session(
+            app_name=APP_NAME,
+            user_id=USER_ID,
+            state={"user_name": "Bench", "known_topics": [], "interaction_history": []},
+        )
+        runner = Runner(agent=manager_agent, app_name=APP_NAME, session_service=session_service)
+
+        latency, tokens = [], []
+        for n in range(turns):
+            query = corpus[n % len(corpus)].format(n=n, m=max(0, n - 7))
+            prompts.clear()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                await call_agent_async(runner, USER_ID, session.id, query)
+            latency.append((time.perf_counter() - start) * 1000)
+            tokens.extend(prompts)
+
+            if len(latency) == window or n == turns - 1:
+                rows.append((n + 1 - len(latency), n, percentile(latency, 50), percentile(latency, 95),
+                             statistics.fmean(tokens) if tokens else 0.0, max(tokens, default=0)))
+                latency, tokens = [], []
+    return rows
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    window = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    budget = int(sys.argv[3]) if len(sys.argv) > 3 else 1500
+    path = sys.argv[4] if len(sys.argv) > 4 else os.path.join(os.path.dirname(__file__), "turns.jsonl")
+    with open(path) as f:
+        corpus = [json.loads(line)["query"] for line in f if line.strip()]
+
+    measure_prompts(manager_agent)
+    full = asyncio.run(replay(turns, window, corpus, None))
+    context = ContextWindow(budget=budget)
+    context.instrument_agents(manager_agent)
+    budgeted = asyncio.run(replay(turns, window, corpus, context))
+
+    print(f"{'':>11} {'--- all events ---':^35}   {f'--- budget {budget} tokens ---':^35}")
+    print(f"{'turns':>11} {'p50 ms':>8} {'p95 ms':>8} {'avg tok':>8} {'max tok':>8}   "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'avg tok':>8} {'max tok':>8}")
+    for a, b in zip(full, budgeted):
+        print(f"{a[0]:>5}-{a[1]:<5} {a[2]:>8.1f} {a[3]:>8.1f} {a[4]:>8.0f} {a[5]:>8}   "
+              f"{b[2]:>8.1f} {b[3]:>8.1f} {b[4]:>8.0f} {b[5]:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Writes a large synthetic curriculum (prerequisite edges plus known topics,
+tasks and review logs) as JSONL or CSV, imports it into a fresh database
+with `python curriculum.py import`, then re-imports it (nothing new) and
+exports it again. Each step runs in its own process; reports wall time,
+records per second and the process's peak memory next to the file size,
+and the time the command itself reports (without process startup).
+
+Usage: python benchmarks/bench_curriculum.py [edges] [jsonl|csv]
+"""
+import sys
+import os
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+import random
+import resource
+import subprocess
+import tempfile
+import time
+from bench_prereq_graph import synthetic_curriculum
+from curriculum import write_records
+
+
+def records(prereq_map: dict, seed: int = 13):
+    rng = random.Random(seed)
+    topics = list(prereq_map)
+    for topic, required in prereq_map.items():
+        for r in required:
+            yield {"type": "edge", "topic": topic, "requires": r}
+    for topic in topics[:len(topics) // 10]:
+        yield {"type": "known", "topic": topic}
+    for i in range(len(topics) // 20):
+        yield {
+            "type": "task", "task": f"Task {i}", "due": f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-2027",
+            "topic": rng.choice(topics), "effort": rng.choice((0.5, 1, 2, 3)),
+        }
+    for topic in topics[:len(topics) // 10]:
+        for day in sorted(rng.sample(range(1, 29), 5)):
+            yield {"type": "review", "topic": topic, "date": f"2026-09-{day:02d}", "score": rng.randint(0, 5)}
+
+
+def run(label: str, args: list, cwd: str, count: int):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "curriculum.py"), *args],
+        cwd=cwd, capture_output=True, text=True, env={**os.environ, "PYTHONWARNINGS": "ignore"},
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode:
+        raise RuntimeError(result.stdout + result.stderr)
+    # Peak resident memory of the largest child so far (kilobytes on Linux)
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    print(f"{label:<24} {elapsed:>8.2f} s {count / elapsed:>12,.0f}/s {peak:>10.0f} MB")
+    print(f"  {(result.stdout or result.stderr).strip().splitlines()[-1]}")
+
+
+def main():
+    edges = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    fmt = sys.argv[2] if len(sys.argv) > 2 else "jsonl"
+    prereq_map = synthetic_curriculum(edges // 5, edges, window=200)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"curriculum.{fmt}")
+        with open(path, "w", newline="") as out:
+            count = write_records(records(prereq_map), out, fmt)
+        del prereq_map
+        print(f"{count} records, {os.path.getsize(path) / 2**20:.0f} MB {fmt}")
+        empty = os.path.join(tmp, f"empty.{fmt}")
+        with open(empty, "w", newline="") as out:
+            write_records([], out, fmt)
+        print(f"{'':<24} {'time':>10} {'records':>13} {'peak RSS':>13}")
+        # Process startup (ADK imports, opening the session) with nothing to import
+        run("baseline (empty file)", ["import", empty], tmp, 1)
+        run("import", ["import", path], tmp, count)
+        run("re-import (no changes)", ["import", path], tmp, count)
+        run("export", ["export", os.path.join(tmp, f"export.{fmt}")], tmp, count)
+
+
+if __name__ == "__main__":
+    main()
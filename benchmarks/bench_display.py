@@ -0,0 +1,98 @@
+"""
+Times rendering the state after each turn for a learner with many topics:
+the full dump display_state used to print (a fresh get_session and every key
+printed whole) against StateView.show_changes, which prints only what the
+turn changed and reuses the turn's committed values. Reports milliseconds
+and characters printed per turn.
+
+Usage: python benchmarks/bench_display.py [topics] [turns]
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import contextlib
+import io
+import statistics
+import tempfile
+import time
+from sharded_session_service import ShardedSessionService
+from manager_agent.state_schema import Progress, Review, new_session_state, today_ordinal
+from utils import StateView
+from bench_prereq_graph import synthetic_curriculum
+from bench_turns import percentile
+
+APP_NAME = "LearningMASBench"
+USER_ID = "bench"
+
+
+def large_state(topics: int) -> dict:
+    today = today_ordinal()
+    state = new_session_state("Bench")
+    state["prereq_map"] = synthetic_curriculum(topics, topics * 3)
+    names = [f"Topic {i}" for i in range(topics)]
+    state["known_topics"] = names[:topics // 2]
+    state["study_progress"] = {t: Progress(t, i % 100, False).dump() for i, t in enumerate(names[::4])}
+    state["review_schedule"] = {t: Review(t, today, today + i % 30, history=[[today, 4]]).dump() for i, t in enumerate(names[:topics // 2])}
+    return state
+
+
+def full_dump(session_service, session_id):
+    # What display_state printed after every turn before StateView
+    session = session_service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
+    for key, value in session.state.items():
+        print(f"🔑 {key}: {value}")
+
+
+def play_turn(session_service, session_id, n: int):
+    # One tool's worth of changes: a new prerequisite and a progress update
+    session = session_service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
+    turn = session_service.begin_turn(APP_NAME, USER_ID, session_id)
+    turn.append("interaction_history", {"action": "user_query", "query": f"turn {n}"})
+    prereqs = session.state["prereq_map"]
+    prereqs.setdefault(f"New Topic {n}", []).append("Topic 0")
+    turn.set("prereq_map", prereqs)
+    progress = session.state["study_progress"]
+    progress[f"New Topic {n}"] = Progress(f"New Topic {n}", 30, False).dump()
+    turn.set("study_progress", progress)
+    session_service.commit_turn(turn)
+    return turn
+
+
+def measure(render, turns: int, session_service, session_id) -> tuple:
+    times, sizes = [], []
+    for n in range(turns):
+        turn = play_turn(session_service, session_id, n)
+        out = io.StringIO()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(out):
+            render(turn)
+        times.append((time.perf_counter() - start) * 1000)
+        sizes.append(len(out.getvalue()))
+    return percentile(times, 50), percentile(times, 95), statistics.fmean(sizes)
+
+
+def main():
+    topics = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with tempfile.TemporaryDirectory() as tmp:
+        session_service = ShardedSessionService(db_url=f"sqlite:///{tmp}/bench.db")
+        session = session_service.create_session(app_name=APP_NAME, user_id=USER_ID, state=large_state(topics))
+        print(f"{topics} topics, {turns} turns")
+        print(f"{'':<24} {'p50 ms':>8} {'p95 ms':>8} {'chars':>10}")
+
+        full = measure(lambda turn: full_dump(session_service, session.id), turns, session_service, session.id)
+        print(f"{'full dump':<24} {full[0]:>8.1f} {full[1]:>8.1f} {full[2]:>10.0f}")
+
+        view = StateView()
+        with contextlib.redirect_stdout(io.StringIO()):
+            view.show(session_service, APP_NAME, USER_ID, session.id)
+        changes = measure(
+            lambda turn: view.show_changes(session_service, APP_NAME, USER_ID, session.id, turn),
+            turns, session_service, session.id,
+        )
+        print(f"{'changes only':<24} {changes[0]:>8.1f} {changes[1]:>8.1f} {changes[2]:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
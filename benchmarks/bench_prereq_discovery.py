@@ -0,0 +1,110 @@
+"""
+Compares prerequisite discovery for a syllabus one topic per tool call
+(auto_update_prereqs) with the batch tool (auto_update_prereqs_many), using
+a local fake of the search tool that answers from a synthetic curriculum
+after a fixed delay. Reports wall time, searches made, the most searches in
+flight at once, prerequisites added and prereq_map writes.
+
+Usage: python benchmarks/bench_prereq_discovery.py [topics] [search latency ms] [max depth]
+"""
+import sys
+import os
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# Keep the search cache of the runs out of the working directory
+os.environ.setdefault("LEARNING_MAS_SEARCH_CACHE", os.path.join(tempfile.mkdtemp(), "search_cache.db"))
+
+import asyncio
+import re
+import time
+from manager_agent.sub_agents.dependency_agent.agent import auto_update_prereqs, auto_update_prereqs_many
+from manager_agent.sub_agents.search_agent import agent as search_agent
+from bench_prereq_graph import synthetic_curriculum
+
+QUERY = re.compile(r"What are the prerequisites to learn (?P<topic>.+)\?")
+
+
+class FakeState(dict):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def __setitem__(self, key, value):
+        if key == "prereq_map":
+            self.writes += 1
+        super().__setitem__(key, value)
+
+
+class FakeSearch:
+    """
+    Stands in for search_agent.run_search: answers with the topic's
+    prerequisites in the curriculum, as a search summary would.
+    """
+
+    def __init__(self, curriculum: dict, latency: float):
+        self.curriculum = curriculum
+        self.latency = latency
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+
+    async def __call__(self, query: str) -> str:
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            topic = QUERY.fullmatch(query)["topic"]
+            lines = [f"Prerequisites for {topic}:"] + [f"- {p}" for p in self.curriculum.get(topic, [])]
+            return "\n".join(lines)
+        finally:
+            self.in_flight -= 1
+
+
+class FakeToolContext:
+    def __init__(self):
+        self.state = FakeState()
+
+
+def prefixed(curriculum: dict, prefix: str) -> dict:
+    # Fresh topic names per run, so no run is answered from another's cache
+    return {f"{prefix} {t}": [f"{prefix} {p}" for p in ps] for t, ps in curriculum.items()}
+
+
+async def sequential(topics: list, context: FakeToolContext):
+    for topic in topics:
+        await auto_update_prereqs(topic, context)
+
+
+def run(label: str, curriculum: dict, latency: float, fn):
+    search = search_agent.run_search = FakeSearch(curriculum, latency)
+    context = FakeToolContext()
+    start = time.perf_counter()
+    asyncio.run(fn(context))
+    elapsed = time.perf_counter() - start
+    added = sum(len(v) for v in context.state.get("prereq_map", {}).values())
+    print(f"{label:<28} {elapsed:>8.2f} s {search.calls:>9} {search.peak:>9} {added:>7} {context.state.writes:>7}")
+
+
+def main():
+    topics = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+    depth = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    base = synthetic_curriculum(topics, topics * 2, window=20)
+    # The syllabus: the later half of the topics, whose prerequisites lead back to the rest
+    syllabus = [f"Topic {i}" for i in range(topics // 2, topics)]
+    print(f"{len(syllabus)} syllabus topics, {latency * 1000:.0f} ms per search")
+    print(f"{'':<28} {'time':>10} {'searches':>9} {'parallel':>9} {'added':>7} {'writes':>7}")
+
+    c = prefixed(base, "seq")
+    run("one topic per call", c, latency, lambda ctx: sequential([f"seq {t}" for t in syllabus], ctx))
+    c = prefixed(base, "many0")
+    run("batch, depth 0", c, latency,
+        lambda ctx: auto_update_prereqs_many([f"many0 {t}" for t in syllabus], ctx, max_depth=0))
+    c = prefixed(base, "many")
+    run(f"batch, depth {depth}", c, latency,
+        lambda ctx: auto_update_prereqs_many([f"many {t}" for t in syllabus], ctx, max_depth=depth))
+
+
+if __name__ == "__main__":
+    main()
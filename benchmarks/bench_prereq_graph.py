@@ -0,0 +1,90 @@
+"""
+Builds a large synthetic curriculum and times the prerequisite index.
+
+Usage: python benchmarks/bench_prereq_graph.py [topics] [edges]
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import random
+import time
+from manager_agent.sub_agents.dependency_agent.prereq_index import PrereqIndex
+
+
+def synthetic_curriculum(topics: int, edges: int, window: int = 50, seed: int = 7) -> dict:
+    # Prerequisites are drawn from nearby earlier topics, like chapters of a course
+    rng = random.Random(seed)
+    names = [f"Topic {i}" for i in range(topics)]
+    prereq_map = {}
+    for _ in range(edges):
+        v = rng.randrange(1, topics)
+        u = rng.randrange(max(0, v - window), v)
+        prereq_map.setdefault(names[v], [])
+        if names[u] not in prereq_map[names[v]]:
+            prereq_map[names[v]].append(names[u])
+    return prereq_map
+
+
+def scan_suggestions(prereq_map: dict, known: set) -> list:
+    # The full rescan suggest_next_topics used before the frontier index
+    suggestions = []
+    for topic, required in prereq_map.items():
+        if topic not in known and set(required).issubset(known):
+            suggestions.append(topic)
+    return suggestions
+
+
+def timed(label, fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    print(f"{label:<32} {(time.perf_counter() - start) * 1000 / repeat:>10.3f} ms")
+    return result
+
+
+def main():
+    topics = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    edges = int(sys.argv[2]) if len(sys.argv) > 2 else 500_000
+    rng = random.Random(11)
+    prereq_map = synthetic_curriculum(topics, edges)
+    names = list(prereq_map)
+    known = rng.sample(names, len(names) // 2)
+    print(f"{topics} topics, {sum(map(len, prereq_map.values()))} edges")
+
+    index = timed("build index", lambda: PrereqIndex(prereq_map))
+    index.sync_known(known)
+    timed("can_learn (missing set)", lambda: index.missing(rng.choice(names)), repeat=200)
+    timed("learned", lambda: index.learn(rng.choice(names)), repeat=1000)
+    known = list(index.known_names)
+
+    timed("suggest_next_topics (scan)", lambda: scan_suggestions(prereq_map, set(known)), repeat=5)
+    timed("suggest_next_topics (frontier)", lambda: index.suggest(), repeat=50)
+    timed("suggest_next_topics (ranked)", lambda: index.suggest(rank=True), repeat=50)
+    timed("learned + suggest (frontier)", lambda: (index.learn(rng.choice(names)), index.suggest()), repeat=50)
+
+    def add_edge():
+        v = rng.randrange(1, topics)
+        index.add_edge(f"Topic {v}", f"Topic {rng.randrange(max(0, v - 50), v)}")
+    timed("add_prerequisite", add_edge, repeat=200)
+
+    def remove_edge():
+        topic = rng.choice(names)
+        index.remove_edge(topic, prereq_map[topic][0])
+    timed("remove_prerequisite", remove_edge, repeat=20)
+
+    def first_path():
+        index.paths.clear()
+        return index.learning_path(rng.choice(names))
+    timed("plan_learning_path (first query)", first_path, repeat=50)
+    target = max((n for n in names if n not in index.known_names), key=lambda n: index.ids[n])
+    path = index.learning_path(target)
+    print(f"  {len(path)} steps to {target}")
+    timed("plan_learning_path (memoized)", lambda: index.learning_path(target), repeat=1000)
+    hours = {name: rng.choice((0.5, 1.0, 2.0)) for name in names}
+    timed("plan_learning_path (by hours left)", lambda: index.learning_path(target, lambda n: hours.get(n, 1.0)), repeat=50)
+    timed("learned + plan_learning_path", lambda: (index.learn(rng.choice(path)), index.learning_path(target)), repeat=20)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Simulates review histories of many learners, each with their own true
+starting easiness and first two intervals, reviewing on an SM-2 schedule a
+bit early or late. Recall follows the model review_fit assumes. Times fitting
+per user and per topic, and reports how close the per-user fit gets to
+the true parameters.
+
+Usage: python benchmarks/bench_review_fit.py [users] [topics_per_user] [reviews_per_topic]
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from bench_prereq_graph import timed
+from manager_agent.sub_agents.spaced_repetition_agent.review_fit import TARGET_RECALL, fit_review_params
+from manager_agent.sub_agents.spaced_repetition_agent.sm2 import (
+    MIN_EASINESS, NEW_EASINESS, NEW_INTERVAL, NEW_REPETITION, sm2_batch,
+)
+
+
+def simulate(users: int, topics: int, reviews: int, seed: int = 3) -> tuple:
+    # One history per (user, topic), all advanced a review round at a time
+    rng = np.random.default_rng(seed)
+    true = np.stack([rng.uniform(1.5, 3.2, users), rng.uniform(1, 4, users), rng.uniform(3, 12, users)])
+    user = np.repeat(np.arange(users), topics)
+    n = user.size
+    e_true, first, second = true[:, user]
+
+    repetition = np.full(n, NEW_REPETITION)
+    interval = np.full(n, NEW_INTERVAL)
+    easiness = np.full(n, NEW_EASINESS)
+    stability = np.ones(n)
+    day = 700_000 + rng.integers(0, 30, n)
+    days, scores = np.empty((reviews, n), dtype=np.int64), np.empty((reviews, n), dtype=np.int64)
+    for r in range(reviews):
+        if r:
+            day = day + np.maximum(1, np.rint(interval * rng.lognormal(0, 0.5, n))).astype(np.int64)
+            recalled = rng.random(n) < TARGET_RECALL ** ((day - days[r - 1]) / stability)
+        else:
+            recalled = rng.random(n) < 0.8
+        score = np.where(recalled, rng.integers(3, 6, n), rng.integers(0, 3, n))
+        days[r], scores[r] = day, score
+
+        # The true memory: SM-2's rules with the learner's own parameters
+        passed = score >= 3
+        new_repetition = np.where(passed, repetition + 1, 0)
+        stability = np.where(
+            new_repetition <= 1, first, np.where(new_repetition == 2, second, stability * e_true)
+        )
+        lapse = 5 - score
+        e_true = np.where(passed, np.maximum(MIN_EASINESS, e_true + 0.1 - lapse * (0.08 + lapse * 0.02)), e_true)
+        # The schedule actually followed: plain SM-2
+        repetition, interval, easiness = sm2_batch(repetition, interval, easiness, score)
+    lengths = np.full(n, reviews)
+    return true, user, lengths, days.T.ravel(), scores.T.ravel()
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    topics = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    reviews = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    true, user, lengths, days, scores = timed(
+        "simulate", lambda: simulate(users, topics, reviews)
+    )
+    print(f"{days.size:,} reviews: {users} users x {topics} topics x {reviews} reviews")
+
+    easiness, first, second, counts = timed(
+        "fit per user", lambda: fit_review_params(lengths, days, scores, user)
+    )
+    topic = np.tile(np.arange(topics), users)
+    timed("fit per topic", lambda: fit_review_params(lengths, days, scores, topic))
+    timed("fit all (one group)", lambda: fit_review_params(lengths, days, scores))
+
+    print(f"{'per-user fit':<20} {'true median':>12} {'median |error|':>16}")
+    for label, fitted, actual in zip(("start easiness", "first interval", "second interval"), (easiness, first, second), true):
+        print(f"{label:<20} {np.median(actual):>12.2f} {np.median(np.abs(fitted - actual)):>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Times the capacity-aware study planner on a year of synthetic tasks, some of
+them tied to topics of a synthetic curriculum.
+
+Usage: python benchmarks/bench_scheduler.py [tasks] [hours_per_day]
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import random
+from datetime import date
+from bench_prereq_graph import synthetic_curriculum, timed
+from manager_agent.state_schema import Task
+from manager_agent.sub_agents.dependency_agent.prereq_index import PrereqIndex
+from manager_agent.sub_agents.academic_planning_agent.scheduler import plan_tasks
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    hours_per_day = float(sys.argv[2]) if len(sys.argv) > 2 else 48.0
+    rng = random.Random(5)
+    today = date.today().toordinal()
+    prereq_map = synthetic_curriculum(5_000, 20_000)
+    index = PrereqIndex(prereq_map)
+    topics = index.topological_order()
+    tasks = []
+    for i in range(count):
+        effort = rng.choice((0.5, 1.0, 1.5, 2.0, 3.0))
+        if rng.random() < 0.5:
+            # Topic tasks fall due roughly in curriculum order
+            k = rng.randrange(len(topics))
+            due = today + min(365, 1 + k * 365 // len(topics) + rng.randrange(30))
+            tasks.append(Task(f"Task {i}", due, today, effort, topics[k]))
+        else:
+            tasks.append(Task(f"Task {i}", today + rng.randrange(1, 366), today, effort))
+    print(f"{count} tasks over a year, {sum(t.effort for t in tasks):.0f}h of work, {hours_per_day:g}h per day")
+
+    timed("plan (no prerequisites)", lambda: plan_tasks(tasks, today, hours_per_day), repeat=5)
+    days, planned = timed("plan (with prerequisites)", lambda: plan_tasks(tasks, today, hours_per_day, index=index), repeat=5)
+    late = sum(t.late for t in planned)
+    print(f"{len(days)} study days, {late} late tasks, last finish in {max(t.finish for t in planned) - today} days")
+
+
+if __name__ == "__main__":
+    main()
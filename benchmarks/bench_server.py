@@ -0,0 +1,115 @@
+"""
+Load generator for server.py. Starts the server with the offline stub model
+on a fresh database, then runs 1, 10 and 100 concurrent users; each user
+sends the turns corpus over HTTP one message after another. Reports
+throughput, latency percentiles and how many requests were refused (429)
+and retried.
+
+Usage: python benchmarks/bench_server.py [messages per user] [users,users,...] [corpus.jsonl]
+Set LEARNING_MAS_STUB_LATENCY_MS to simulate model latency; the server's
+LEARNING_MAS_MAX_* limits are passed through.
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import json
+import socket
+import statistics
+import subprocess
+import tempfile
+import time
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: list, p: int) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1] if len(values) > 1 else values[0]
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def learner(client, user_id: str, messages: int, corpus: list, latencies: list, refused: list):
+    for n in range(messages):
+        query = corpus[n % len(corpus)].format(n=n, m=max(0, n - 7))
+        start = time.perf_counter()
+        while True:
+            response = await client.post(f"/users/{user_id}/messages", json={"message": query})
+            if response.status_code != 429:
+                response.raise_for_status()
+                break
+            refused.append(1)
+            await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run_level(client, users: int, messages: int, corpus: list, level: int):
+    latencies, refused = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        learner(client, f"load-{level}-{u}", messages, corpus, latencies, refused) for u in range(users)
+    ))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{users:>6} {len(latencies):>9} {len(latencies) / elapsed:>10.1f} {percentile(latencies, 50):>8.1f} "
+        f"{percentile(latencies, 95):>8.1f} {percentile(latencies, 99):>8.1f} {len(refused):>8}"
+    )
+
+
+async def load(port: int, messages: int, levels: list, corpus: list):
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=300, limits=limits) as client:
+        await wait_ready(client)
+        print(f"{'users':>6} {'requests':>9} {'req/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'refused':>8}")
+        for level, users in enumerate(levels):
+            await run_level(client, users, messages, corpus, level)
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    levels = [int(u) for u in sys.argv[2].split(",")] if len(sys.argv) > 2 else [1, 10, 100]
+    path = sys.argv[3] if len(sys.argv) > 3 else os.path.join(os.path.dirname(__file__), "turns.jsonl")
+    with open(path) as f:
+        corpus = [json.loads(line)["query"] for line in f if line.strip()]
+
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "LEARNING_MAS_MODEL": "stub"}
+        # ADK logs a warning per model request; keep the server's output in a file
+        log_path = os.path.join(tmp, "server.log")
+        with open(log_path, "w") as log:
+            server = subprocess.Popen(
+                [sys.executable, os.path.join(ROOT, "server.py"), "--port", str(port), "--db", f"sqlite:///{tmp}/bench.db"],
+                cwd=tmp, env=env, stdout=log, stderr=subprocess.STDOUT,
+            )
+            try:
+                asyncio.run(load(port, messages, levels, corpus))
+            except Exception:
+                with open(log_path) as f:
+                    print(f.read()[-2000:])
+                raise
+            finally:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Times CLI startup: main.py is run in a fresh process (stub model, empty
+database in a temporary directory) and timed until it prints the first
+"You: " prompt, then until the answer to a first "state" command, which
+waits for the background warm-up. For comparison it times importing the
+state schema alone and building the whole agent graph, which main.py used
+to do before printing anything.
+
+Usage: python benchmarks/bench_startup.py [runs]
+"""
+import sys
+import os
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+import select
+import statistics
+import subprocess
+import tempfile
+import time
+
+ENV = {**os.environ, "LEARNING_MAS_MODEL": "stub", "PYTHONUNBUFFERED": "1", "PYTHONWARNINGS": "ignore"}
+
+
+def read_until(proc, marker: bytes, timeout: float = 120) -> bytes:
+    out = b""
+    deadline = time.monotonic() + timeout
+    while marker not in out:
+        ready, _, _ = select.select([proc.stdout], [], [], deadline - time.monotonic())
+        chunk = os.read(proc.stdout.fileno(), 65536) if ready else b""
+        if not chunk:
+            raise RuntimeError(f"main.py stopped before printing {marker!r}:\n{out.decode(errors='replace')}")
+        out += chunk
+    return out
+
+
+def cli_startup() -> tuple:
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "main.py")],
+            cwd=tmp, env=ENV, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+        try:
+            read_until(proc, b"You: ")
+            prompt = time.perf_counter() - start
+            proc.stdin.write(b"state\n")
+            proc.stdin.flush()
+            read_until(proc, b"You: ")
+            ready = time.perf_counter() - start
+            proc.stdin.write(b"exit\n")
+            proc.stdin.flush()
+            proc.wait(timeout=30)
+        finally:
+            proc.kill()
+        return prompt, ready
+
+
+def import_time(code: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=ENV, check=True, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def report(label: str, times: list):
+    print(f"{label:<36} {statistics.median(times):>8.2f} s {max(times):>8.2f} s")
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f"{runs} runs")
+    print(f"{'':<36} {'p50':>10} {'max':>10}")
+    timings = [cli_startup() for _ in range(runs)]
+    report("main.py: first prompt", [t[0] for t in timings])
+    report("main.py: first command answered", [t[1] for t in timings])
+    report("import state_schema", [import_time("import manager_agent.state_schema") for _ in range(runs)])
+    report("build agent graph", [
+        import_time("from manager_agent.agent import get_manager_agent; get_manager_agent()") for _ in range(runs)
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Compares the version 1 state layout (lists of dicts with date strings) with
+the version 2 layout (topic-keyed maps with day ordinals): serialized size,
+memory after json.loads, and the time of typical tool reads.
+
+Usage: python benchmarks/bench_state_schema.py [records]
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import copy
+import json
+import random
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from manager_agent.state_schema import ensure_schema, task_key
+
+
+def v1_state(records: int, seed: int = 3) -> dict:
+    rng = random.Random(seed)
+    today = date.today()
+    day = lambda: today + timedelta(days=rng.randrange(-60, 60))
+    return {
+        "learning_tasks": [
+            {"task": f"Task {i}", "due_date": day().strftime("%d-%m-%Y"), "created_at": day().strftime("%d-%m-%Y")}
+            for i in range(records)
+        ],
+        "study_progress": [
+            {"topic": f"Topic {i}", "percent": rng.randrange(101), "completed": False}
+            for i in range(records)
+        ],
+        "review_schedule": [
+            {
+                "topic": f"Topic {i}",
+                "last_reviewed": str(day()),
+                "next_review_due": str(day()),
+                "interval": rng.randrange(1, 60),
+                "repetition": rng.randrange(5),
+                "easiness": 2.5,
+                "history": [{"date": str(day()), "score": rng.randrange(6)} for _ in range(5)],
+            }
+            for i in range(records)
+        ],
+    }
+
+
+def loaded_size(text: str) -> tuple[int, float]:
+    # Peak memory of the parsed state, and the parse time (timed without tracing)
+    tracemalloc.start()
+    json.loads(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        json.loads(text)
+        best = min(best, time.perf_counter() - start)
+    return peak, best
+
+
+def timed(label, fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    print(f"{label:<36} {(time.perf_counter() - start) * 1000 / repeat:>10.3f} ms")
+    return result
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    old = v1_state(records)
+    new = copy.deepcopy(old)
+    timed("migrate v1 → v2", lambda: ensure_schema(new))
+    new.pop("review_due_heap")
+    print(f"{records} tasks, progress entries and reviews")
+
+    old_text, new_text = json.dumps(old), json.dumps(new)
+    old_mem, old_parse = loaded_size(old_text)
+    new_mem, new_parse = loaded_size(new_text)
+    print(f"{'serialized size (v1 / v2)':<36} {len(old_text) / 1e6:>7.2f} / {len(new_text) / 1e6:.2f} MB")
+    print(f"{'parsed memory (v1 / v2)':<36} {old_mem / 1e6:>7.2f} / {new_mem / 1e6:.2f} MB")
+    print(f"{'json.loads (v1 / v2)':<36} {old_parse * 1000:>7.1f} / {new_parse * 1000:.1f} ms")
+
+    today = date.today()
+    timed("list_tasks sort (v1, strptime)", lambda: sorted(
+        old["learning_tasks"], key=lambda t: datetime.strptime(t["due_date"], "%d-%m-%Y")
+    ), repeat=5)
+    timed("list_tasks sort (v2, ordinals)", lambda: sorted(
+        new["learning_tasks"].values(), key=lambda t: t["due"]
+    ), repeat=5)
+    timed("due reviews scan (v1, strptime)", lambda: [
+        e["topic"] for e in old["review_schedule"]
+        if datetime.strptime(e["next_review_due"], "%Y-%m-%d").date() <= today
+    ], repeat=5)
+    timed("due reviews scan (v2, ordinals)", lambda: [
+        t for t, e in new["review_schedule"].items() if e["due"] <= today.toordinal()
+    ], repeat=5)
+
+    name = f"Task {records // 2}"
+    timed("task lookup (v1, list scan)", lambda: any(
+        t["task"].lower() == name.lower() for t in old["learning_tasks"]
+    ), repeat=100)
+    timed("task lookup (v2, map)", lambda: task_key(name) in new["learning_tasks"], repeat=100)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Measures interaction_history write latency as the history grows.
+
+Usage: python benchmarks/bench_state_writes.py [max_entries]
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import tempfile
+import time
+from sharded_session_service import ShardedSessionService
+from state_store import get_state_store
+
+APP_NAME = "LearningMASBench"
+USER_ID = "bench"
+
+
+def main():
+    max_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    checkpoints = [n for n in (1_000, 10_000, 25_000, 50_000, 100_000) if n <= max_entries]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        session_service = ShardedSessionService(db_url=f"sqlite:///{tmp}/bench.db")
+        session = session_service.create_session(
+            app_name=APP_NAME, user_id=USER_ID, state={"interaction_history": []}
+        )
+        store = get_state_store(session_service)
+
+        print(f"{'history size':>14} | {'mean append (ms)':>16} | {'p99 append (ms)':>15}")
+        written = 0
+        for checkpoint in checkpoints:
+            samples = []
+            while written < checkpoint:
+                entry = {"action": "user_query", "query": f"question number {written}"}
+                start = time.perf_counter()
+                store.append(APP_NAME, USER_ID, session.id, "interaction_history", entry)
+                samples.append((time.perf_counter() - start) * 1000)
+                written += 1
+            samples.sort()
+            mean = sum(samples) / len(samples)
+            p99 = samples[int(len(samples) * 0.99) - 1]
+            print(f"{checkpoint:>14} | {mean:>16.3f} | {p99:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Builds a topic registry over many synthetic topic names and times lookups
+by exact name, alias and case/plural variant, suggestions for typos (which
+never resolve on their own) and for unknown names, then the duplicate-merge migration of a state
+whose topics are spelled inconsistently.
+
+Usage: python benchmarks/bench_topics.py [topics]
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import random
+from manager_agent.topic_registry import TopicRegistry
+from manager_agent.state_schema import ensure_schema
+from bench_prereq_graph import timed
+
+WORDS = (
+    "graph tree heap hash table linked list queue stack sort search dynamic programming greedy "
+    "recursion probability statistics calculus algebra geometry network flow matching string "
+    "automata compiler parsing memory cache thread process scheduling database index query "
+    "transaction optimization regression classification clustering neural vision language"
+).split()
+
+
+
+
+def pseudo_word(rng: random.Random) -> str:
+    # Alternating consonant and vowel clusters, so the trigrams vary like real words'
+    clusters = ("bcdfghklmnprstvwz", "aeiouy")
+    return "".join(rng.choice(clusters[i % 2]) * rng.choice((1, 1, 1, 2)) for i in range(rng.randint(4, 9)))
+
+
+def synthetic_topics(count: int, seed: int = 3) -> list[str]:
+    # Names from a vocabulary the size of a large course catalogue's
+    rng = random.Random(seed)
+    vocabulary = WORDS + [pseudo_word(rng) for _ in range(count // 20)]
+    names = set()
+    while len(names) < count:
+        words = [w.capitalize() for w in rng.sample(vocabulary, rng.randint(2, 4))]
+        if rng.random() < 0.3:
+            words.append(str(rng.randint(1, 4)))
+        names.add(" ".join(words))
+    return sorted(names)
+
+
+def typo(name: str, rng: random.Random) -> str:
+    # Drop one letter from the longest word
+    words = name.split()
+    i = max(range(len(words)), key=lambda j: len(words[j]))
+    k = rng.randrange(1, len(words[i]))
+    words[i] = words[i][:k] + words[i][k + 1:]
+    return " ".join(words)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(5)
+    topics = synthetic_topics(count)
+    print(f"{len(topics)} topics")
+
+    registry = timed("build registry", lambda: TopicRegistry(topics))
+    timed("build trigram index", lambda: registry.similar("warmup indexing"))
+    aliased = rng.sample(topics, 1000)
+    for name in aliased:
+        registry.add_alias(f"Alias of {name}", name)
+    # Other spellings: lower case, with the last word pluralized
+    variants = [t.lower() + "s" for t in topics if t[-1] not in "0123456789iusy"]
+
+    timed("lookup (exact)", lambda: registry.lookup(rng.choice(topics)), repeat=10_000)
+    timed("lookup (alias)", lambda: registry.lookup(f"alias of {rng.choice(aliased)}"), repeat=10_000)
+    timed("lookup (case/plural)", lambda: registry.lookup(rng.choice(variants)), repeat=10_000)
+
+    typo_sources = [rng.choice(topics) for _ in range(2000)]
+    typos = [typo(t, rng) for t in typo_sources]
+    truth = dict(zip(typos, typo_sources))
+    suggested = sum(truth[t] in registry.similar(t) for t in typos)
+    timed("similar (typo)", lambda: registry.similar(rng.choice(typos)), repeat=2000)
+    print(f"  {suggested / len(typos):.0%} of typos suggest the intended topic")
+    unknown = [f"{rng.choice(WORDS)} {rng.choice(WORDS)} theory" for _ in range(500)]
+    timed("lookup (unknown)", lambda: registry.lookup(rng.choice(unknown)), repeat=2000)
+    timed("similar (suggestions)", lambda: registry.similar(rng.choice(unknown)), repeat=500)
+
+    # A schema 2 state where a tenth of the topics appear under two spellings
+    sample = topics[:count // 10]
+    state = {
+        "schema_version": 2,
+        "known_topics": sample + [t.lower() for t in sample[::2]],
+        "prereq_map": {t: [sample[i - 1]] for i, t in enumerate(sample) if i}
+        | {t.upper(): [sample[0].lower()] for t in sample[1::2]},
+        "study_progress": {t: {"topic": t, "percent": 50, "completed": False} for t in sample},
+    }
+    timed("merge duplicate topics", lambda: ensure_schema(state))
+    print(f"  {len(state['known_topics'])} known topics, {len(state['prereq_map'])} prereq_map entries left")
+
+
+if __name__ == "__main__":
+    main()
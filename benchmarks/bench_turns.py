@@ -0,0 +1,117 @@
+"""
+Replays a JSONL corpus of user turns through the full agent pipeline
+(Runner → manager_agent → sub-agent → tool → session store) with the offline
+stub model, and reports turn latency percentiles, session-store time and
+tool time per window of turns as history and state grow.
+
+Each corpus line is {"query": "..."}; {n} and {m} in a query are replaced by
+the turn number and a nearby earlier one, so the state keeps growing.
+
+Usage: python benchmarks/bench_turns.py [turns] [window] [corpus.jsonl]
+Set LEARNING_MAS_STUB_LATENCY_MS to simulate model latency.
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ["LEARNING_MAS_MODEL"] = "stub"
+
+import asyncio
+import contextlib
+import functools
+import io
+import json
+import logging
+import statistics
+import tempfile
+import time
+from google.adk.runners import Runner
+from google.adk.tools.function_tool import FunctionTool
+from manager_agent.agent import manager_agent
+from sharded_session_service import ShardedSessionService
+from utils import call_agent_async
+
+# ADK warns about tool parameter defaults on every model request
+logging.getLogger("google.adk").setLevel(logging.ERROR)
+
+APP_NAME = "LearningMASBench"
+USER_ID = "bench"
+
+# Seconds spent in each instrumented layer during the current turn
+spent = {"store": 0.0, "tool": 0.0}
+
+
+def timed_store(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            spent["store"] += time.perf_counter() - start
+    return wrapper
+
+
+def instrument(session_service):
+    for name in ("create_session", "get_session", "list_sessions", "append_event", "commit_turn"):
+        setattr(session_service, name, timed_store(getattr(session_service, name)))
+
+    run_async = FunctionTool.run_async
+
+    async def timed_tool(self, *, args, tool_context):
+        start = time.perf_counter()
+        try:
+            return await run_async(self, args=args, tool_context=tool_context)
+        finally:
+            spent["tool"] += time.perf_counter() - start
+    FunctionTool.run_async = timed_tool
+
+
+def percentile(values: list, p: int) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1] if len(values) > 1 else values[0]
+
+
+async def replay(turns: int, window: int, corpus: list):
+    with tempfile.TemporaryDirectory() as tmp:
+        session_service = ShardedSessionService(db_url=f"sqlite:///{tmp}/bench.db")
+        instrument(session_service)
+        session = session_service.create_session(
+            app_name=APP_NAME,
+            user_id=USER_ID,
+            state={"user_name": "Bench", "known_topics": [], "interaction_history": []},
+        )
+        runner = Runner(agent=manager_agent, app_name=APP_NAME, session_service=session_service)
+
+        print(f"{'turns':>11} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'store ms':>9} {'tool ms':>8} {'events':>7}")
+        rows = []
+        for n in range(turns):
+            query = corpus[n % len(corpus)].format(n=n, m=max(0, n - 7))
+            spent["store"] = spent["tool"] = 0.0
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                await call_agent_async(runner, USER_ID, session.id, query)
+            rows.append(((time.perf_counter() - start) * 1000, spent["store"] * 1000, spent["tool"] * 1000))
+
+            if len(rows) == window or n == turns - 1:
+                latency = [r[0] for r in rows]
+                events = len(session_service.get_session(
+                    app_name=APP_NAME, user_id=USER_ID, session_id=session.id
+                ).events)
+                print(
+                    f"{n + 1 - len(rows):>5}-{n:<5} {percentile(latency, 50):>8.1f} {percentile(latency, 95):>8.1f} "
+                    f"{percentile(latency, 99):>8.1f} {statistics.fmean(r[1] for r in rows):>9.1f} "
+                    f"{statistics.fmean(r[2] for r in rows):>8.1f} {events:>7}"
+                )
+                rows = []
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    window = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    path = sys.argv[3] if len(sys.argv) > 3 else os.path.join(os.path.dirname(__file__), "turns.jsonl")
+    with open(path) as f:
+        corpus = [json.loads(line)["query"] for line in f if line.strip()]
+    asyncio.run(replay(turns, window, corpus))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Multi-process stress test for concurrent writes to one session.
+
+Several worker processes share one SQLite session and, in every iteration,
+read the state and commit a turn that appends an interaction_history entry,
+a review score for one of a few shared topics, a known topic and a task,
+then update study progress through utils.update_study_progress. Afterwards
+it checks that every worker's entries survived, and reports how many writes
+had to be merged.
+
+Usage: python benchmarks/stress_state.py [processes] [iterations]
+Exits with status 1 if any entry was lost.
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import contextlib
+import io
+import multiprocessing
+import tempfile
+import time
+from sharded_session_service import ShardedSessionService
+from state_store import get_state_store
+from manager_agent.state_schema import Review, Task, new_session_state, today_ordinal
+from utils import update_study_progress
+
+APP_NAME = "LearningMASStress"
+USER_ID = "stress"
+
+# Topics every worker reviews, so their review histories collide
+SHARED_TOPICS = ("Graphs", "Trees", "Heaps")
+
+
+def review_day(worker: int, i: int, iterations: int) -> int:
+    # A distinct day per write, so every review entry can be told apart
+    return today_ordinal() + worker * iterations + i
+
+
+def worker(db_url, session_id, w, iterations, barrier, results):
+    session_service = ShardedSessionService(db_url=db_url)
+    barrier.wait()
+    start = time.perf_counter()
+    try:
+        run_iterations(session_service, session_id, w, iterations)
+    except Exception as e:
+        results.put((w, None, repr(e)))
+        return
+    results.put((w, time.perf_counter() - start, get_state_store(session_service).io_counter.conflicts))
+
+
+def run_iterations(session_service, session_id, w, iterations):
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(iterations):
+            name = f"w{w}-{i}"
+            session = session_service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
+            state = session.state
+            turn = session_service.begin_turn(APP_NAME, USER_ID, session_id)
+            turn.append("interaction_history", {"action": "user_query", "query": name})
+
+            schedule = state.get("review_schedule", {})
+            topic = SHARED_TOPICS[i % len(SHARED_TOPICS)]
+            day = review_day(w, i, iterations)
+            entry = Review.load(schedule[topic]) if topic in schedule else Review(topic, day, day + 1)
+            entry.history.append([day, 4])
+            entry.last, entry.due = day, day + 1
+            schedule[topic] = entry.dump()
+            turn.set("review_schedule", schedule)
+
+            turn.set("known_topics", state.get("known_topics", []) + [name])
+            tasks = state.get("learning_tasks", {})
+            tasks[name] = Task(name, day, day).dump()
+            turn.set("learning_tasks", tasks)
+            session_service.commit_turn(turn)
+
+            update_study_progress(session_service, APP_NAME, USER_ID, session_id, name, 50)
+
+
+def check(session_service, session_id, processes, iterations) -> list:
+    store = get_state_store(session_service)
+    session = session_service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
+    names = {f"w{w}-{i}" for w in range(processes) for i in range(iterations)}
+    days = {review_day(w, i, iterations) for w in range(processes) for i in range(iterations)}
+
+    history = store.page(APP_NAME, USER_ID, session_id, "interaction_history", 0, len(names) + 10)["entries"]
+    reviewed = [h[0] for entry in session.state["review_schedule"].values() for h in entry["history"]]
+    found = {
+        "interaction_history": {e["query"] for e in history},
+        "review history": set(reviewed),
+        "known_topics": set(session.state["known_topics"]),
+        "learning_tasks": set(session.state["learning_tasks"]),
+        "study_progress": set(session.state["study_progress"]),
+    }
+    problems = []
+    for key, values in found.items():
+        expected = days if key == "review history" else names
+        if values != expected:
+            problems.append(f"{key}: {len(expected - values)} lost of {len(expected)}")
+    if len(reviewed) != len(days):
+        problems.append(f"review history: {len(reviewed) - len(days)} duplicated")
+    return problems
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    ctx = multiprocessing.get_context("spawn")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite:///{tmp}/stress.db"
+        session_service = ShardedSessionService(db_url=db_url)
+        session = session_service.create_session(
+            app_name=APP_NAME, user_id=USER_ID, state=new_session_state("Stress")
+        )
+
+        barrier, results = ctx.Barrier(processes), ctx.Queue()
+        workers = [
+            ctx.Process(target=worker, args=(db_url, session.id, w, iterations, barrier, results))
+            for w in range(processes)
+        ]
+        for p in workers:
+            p.start()
+        rows = sorted(results.get(timeout=600) for _ in workers)
+        for p in workers:
+            p.join()
+
+        failed = [f"worker {w} failed: {error}" for w, elapsed, error in rows if elapsed is None]
+        for w, elapsed, conflicts in rows:
+            if elapsed is not None:
+                print(f"worker {w}: {iterations} iterations in {elapsed:.2f}s, {conflicts} merged conflicts")
+        problems = failed or check(ShardedSessionService(db_url=db_url), session.id, processes, iterations)
+
+    if problems:
+        print("❌ Lost updates:\n" + "\n".join(f"  - {p}" for p in problems))
+        sys.exit(1)
+    print(f"✅ No entries lost across {processes} processes × {iterations} iterations")
+
+
+if __name__ == "__main__":
+    main()
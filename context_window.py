@@ -0,0 +1,168 @@
+"""
+Token-budgeted model context for long-lived sessions.
+
+When a session is loaded for a turn, only the newest turns (invocations)
+whose events fit in the token budget are kept; the full event log stays in
+the database. Events that fall out of the window are folded into a rolling
+summary kept in state under `context_summary`, and every agent's model
+request starts with that summary.
+
+Tokens are estimated from characters (CHARS_PER_TOKEN). Off by default; set
+LEARNING_MAS_CONTEXT_TOKENS to a budget to enable it, and optionally
+LEARNING_MAS_CONTEXT_MAX_EVENTS to the number of newest events read from the
+database before the budget is applied.
+"""
+import json
+import os
+from google.genai import types
+
+CHARS_PER_TOKEN = 4
+
+# Share of the budget the summary may use; its oldest lines are dropped first
+SUMMARY_SHARE = 0.25
+
+# Characters of each side of a turn kept in its summary line
+SUMMARY_QUERY_CHARS = 120
+SUMMARY_REPLY_CHARS = 160
+
+SUMMARY_KEY = "context_summary"
+SUMMARY_HEADER = "Summary of the earlier conversation (oldest first):"
+
+
+def part_tokens(part) -> int:
+    if part.text:
+        return len(part.text) // CHARS_PER_TOKEN + 1
+    if part.function_call:
+        return len(json.dumps(part.function_call.args or {}, default=str)) // CHARS_PER_TOKEN + 4
+    if part.function_response:
+        return len(json.dumps(part.function_response.response or {}, default=str)) // CHARS_PER_TOKEN + 4
+    return 1
+
+
+def content_tokens(content) -> int:
+    if content is None or not content.parts:
+        return 0
+    return sum(part_tokens(p) for p in content.parts)
+
+
+def _text(content) -> str:
+    if content is None or not content.parts:
+        return ""
+    return " ".join(p.text.strip() for p in content.parts if p.text and p.text.strip())
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class ContextWindow:
+    """
+    Trims loaded session events to a token budget and keeps the rolling
+    summary of what was trimmed; see the module docstring.
+    """
+
+    def __init__(self, budget: int = 0, max_events: int = 400):
+        self.budget = budget
+        self.max_events = max_events
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget > 0
+
+    def trim(self, events: list) -> tuple[list, list]:
+        """
+        Splits events (oldest first) into (dropped, kept). Whole invocations
+        are kept from the newest backwards while they fit; the newest one is
+        always kept.
+        """
+        groups = []
+        for event in events:
+            if groups and groups[-1][0] == event.invocation_id:
+                groups[-1][1].append(event)
+            else:
+                groups.append((event.invocation_id, [event]))
+
+        used, first_kept = 0, len(groups)
+        for i in range(len(groups) - 1, -1, -1):
+            cost = sum(content_tokens(e.content) for e in groups[i][1])
+            if used + cost > self.budget and first_kept < len(groups):
+                break
+            used += cost
+            first_kept = i
+        dropped = [e for _, group in groups[:first_kept] for e in group]
+        return dropped, events[len(dropped):]
+
+    def summarize(self, summary: dict, dropped: list) -> dict:
+        """
+        Folds dropped events newer than the summary into it. Returns the
+        summary unchanged (the same object) if there was nothing new.
+        """
+        summary = summary or {"through": 0.0, "lines": [], "omitted": 0}
+        new = [e for e in dropped if e.timestamp > summary["through"]]
+        if not new:
+            return summary
+
+        lines = list(summary["lines"])
+        query, reply, agent = "", "", ""
+        for i, event in enumerate(new):
+            text = _text(event.content)
+            if event.author == "user" and text:
+                query = text
+            elif text:
+                reply, agent = text, event.author
+            last_of_turn = i == len(new) - 1 or new[i + 1].invocation_id != event.invocation_id
+            if last_of_turn and (query or reply):
+                line = f"- User: {_clip(query, SUMMARY_QUERY_CHARS)}" if query else "- (earlier turn)"
+                if reply:
+                    line += f" → {agent}: {_clip(reply, SUMMARY_REPLY_CHARS)}"
+                lines.append(line)
+                query, reply, agent = "", "", ""
+
+        omitted = summary["omitted"]
+        limit = int(self.budget * SUMMARY_SHARE) * CHARS_PER_TOKEN
+        while lines and sum(len(line) + 1 for line in lines) > limit:
+            lines.pop(0)
+            omitted += 1
+        return {"through": new[-1].timestamp, "lines": lines, "omitted": omitted}
+
+    def summary_content(self, summary: dict):
+        if not summary or not summary["lines"]:
+            return None
+        text = SUMMARY_HEADER + "\n" + "\n".join(summary["lines"])
+        if summary["omitted"]:
+            text = f"{text}\n({summary['omitted']} older turns omitted)"
+        return types.Content(role="user", parts=[types.Part(text=text)])
+
+    # --- Agents ---
+
+    def instrument_agents(self, agent):
+        """
+        Adds a model callback to an agent and all its sub-agents that puts
+        the session's summary in front of the request contents.
+        """
+        if not self.enabled:
+            return
+        seen, stack = set(), [agent]
+        while stack:
+            a = stack.pop()
+            if id(a) in seen or not hasattr(a, "before_model_callback"):
+                continue
+            seen.add(id(a))
+            callbacks = a.before_model_callback
+            callbacks = list(callbacks) if isinstance(callbacks, list) else [callbacks] if callbacks else []
+            a.before_model_callback = [self._prepend_summary] + callbacks
+            stack.extend(a.sub_agents)
+            stack.extend(t.agent for t in a.tools if hasattr(t, "agent"))
+
+    def _prepend_summary(self, callback_context, llm_request):
+        content = self.summary_content(callback_context.state.get(SUMMARY_KEY))
+        if content is not None:
+            llm_request.contents.insert(0, content)
+        return None
+
+
+context_window = ContextWindow(
+    budget=int(os.getenv("LEARNING_MAS_CONTEXT_TOKENS", "0")),
+    max_events=int(os.getenv("LEARNING_MAS_CONTEXT_MAX_EVENTS", "400")),
+)
@@ -0,0 +1,565 @@
+"""
+Bulk import and export of a curriculum.
+
+A curriculum file is JSONL (one JSON object per line) or CSV (a header row
+naming the columns used), with one record per line and its kind in `type`:
+
+- edge:   topic, requires        "topic" needs "requires" first
+- task:   task, due, topic, effort   due as DD-MM-YYYY; topic and effort optional
+- known:  topic
+- review: topic, date, score     date as YYYY-MM-DD, score 0–5
+
+The import streams the file: each record is validated as it is read and
+applied to the session's state, then the prerequisite graph is checked for
+cycles once, and everything is written in one transaction (or, if any record
+is invalid, nothing is). Topic names resolve through the topic registry like
+the tools' do, but without typo correction. Importing is idempotent: edges,
+known topics and reviews already present are skipped, and tasks with the same
+name are replaced. Imported reviews are replayed with the user's review
+scheduler (SM-2 unless fitted) to reschedule their topics. The export writes the same records back, one key at a time.
+
+Usage: python curriculum.py import FILE [--format jsonl|csv] [--skip-invalid] [--user USER] [--db DB_URL]
+       python curriculum.py export FILE [--format jsonl|csv] [--user USER] [--db DB_URL]
+(FILE may be - for stdin/stdout.)
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+import argparse
+import csv
+import json
+import math
+from collections import Counter
+from datetime import datetime
+import numpy as np
+from manager_agent.state_schema import (
+    Review, Task, TASK_DATE_FORMAT, REVIEW_DATE_FORMAT, NEVER,
+    day_ordinal, format_day, today_ordinal, task_key,
+)
+from manager_agent.topic_registry import get_registry, save_registry
+from manager_agent.sub_agents.spaced_repetition_agent.sm2 import NEW_REPETITION, NEW_INTERVAL
+from manager_agent.sub_agents.spaced_repetition_agent.review_scheduler import get_scheduler
+
+# Columns of an exported CSV file
+CSV_COLUMNS = ("type", "topic", "requires", "task", "due", "effort", "date", "score")
+
+# State keys an import reads; the registry needs every key holding topics
+STATE_KEYS = (
+    "known_topics", "prereq_map", "learning_tasks", "review_schedule",
+    "study_progress", "topic_aliases", "topic_index", "review_params",
+)
+
+# Errors listed in an import's result; the rest are only counted
+MAX_ERRORS = 20
+
+# JSONL lines parsed together
+PARSE_BATCH = 5000
+
+
+def format_of(path: str) -> str:
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def _parse_lines(batch: list):
+    # One json.loads over the whole batch runs in C; if any line isn't a
+    # single object on its own, the lines are parsed one by one instead
+    if all(line.startswith("{") and line.endswith("}") for _, line in batch):
+        try:
+            records = json.loads("[" + ",".join(line for _, line in batch) + "]")
+            if len(records) == len(batch):
+                return zip((line_no for line_no, _ in batch), records)
+        except ValueError:
+            pass
+    parsed = []
+    for line_no, line in batch:
+        try:
+            parsed.append((line_no, json.loads(line)))
+        except ValueError as e:
+            parsed.append((line_no, f"invalid JSON ({e})"))
+    return parsed
+
+
+def read_records(lines, fmt: str = "jsonl"):
+    """
+    Yields (line number, record) for each record of a curriculum file. A line
+    that isn't valid JSON is yielded as its error message instead of a dict.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, {k: v for k, v in record.items() if k and v not in (None, "")}
+        return
+    batch = []
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if line:
+            batch.append((line_no, line))
+            if len(batch) == PARSE_BATCH:
+                yield from _parse_lines(batch)
+                batch = []
+    yield from _parse_lines(batch)
+
+
+def write_records(records, out, fmt: str = "jsonl") -> int:
+    """
+    Writes records to a text file as they come; returns how many were written.
+    """
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(CSV_COLUMNS)
+        for count, record in enumerate(records, 1):
+            writer.writerow([record.get(column, "") for column in CSV_COLUMNS])
+        return count
+
+    # Topic names recur across records, so each is encoded once
+    quoted = {}
+
+    def quote(value) -> str:
+        if type(value) is not str:
+            return json.dumps(value)
+        if value not in quoted:
+            quoted[value] = json.dumps(value)
+        return quoted[value]
+
+    for count, record in enumerate(records, 1):
+        out.write("{" + ", ".join([f'"{key}": {quote(value)}' for key, value in record.items()]) + "}\n")
+    return count
+
+
+def _text(record: dict, field: str, required: bool = True) -> str:
+    value = record.get(field)
+    if value is None or not str(value).strip():
+        if required:
+            raise ValueError(f"missing '{field}'")
+        return ""
+    return str(value).strip()
+
+
+def _cycle_components(prereqs: dict, nodes: set) -> dict:
+    """
+    Maps each topic of nodes that lies on a cycle to an id shared by its
+    strongly connected component (iterative Tarjan over the edges among nodes).
+    """
+    index, low, component = {}, {}, {}
+    stack, on_stack = [], set()
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(prereqs.get(root, ())))]
+        while work:
+            v, edges = work[-1]
+            for w in edges:
+                if w not in nodes:
+                    continue
+                if w not in index:
+                    index[w] = low[w] = len(index)
+                    stack.append(w)
+                    on_stack.add(w)
+                    work.append((w, iter(prereqs.get(w, ()))))
+                    break
+                if w in on_stack:
+                    low[v] = min(low[v], index[w])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[v])
+                if low[v] == index[v]:
+                    members = []
+                    while not members or members[-1] != v:
+                        members.append(stack.pop())
+                        on_stack.discard(members[-1])
+                    if len(members) > 1:
+                        component.update(dict.fromkeys(members, v))
+    return component
+
+
+class CurriculumImport:
+    """
+    Applies curriculum records to a copy of the state's curriculum keys,
+    counting what was added and collecting errors; finish() checks the
+    prerequisite graph for cycles and returns the keys to write.
+    """
+
+    def __init__(self, state: dict):
+        self.state = state
+        self.registry = get_registry(state)
+        # Canonical name per spelling, and day ordinal per date, seen in the file
+        self.names = {}
+        self.days = {}
+        self.today = today_ordinal()
+
+        self.prereqs = dict(state.get("prereq_map") or {})
+        # Prerequisites each topic had before the import; later ones are new
+        self.old_counts = {t: len(r) for t, r in self.prereqs.items()}
+        self.copied = set()
+        self.known = list(state.get("known_topics") or [])
+        self.known_set = set(self.known)
+        self.tasks = dict(state.get("learning_tasks") or {})
+        self.schedule = state.get("review_schedule") or {}
+        # Topic → [day, score] pairs: the stored history plus the imported reviews
+        self.histories = {}
+
+        self.handlers = {
+            "edge": self._add_edge,
+            "task": self._add_task,
+            "known": self._add_known,
+            "review": self._add_review,
+        }
+        self.counts = Counter()
+        self.errors = []
+        self.error_count = 0
+
+    def topic(self, record: dict, field: str = "topic") -> str:
+        try:
+            return self.names[record[field]]
+        except (KeyError, TypeError):
+            pass
+        canonical = self.registry.add(_text(record, field))
+        if type(record[field]) is str:
+            self.names[record[field]] = canonical
+        return canonical
+
+    def day(self, text: str, fmt: str) -> int:
+        # Files repeat the same few dates, and strptime is slow
+        if (text, fmt) not in self.days:
+            self.days[(text, fmt)] = day_ordinal(text, fmt)
+        return self.days[(text, fmt)]
+
+    def error(self, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(message)
+
+    def add(self, line_no: int, record):
+        """
+        Validates and applies one record; an invalid one is recorded as an error.
+        """
+        try:
+            if isinstance(record, str):
+                raise ValueError(record)
+            if not isinstance(record, dict):
+                raise ValueError("expected a JSON object")
+            handler = self.handlers.get(record.get("type"))
+            if handler is None:
+                raise ValueError(f"unknown record type {record.get('type')!r}")
+            handler(record)
+        except ValueError as e:
+            self.error(f"line {line_no}: {e}")
+
+    def _add_edge(self, record: dict):
+        topic, required = self.topic(record), self.topic(record, "requires")
+        if topic == required:
+            raise ValueError(f"'{topic}' can't require itself")
+        entry = self.prereqs.get(topic)
+        if entry is None or required not in entry:
+            if topic not in self.copied:
+                # Copied on first change, so the state's own lists stay as they were
+                entry = self.prereqs[topic] = list(entry or ())
+                self.copied.add(topic)
+            entry.append(required)
+            self.counts["edges"] += 1
+
+    def _add_task(self, record: dict):
+        name = _text(record, "task")
+        due_text = _text(record, "due", required=False)
+        try:
+            due = self.day(due_text, TASK_DATE_FORMAT) if due_text else NEVER
+        except ValueError:
+            raise ValueError(f"invalid due date '{due_text}' (use DD-MM-YYYY)")
+        try:
+            effort = float(record.get("effort", 1.0))
+        except (TypeError, ValueError):
+            effort = 0
+        if not (math.isfinite(effort) and effort > 0):
+            raise ValueError(f"effort must be a positive number of hours, got {record.get('effort')!r}")
+        topic = self.topic(record) if _text(record, "topic", required=False) else ""
+        old = self.tasks.get(task_key(name))
+        task = Task(name, due, old["created"] if old else self.today, effort, topic).dump()
+        if task != old:
+            self.tasks[task_key(name)] = task
+            self.counts["tasks"] += 1
+
+    def _add_known(self, record: dict):
+        topic = self.topic(record)
+        if topic not in self.known_set:
+            self.known_set.add(topic)
+            self.known.append(topic)
+            self.counts["known"] += 1
+
+    def _add_review(self, record: dict):
+        topic = self.topic(record)
+        date_text = _text(record, "date")
+        try:
+            day = self.day(date_text, REVIEW_DATE_FORMAT)
+        except ValueError:
+            raise ValueError(f"invalid review date '{date_text}' (use YYYY-MM-DD)")
+        try:
+            score = int(record.get("score"))
+        except (TypeError, ValueError):
+            score = -1
+        if not 0 <= score <= 5:
+            raise ValueError(f"score must be an integer from 0 to 5, got {record.get('score')!r}")
+        history = self.histories.get(topic)
+        if history is None:
+            stored = self.schedule.get(topic)
+            history = self.histories[topic] = [list(h) for h in stored["history"]] if stored else []
+        if [day, score] not in history:
+            history.append([day, score])
+            self.counts["reviews"] += 1
+
+    def _check_cycles(self, skip_invalid: bool):
+        # Peel off topics nothing left requires; whatever remains lies on a
+        # cycle or is required from one
+        dependents = Counter(r for required in self.prereqs.values() for r in required)
+        ready = [t for t in self.prereqs if not dependents[t]]
+        while ready:
+            for r in self.prereqs.get(ready.pop(), ()):
+                dependents[r] -= 1
+                if not dependents[r]:
+                    ready.append(r)
+        remaining = {t for t, n in dependents.items() if n}
+        if not remaining:
+            return
+
+        # A new edge inside a cycle's component is what closed it (edges the
+        # state already had are left alone)
+        component = _cycle_components(self.prereqs, remaining)
+        for topic in [t for t in self.prereqs if t in component]:
+            required = self.prereqs[topic]
+            old = self.old_counts.get(topic, 0)
+            closing = [r for r in required[old:] if component.get(r) == component[topic]]
+            for r in closing:
+                self.error(f"'{topic}' requiring '{r}' would create a cycle")
+            if closing and skip_invalid:
+                self.prereqs[topic] = required[:old] + [r for r in required[old:] if r not in closing]
+                self.counts["edges"] -= len(closing)
+                # A topic only listed by its dropped edges isn't listed at all
+                if not self.prereqs[topic] and topic not in self.old_counts:
+                    del self.prereqs[topic]
+
+    def _replay_reviews(self) -> dict:
+        # The scheduler from a new topic's values over each history, one
+        # review round at a time for all topics (longest histories first)
+        scheduler = get_scheduler(self.state)
+        schedule = dict(self.schedule)
+        topics = sorted(self.histories, key=lambda t: -len(self.histories[t]))
+        histories = [sorted(self.histories[t]) for t in topics]
+        n = len(topics)
+        repetition = np.full(n, NEW_REPETITION, dtype=np.int64)
+        interval = np.full(n, NEW_INTERVAL, dtype=np.int64)
+        easiness = np.array([scheduler.start_easiness(t) for t in topics], dtype=np.float64)
+        rounds = len(histories[0]) if histories else 0
+        active = n
+        for k in range(rounds):
+            while active and len(histories[active - 1]) <= k:
+                active -= 1
+            repetition[:active], interval[:active], easiness[:active] = scheduler.review(
+                topics[:active], repetition[:active], interval[:active], easiness[:active],
+                [h[k][1] for h in histories[:active]],
+            )
+        for i, (topic, history) in enumerate(zip(topics, histories)):
+            if not history:
+                continue
+            last = history[-1][0]
+            schedule[topic] = Review(
+                topic, last, last + int(interval[i]), int(interval[i]),
+                int(repetition[i]), float(easiness[i]), history,
+            ).dump()
+        return schedule
+
+    def finish(self, skip_invalid: bool = False) -> dict:
+        """
+        Checks the graph for cycles and returns the changed state keys, or
+        {} if there were errors and skip_invalid is off.
+        """
+        if self.counts["edges"]:
+            self._check_cycles(skip_invalid)
+        if self.error_count and not skip_invalid:
+            # Names from the rejected records bumped the registry's revision
+            # past the state's stamp, so the next get_registry rebuilds it
+            return {}
+
+        values = {}
+        if self.counts["edges"]:
+            values["prereq_map"] = self.prereqs
+            # The compiled index is rebuilt from the new map
+            values["prereq_index"] = None
+        if self.counts["known"]:
+            values["known_topics"] = self.known
+        if self.counts["tasks"]:
+            values["learning_tasks"] = self.tasks
+        if self.counts["reviews"]:
+            values["review_schedule"] = self._replay_reviews()
+            values["review_due_heap"] = None
+        if values:
+            stamp = self.state.get("topic_index")
+            save_registry(self.state, self.registry)
+            if self.state["topic_index"] != stamp:
+                values["topic_index"] = self.state["topic_index"]
+        return values
+
+    def result(self, written: bool) -> dict:
+        return {
+            "written": written,
+            "edges": self.counts["edges"],
+            "tasks": self.counts["tasks"],
+            "known": self.counts["known"],
+            "reviews": self.counts["reviews"],
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+def _load_state(store, app_name, user_id, session_id, keys) -> dict:
+    state = {}
+    for key in keys:
+        try:
+            state[key] = store.load_key(app_name, user_id, session_id, key)
+        except KeyError:
+            pass
+    return state
+
+
+def import_curriculum(session_service, app_name, user_id, session_id, lines, fmt: str = "jsonl",
+                      skip_invalid: bool = False, source: str = "") -> dict:
+    """
+    Streams curriculum records from lines (an open file or any iterable of
+    lines) into the session's state in one transaction. Returns what was
+    added, whether it was written, and the errors found. With skip_invalid,
+    invalid records (and edges closing a cycle) are left out instead of
+    stopping the import.
+    """
+    from utils import update_interaction_history
+
+    store = session_service.state_store
+    importer = CurriculumImport(_load_state(store, app_name, user_id, session_id, STATE_KEYS))
+    for line_no, record in read_records(lines, fmt):
+        importer.add(line_no, record)
+    values = importer.finish(skip_invalid)
+    if not values:
+        return importer.result(False)
+
+    turn = session_service.begin_turn(app_name, user_id, session_id)
+    for key, value in values.items():
+        turn.set(key, value)
+    update_interaction_history(
+        session_service, app_name, user_id, session_id,
+        {"action": "import_curriculum", "source": source, **importer.counts, "errors": importer.error_count},
+        turn=turn,
+    )
+    session_service.commit_turn(turn)
+    return importer.result(True)
+
+
+def curriculum_records(load):
+    """
+    Yields the records of a curriculum, reading its state keys through
+    load(key) one at a time so only one is held in memory.
+    """
+    for topic in load("known_topics") or []:
+        yield {"type": "known", "topic": topic}
+    for topic, required in (load("prereq_map") or {}).items():
+        for r in required:
+            yield {"type": "edge", "topic": topic, "requires": r}
+    for raw in (load("learning_tasks") or {}).values():
+        task = Task.load(raw)
+        record = {"type": "task", "task": task.task, "due": "" if task.due >= NEVER else format_day(task.due, TASK_DATE_FORMAT)}
+        if task.topic:
+            record["topic"] = task.topic
+        record["effort"] = task.effort
+        yield record
+    for topic, raw in (load("review_schedule") or {}).items():
+        for day, score in raw["history"]:
+            yield {"type": "review", "topic": topic, "date": format_day(day, REVIEW_DATE_FORMAT), "score": score}
+
+
+def export_curriculum(session_service, app_name, user_id, session_id, out, fmt: str = "jsonl") -> int:
+    """
+    Writes the session's curriculum to a text file; returns the number of records.
+    """
+    store = session_service.state_store
+
+    def load(key):
+        try:
+            return store.load_key(app_name, user_id, session_id, key)
+        except KeyError:
+            return None
+
+    return write_records(curriculum_records(load), out, fmt)
+
+
+def open_session(session_service, app_name, user_id) -> str:
+    # The user's session as main.py would continue it
+    from utils import migrate_session_state
+    from manager_agent.state_schema import new_session_state
+
+    sessions = session_service.list_sessions(app_name=app_name, user_id=user_id)
+    if sessions.sessions:
+        session_id = sessions.sessions[0].id
+    else:
+        session_id = session_service.create_session(
+            app_name=app_name, user_id=user_id, state=new_session_state(user_id.title())
+        ).id
+    migrate_session_state(session_service, app_name, user_id, session_id)
+    return session_id
+
+
+def main():
+    from main import APP_NAME, USER_ID, db_url
+    from sharded_session_service import ShardedSessionService
+    from context_window import context_window
+
+    parser = argparse.ArgumentParser(description="Import or export a curriculum as JSONL or CSV.")
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("file", help="curriculum file, or - for stdin/stdout")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="default: from the file extension")
+    parser.add_argument("--skip-invalid", action="store_true", help="import the valid records even if some aren't")
+    parser.add_argument("--user", default=USER_ID)
+    parser.add_argument("--db", default=db_url)
+    args = parser.parse_args()
+    fmt = args.format or format_of(args.file)
+
+    session_service = ShardedSessionService(db_url=args.db, window=context_window)
+    session_id = open_session(session_service, APP_NAME, args.user)
+    started = datetime.now()
+
+    if args.command == "export":
+        out = sys.stdout if args.file == "-" else open(args.file, "w", newline="", encoding="utf-8")
+        try:
+            count = export_curriculum(session_service, APP_NAME, args.user, session_id, out, fmt)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        print(f"📤 Exported {count} records in {(datetime.now() - started).total_seconds():.1f}s", file=sys.stderr)
+        return
+
+    lines = sys.stdin if args.file == "-" else open(args.file, newline="", encoding="utf-8")
+    try:
+        result = import_curriculum(
+            session_service, APP_NAME, args.user, session_id, lines, fmt, args.skip_invalid, source=args.file
+        )
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+    for message in result["errors"]:
+        print(f"❌ {message}")
+    if result["error_count"] > len(result["errors"]):
+        print(f"❌ ... and {result['error_count'] - len(result['errors'])} more errors")
+    added = f"{result['edges']} edges, {result['tasks']} tasks, {result['known']} known topics, {result['reviews']} reviews"
+    if result["written"]:
+        print(f"✅ Imported {added} in {(datetime.now() - started).total_seconds():.1f}s")
+    elif result["error_count"] and not args.skip_invalid:
+        print("⚠️ Nothing was imported; fix the errors above or use --skip-invalid.")
+        sys.exit(1)
+    else:
+        print("✅ Nothing new to import.")
+
+
+if __name__ == "__main__":
+    main()
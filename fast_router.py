@@ -0,0 +1,209 @@
+"""
+Answers a few structured requests without the LLM.
+
+Messages like "I finished Graphs 60%" or "list my tasks" map straight onto
+one sub-agent tool. The router matches them with regular expressions, runs
+the tool against the stored session state and writes any changed keys into
+the current turn. Everything else goes through the runner as usual.
+
+Off by default; set LEARNING_MAS_FAST_ROUTER=1 to enable it, and optionally
+LEARNING_MAS_FAST_ROUTER_INTENTS to a comma-separated subset of intent names.
+"""
+import os
+import re
+import time
+from manager_agent.sub_agents.academic_planning_agent.agent import update_study_progress, list_tasks
+from manager_agent.sub_agents.spaced_repetition_agent.agent import get_due_reviews
+from manager_agent.sub_agents.dependency_agent.agent import list_known, can_learn
+from manager_agent.topic_registry import get_registry
+
+ROUTER_AGENT = "fast_router"
+
+
+class ToolState:
+    """
+    Session state as seen by a tool: reads fall through to the session,
+    writes are collected in `changed`.
+    """
+
+    def __init__(self, state):
+        self._state = state
+        self.changed = {}
+
+    def get(self, key, default=None):
+        if key in self.changed:
+            return self.changed[key]
+        return self._state.get(key, default)
+
+    def __getitem__(self, key):
+        if key in self.changed:
+            return self.changed[key]
+        return self._state[key]
+
+    def __setitem__(self, key, value):
+        self.changed[key] = value
+
+    def __contains__(self, key):
+        return key in self.changed or key in self._state
+
+
+class ToolCall:
+    # Stand-in for ToolContext; the routed tools only use `state`
+    def __init__(self, state):
+        self.state = ToolState(state)
+
+
+def _lines(items: list, empty: str) -> str:
+    return "\n".join(f"- {item}" for item in items) if items else empty
+
+
+def _progress(match, call):
+    percent = min(100, int(match["percent"]))
+    result = update_study_progress(match["topic"].strip(), percent, percent == 100, tool_context=call)
+    return result["message"].strip()
+
+
+def _due_reviews(match, call):
+    result = get_due_reviews(call)
+    return result.get("message") or "🔁 Due for review today:\n" + _lines(result["due_topics"], "")
+
+
+def _tasks(match, call):
+    result = list_tasks(call)
+    return result.get("message") or "\n".join(result["learning_tasks"])
+
+
+def _known(match, call):
+    return "🎓 Known topics:\n" + _lines(list_known(call)["known_topics"], "(none yet)")
+
+
+def _can_learn(match, call):
+    topic = match["topic"].strip()
+    # New or misspelled topics go to the agent, which can ask or look up
+    # their prerequisites
+    if get_registry(call.state).lookup(topic) is None:
+        return None
+    result = can_learn(topic, call)
+    if result.get("similar_topics"):
+        return None
+    if result["can_learn"]:
+        return f"✅ You can learn '{topic}' now."
+    return f"❌ Not yet — first learn: {', '.join(result['missing'])}"
+
+
+# Intent name → (handler, patterns). Patterns must match the whole message.
+INTENTS = {
+    "update_study_progress": (_progress, [
+        r"i (?:have )?(?:finished|completed|done|did) (?P<topic>.+?) (?P<percent>\d{1,3}) ?%",
+        r"i (?:have )?(?:finished|completed|done|did) (?P<percent>\d{1,3}) ?% of (?P<topic>.+?)",
+    ]),
+    "get_due_reviews": (_due_reviews, [
+        r"what (?:should|do|can) i (?:need to )?(?:revise|review) today",
+        r"(?:show|list|what are)(?: me)? (?:my )?(?:reviews|revisions)(?: due)? today",
+    ]),
+    "list_tasks": (_tasks, [
+        r"(?:list|show)(?: me)?(?: all)?(?: of)? my(?: current)? tasks",
+        r"what are my(?: current)? tasks",
+    ]),
+    "list_known": (_known, [
+        r"(?:list|show)(?: me)?(?: all)? (?:my|the) known topics",
+        r"what (?:topics )?do i (?:already )?know",
+    ]),
+    "can_learn": (_can_learn, [
+        r"can i (?:learn|study|start)(?: learning)? (?P<topic>.+?)(?: now| yet)?",
+    ]),
+}
+
+
+class FastRouter:
+    """
+    Regex intent matcher in front of the runner, with per-intent statistics.
+    """
+
+    def __init__(self, enabled: bool = False, intents=None):
+        self.enabled = enabled
+        names = INTENTS if intents is None else [name for name in intents if name in INTENTS]
+        self.patterns = [
+            (name, re.compile(pattern + r"[\s.!?]*", re.IGNORECASE))
+            for name in names
+            for pattern in INTENTS[name][1]
+        ]
+        self.queries = 0
+        self.hits = {name: 0 for name in names}
+        self.fast_seconds = {name: 0.0 for name in names}
+        self.llm_turns = 0
+        self.llm_seconds = 0.0
+
+    def match(self, query: str):
+        for name, pattern in self.patterns:
+            m = pattern.fullmatch(query.strip())
+            if m:
+                return name, m
+        return None
+
+    def handle(self, session_service, app_name, user_id, session_id, query, turn):
+        """
+        Runs the matching tool and returns its reply, or None to fall through
+        (also when the handler leaves the query to the agents). State changes
+        are added to `turn`.
+        """
+        if not self.enabled:
+            return None
+        self.queries += 1
+        found = self.match(query)
+        if found is None:
+            return None
+
+        name, match = found
+        start = time.perf_counter()
+        session = session_service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        call = ToolCall(session.state)
+        reply = INTENTS[name][0](match, call)
+        if reply is None:
+            return None
+        for key, value in call.state.changed.items():
+            turn.set(key, value)
+        self.hits[name] += 1
+        self.fast_seconds[name] += time.perf_counter() - start
+        return reply
+
+    def record_llm_turn(self, seconds: float):
+        if self.enabled:
+            self.llm_turns += 1
+            self.llm_seconds += seconds
+
+    def report(self) -> dict:
+        """
+        Per intent: hits, share of all queries, average fast-path latency and
+        the time saved against the average LLM turn seen so far.
+        """
+        llm_avg = self.llm_seconds / self.llm_turns if self.llm_turns else None
+        report = {}
+        for name, hits in self.hits.items():
+            avg = self.fast_seconds[name] / hits if hits else 0.0
+            report[name] = {
+                "hits": hits,
+                "hit_rate": hits / self.queries if self.queries else 0.0,
+                "avg_ms": avg * 1000,
+                "saved_ms": (llm_avg - avg) * 1000 * hits if llm_avg is not None else None,
+            }
+        return report
+
+    def print_report(self):
+        if not self.enabled or not self.queries:
+            return
+        print(f"\n⚡ Fast-path router: {sum(self.hits.values())}/{self.queries} queries answered locally")
+        for name, row in self.report().items():
+            saved = f"{row['saved_ms'] / 1000:.1f}s saved" if row["saved_ms"] is not None else "no LLM baseline yet"
+            print(f"  - {name}: {row['hits']} hits ({row['hit_rate']:.0%}), {row['avg_ms']:.1f} ms avg, {saved}")
+
+
+def _intents_from_env():
+    names = os.getenv("LEARNING_MAS_FAST_ROUTER_INTENTS")
+    return [n.strip() for n in names.split(",") if n.strip()] if names else None
+
+
+fast_router = FastRouter(
+    enabled=os.getenv("LEARNING_MAS_FAST_ROUTER", "0") == "1",
+    intents=_intents_from_env(),
+)
@@ -3,68 +3,123 @@ import os
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
 import asyncio
+import warnings
 from dotenv import load_dotenv
-from google.adk.runners import Runner
-from google.adk.sessions import DatabaseSessionService
-from manager_agent.agent import manager_agent
-from utils import call_agent_async, display_state, add_user_query_to_history
 
+# Loaded before the project imports (in Backend), which read their settings at import time
 load_dotenv()
 
-# Initialize SQLite-based persistent session service
+# Initialize SQLite-based persistent session service (state stored per key)
 db_url = "sqlite:///./learning_mas.db"
-session_service = DatabaseSessionService(db_url=db_url)
 
 APP_NAME = "LearningMAS"
 USER_ID = "shreyas"
 
-# Default state structure
-initial_state = {
-    "user_name": "Shreyas",
-    "known_topics": [],
-    "learning_tasks": [],
-    "review_schedule": [],
-    "interaction_history": [],
-    "study_progress": [],
-}
+# Print what each turn changed in the state
+SHOW_STATE_EACH_TURN = os.getenv("LEARNING_MAS_SHOW_STATE", "0") == "1"
 
-async def main_async():
-    # Check existing sessions
-    existing_sessions = session_service.list_sessions(app_name=APP_NAME, user_id=USER_ID)
-    if existing_sessions.sessions:
-        session = existing_sessions.sessions[0]
-        print(f"Continuing session: {session.id}")
-    else:
-        session = session_service.create_session(
-            app_name=APP_NAME, 
-            user_id=USER_ID, 
-            state=initial_state
+# ADK's dependencies warn about deprecations while loading, which would
+# otherwise print over the prompt
+warnings.filterwarnings("ignore", module=r"google\.|vertexai")
+
+
+class Backend:
+    """
+    Everything a turn needs: the agent graph, session service, session and
+    runner. Importing ADK and building the agents takes seconds, so main()
+    builds this in a background thread while the user types.
+    """
+
+    def __init__(self):
+        from google.adk.runners import Runner
+        from manager_agent.agent import get_manager_agent
+        from sharded_session_service import ShardedSessionService
+        from tracing import tracer
+        from context_window import context_window
+        from manager_agent.state_schema import new_session_state
+        from utils import migrate_session_state
+
+        manager_agent = get_manager_agent()
+        self.session_service = ShardedSessionService(db_url=db_url, window=context_window)
+        tracer.instrument_session_service(self.session_service)
+        tracer.instrument_agents(manager_agent)
+        context_window.instrument_agents(manager_agent)
+
+        # Check existing sessions
+        existing_sessions = self.session_service.list_sessions(app_name=APP_NAME, user_id=USER_ID)
+        if existing_sessions.sessions:
+            self.session_id = existing_sessions.sessions[0].id
+            self.greeting = f"Continuing session: {self.session_id}"
+        else:
+            session = self.session_service.create_session(
+                app_name=APP_NAME,
+                user_id=USER_ID,
+                state=new_session_state(USER_ID.title())
+            )
+            self.session_id = session.id
+            self.greeting = f"New session created: {self.session_id}"
+        migrate_session_state(self.session_service, APP_NAME, USER_ID, self.session_id)
+
+        self.runner = Runner(
+            agent=manager_agent,
+            app_name=APP_NAME,
+            session_service=self.session_service
         )
-        print(f"New session created: {session.id}")
 
-    SESSION_ID = session.id
+    async def serve(self, user_input: str):
+        """
+        Handles user_input and then every further message until exit.
+        """
+        from state_store import run_compaction
+        from fast_router import fast_router
+        from tracing import tracer
+        from utils import call_agent_async, display_state, display_state_changes, state_view
 
-    runner = Runner(
-        agent=manager_agent,
-        app_name=APP_NAME,
-        session_service=session_service
-    )
+        session_service, SESSION_ID = self.session_service, self.session_id
+        # Roll old interaction history into compressed archives in the background
+        compaction_task = asyncio.create_task(run_compaction(session_service.state_store))
 
-    print(f"\nWelcome to your Personalized Learning Agent {USER_ID.title()}!")
-    print("Type 'exit' or 'quit' to stop.\n")
+        while True:
+            if user_input.lower() in ["exit", "quit"]:
+                print("Goodbye!")
+                fast_router.print_report()
+                tracer.close()
+                compaction_task.cancel()
+                break
+
+            # The state summary is shown on demand, off the response path
+            if user_input.strip().lower() == "state":
+                with tracer.span("render", "display_state"):
+                    await asyncio.to_thread(display_state, session_service, APP_NAME, USER_ID, SESSION_ID)
+            else:
+                # Route the query to the agent, streaming its reply as it arrives
+                await call_agent_async(self.runner, USER_ID, SESSION_ID, user_input, stream=True)
+
+                # The rendered state is kept current from the turn's committed values
+                turn = session_service.last_turn
+                if SHOW_STATE_EACH_TURN:
+                    with tracer.span("render", "display_state"):
+                        await asyncio.to_thread(display_state_changes, session_service, APP_NAME, USER_ID, SESSION_ID, turn)
+                else:
+                    state_view.update(turn)
 
-    while True:
-        user_input = input("You: ")
-        if user_input.lower() in ["exit", "quit"]:
-            print("Goodbye!")
-            break
+            # Read input in a thread so background tasks keep running meanwhile
+            user_input = await asyncio.to_thread(input, "You: ")
 
 
-        # Route the query to the agent
-        await call_agent_async(runner, USER_ID, SESSION_ID, user_input)
+async def main_async():
+    # Load the agents and the session while the user types the first message
+    warm_up = asyncio.ensure_future(asyncio.to_thread(Backend))
+
+    print(f"\nWelcome to your Personalized Learning Agent {USER_ID.title()}!")
+    print("Type 'state' to see your learning state, or 'exit' or 'quit' to stop.\n")
 
-        # Show updated session state
-        display_state(session_service, APP_NAME, USER_ID, SESSION_ID)
+    user_input = await asyncio.to_thread(input, "You: ")
+    if not warm_up.done():
+        print("⏳ Loading your learning agents...")
+    backend = await warm_up
+    print(backend.greeting)
+    await backend.serve(user_input)
 
 def main():
     asyncio.run(main_async())
@@ -1 +1,9 @@
-from .agent import manager_agent  
\ No newline at end of file
+# The agent graph is built on first access (see agent.py), so importing the
+# package for state_schema or topic_registry doesn't load ADK
+
+
+def __getattr__(name):
+    if name == "manager_agent":
+        from .agent import get_manager_agent
+        return get_manager_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
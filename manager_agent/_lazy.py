@@ -0,0 +1,16 @@
+"""
+Lazy attributes for the sub-agent packages.
+"""
+import importlib
+
+
+def lazy_exports(module_name: str, mapping: dict):
+    """
+    Returns a module-level __getattr__ for module_name that imports each
+    name in mapping (name → relative submodule) on first access.
+    """
+    def __getattr__(name):
+        if name in mapping:
+            return getattr(importlib.import_module(mapping[name], module_name), name)
+        raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+    return __getattr__
@@ -1,14 +1,19 @@
-from google.adk.agents import Agent
+import importlib
+import threading
 
-from .sub_agents.academic_planning_agent.agent import academic_planning_agent
-from .sub_agents.spaced_repetition_agent.agent import spaced_repetition_agent
-from .sub_agents.dependency_agent.agent import dependency_agent
+# The manager's sub-agents, as (module, attribute). Their modules, their tools
+# and ADK are imported when the agent graph is first built, not at import:
+# ADK needs the sub-agents to exist when the manager is constructed, so they
+# can't be deferred past that point.
+SUB_AGENTS = {
+    "academic_planning_agent": (".sub_agents.academic_planning_agent.agent", "academic_planning_agent"),
+    "spaced_repetition_agent": (".sub_agents.spaced_repetition_agent.agent", "spaced_repetition_agent"),
+    "dependency_agent": (".sub_agents.dependency_agent.agent", "dependency_agent"),
+}
 
-manager_agent = Agent(
-    name="manager_agent",
-    model="gemini-2.0-flash",
-    description="Main manager agent that routes queries to sub-agents handling spaced repetition, planning, and learning dependencies.",
-    instruction="""
+MANAGER_DESCRIPTION = "Main manager agent that routes queries to sub-agents handling spaced repetition, planning, and learning dependencies."
+
+MANAGER_INSTRUCTION = """
     You are the root agent managing a personalized learning assistant.
     Your job is to:
     - Understand the user's academic and learning-related queries
@@ -31,11 +36,44 @@ manager_agent = Agent(
     - "What should I revise today?" → spaced_repetition_agent
     - "Help me make a weekly plan to study algorithms" → academic_planning_agent
     - "Can I learn Dynamic Programming now?" → dependency_agent
-    """,
-    sub_agents=[
-        academic_planning_agent,
-        spaced_repetition_agent,
-        dependency_agent,
-    ],
-    tools=[],
-)
+    """
+
+_lock = threading.Lock()
+_manager_agent = None
+
+
+def load_sub_agent(name: str):
+    """
+    Imports a sub-agent's module (building it on first use) and returns the agent.
+    """
+    module, attribute = SUB_AGENTS[name]
+    return getattr(importlib.import_module(module, __package__), attribute)
+
+
+def get_manager_agent():
+    """
+    Returns the manager agent, building it and its sub-agents on the first call.
+    """
+    global _manager_agent
+    # Built once even when a warm-up thread and the first turn ask together
+    with _lock:
+        if _manager_agent is None:
+            from google.adk.agents import Agent
+            from .stub_llm import agent_model
+
+            _manager_agent = Agent(
+                name="manager_agent",
+                model=agent_model("manager_agent"),
+                description=MANAGER_DESCRIPTION,
+                instruction=MANAGER_INSTRUCTION,
+                sub_agents=[load_sub_agent(name) for name in SUB_AGENTS],
+                tools=[],
+            )
+    return _manager_agent
+
+
+def __getattr__(name):
+    # `from manager_agent.agent import manager_agent` builds the graph on first use
+    if name == "manager_agent":
+        return get_manager_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
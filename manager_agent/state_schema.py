@@ -0,0 +1,285 @@
+"""
+Versioned layout of the session state shared by all agents.
+
+Version 2 keeps `learning_tasks`, `study_progress` and `review_schedule` as
+maps keyed by task/topic, and stores every date as an integer day ordinal
+(date.toordinal()) so nothing is re-parsed with strptime on each call.
+Version 3 stores every topic under its canonical name from the topic
+registry, with the entries of duplicate spellings merged.
+Records are stored as plain dicts so they round-trip through the session
+service; the slotted dataclasses below are the typed view used by tools.
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from .topic_registry import TopicRegistry
+
+SCHEMA_VERSION = 3
+
+# State keys rewritten by ensure_schema
+MIGRATED_KEYS = (
+    "learning_tasks", "study_progress", "review_schedule", "review_due_heap",
+    "known_topics", "prereq_map", "prereq_index", "schema_version",
+)
+
+# User-facing date formats (input and output only)
+TASK_DATE_FORMAT = "%d-%m-%Y"
+REVIEW_DATE_FORMAT = "%Y-%m-%d"
+
+# Ordinal used for entries whose stored date couldn't be parsed
+NEVER = date.max.toordinal()
+
+
+def day_ordinal(text: str, fmt: str) -> int:
+    return datetime.strptime(text, fmt).date().toordinal()
+
+
+def format_day(ordinal: int, fmt: str) -> str:
+    if ordinal >= NEVER:
+        return "unknown"
+    return date.fromordinal(ordinal).strftime(fmt)
+
+
+def today_ordinal() -> int:
+    return date.today().toordinal()
+
+
+def task_key(task: str) -> str:
+    # Task names are unique regardless of case
+    return task.lower()
+
+
+@dataclass(slots=True)
+class Task:
+    task: str
+    due: int
+    created: int
+    # Estimated hours of study
+    effort: float = 1.0
+    # Topic the task covers, used to keep prerequisites first when planning
+    topic: str = ""
+
+    @classmethod
+    def load(cls, raw: dict) -> "Task":
+        return cls(raw["task"], raw["due"], raw["created"], raw.get("effort", 1.0), raw.get("topic", ""))
+
+    def dump(self) -> dict:
+        return {
+            "task": self.task,
+            "due": self.due,
+            "created": self.created,
+            "effort": self.effort,
+            "topic": self.topic,
+        }
+
+
+@dataclass(slots=True)
+class Progress:
+    topic: str
+    percent: int
+    completed: bool
+
+    @classmethod
+    def load(cls, raw: dict) -> "Progress":
+        return cls(raw["topic"], raw["percent"], raw["completed"])
+
+    def dump(self) -> dict:
+        return {"topic": self.topic, "percent": self.percent, "completed": self.completed}
+
+
+@dataclass(slots=True)
+class Review:
+    topic: str
+    last: int
+    due: int
+    interval: int = 1
+    repetition: int = 1
+    easiness: float = 2.5
+    # [day ordinal, score] pairs, oldest first
+    history: list = field(default_factory=list)
+
+    @classmethod
+    def load(cls, raw: dict) -> "Review":
+        return cls(
+            raw["topic"], raw["last"], raw["due"], raw["interval"],
+            raw["repetition"], raw["easiness"], raw["history"],
+        )
+
+    def dump(self) -> dict:
+        return {
+            "topic": self.topic,
+            "last": self.last,
+            "due": self.due,
+            "interval": self.interval,
+            "repetition": self.repetition,
+            "easiness": self.easiness,
+            "history": self.history,
+        }
+
+
+def new_session_state(user_name: str) -> dict:
+    """
+    State of a learner's first session.
+    """
+    return {
+        "user_name": user_name,
+        "known_topics": [],
+        "learning_tasks": {},
+        "review_schedule": {},
+        "interaction_history": [],
+        "study_progress": {},
+        "schema_version": SCHEMA_VERSION,
+    }
+
+
+def merge_review(base, mine: dict, theirs: dict) -> dict:
+    """
+    Merges a review entry updated by two writers: the history keeps both
+    sides' new scores in date order, and the scheduling fields come from
+    whichever side reviewed last.
+    """
+    added = Counter(map(tuple, mine["history"])) - Counter(map(tuple, base["history"] if base else []))
+    newer = mine if mine["last"] >= theirs["last"] else theirs
+    history = theirs["history"] + [list(h) for h in added.elements()]
+    return {**newer, "history": sorted(history, key=lambda h: h[0])}
+
+
+# --- Migration from version 1 (lists of dicts with date strings) ---
+
+def _parse_or_never(text, fmt) -> int:
+    try:
+        return day_ordinal(text, fmt)
+    except (TypeError, ValueError):
+        return NEVER
+
+
+def _migrate_tasks(tasks) -> dict:
+    if isinstance(tasks, dict):
+        return tasks
+    migrated = {}
+    for t in tasks:
+        if task_key(t["task"]) not in migrated:
+            migrated[task_key(t["task"])] = Task(
+                t["task"],
+                _parse_or_never(t.get("due_date"), TASK_DATE_FORMAT),
+                _parse_or_never(t.get("created_at"), TASK_DATE_FORMAT),
+            ).dump()
+    return migrated
+
+
+def _migrate_progress(progress) -> dict:
+    if isinstance(progress, dict):
+        return progress
+    return {
+        p["topic"]: Progress(p["topic"], p.get("percent", 0), p.get("completed", False)).dump()
+        for p in progress
+    }
+
+
+def _migrate_reviews(schedule) -> dict:
+    entries = schedule.values() if isinstance(schedule, dict) else schedule
+    migrated = {}
+    for e in entries:
+        if "due" in e:
+            migrated[e["topic"]] = e
+            continue
+        migrated[e["topic"]] = Review(
+            e["topic"],
+            _parse_or_never(e.get("last_reviewed"), REVIEW_DATE_FORMAT),
+            e.get("due_ordinal") or _parse_or_never(e.get("next_review_due"), REVIEW_DATE_FORMAT),
+            e.get("interval", 1),
+            e.get("repetition", 1),
+            e.get("easiness", 2.5),
+            [[_parse_or_never(h["date"], REVIEW_DATE_FORMAT), h["score"]] for h in e.get("history", [])],
+        ).dump()
+    return migrated
+
+
+# --- Migration from version 2 (topics stored as spelled) ---
+
+def merge_topic_entries(state, canonical) -> int:
+    """
+    Renames every topic in state to canonical(topic), merging the entries of
+    topics that end up with the same name. Only changed keys are written.
+    Returns the number of entries merged away.
+    """
+    merged = 0
+
+    known = state.get("known_topics") or []
+    renamed = list(dict.fromkeys(canonical(t) for t in known))
+    merged += len(known) - len(renamed)
+    if renamed != known:
+        state["known_topics"] = renamed
+        # The compiled index's known set is rebuilt from the renamed topics
+        state["prereq_index"] = None
+
+    prereqs = state.get("prereq_map") or {}
+    renamed = {}
+    for topic, required in prereqs.items():
+        name = canonical(topic)
+        merged += name in renamed
+        entry = renamed.setdefault(name, [])
+        for r in map(canonical, required):
+            if r != name and r not in entry:
+                entry.append(r)
+    if renamed != prereqs:
+        state["prereq_map"] = renamed
+        # The compiled index is rebuilt from the merged map
+        state["prereq_index"] = None
+
+    progress = state.get("study_progress") or {}
+    renamed = {}
+    for topic, raw in progress.items():
+        name = canonical(topic)
+        entry = Progress(name, raw["percent"], raw["completed"])
+        if name in renamed:
+            merged += 1
+            other = Progress.load(renamed[name])
+            entry.percent = max(entry.percent, other.percent)
+            entry.completed = entry.completed or other.completed
+        renamed[name] = entry.dump()
+    if renamed != progress:
+        state["study_progress"] = renamed
+
+    schedule = state.get("review_schedule") or {}
+    renamed = {}
+    for topic, raw in schedule.items():
+        name = canonical(topic)
+        entry = {**raw, "topic": name}
+        if name in renamed:
+            merged += 1
+            entry = merge_review(None, entry, renamed[name])
+        renamed[name] = entry
+    if renamed != schedule:
+        state["review_schedule"] = renamed
+        state["review_due_heap"] = None
+
+    tasks = state.get("learning_tasks") or {}
+    renamed = {key: {**t, "topic": canonical(t["topic"])} if t.get("topic") else t for key, t in tasks.items()}
+    if renamed != tasks:
+        state["learning_tasks"] = renamed
+    return merged
+
+
+def _merge_duplicate_topics(state):
+    # Spellings that differ only in case, spacing, punctuation or plural
+    # endings are merged; similar-looking names are left for aliases
+    registry = TopicRegistry.from_state(state)
+    merge_topic_entries(state, lambda topic: registry.lookup(topic) or topic)
+
+
+def ensure_schema(state):
+    """
+    Migrates older state in place, once; a no-op for current state.
+    """
+    version = state.get("schema_version")
+    if version == SCHEMA_VERSION:
+        return
+    if version != 2:
+        state["learning_tasks"] = _migrate_tasks(state.get("learning_tasks", []))
+        state["study_progress"] = _migrate_progress(state.get("study_progress", []))
+        state["review_schedule"] = _migrate_reviews(state.get("review_schedule", []))
+        # The due-date heap is rebuilt from the migrated schedule
+        state["review_due_heap"] = None
+    _merge_duplicate_topics(state)
+    state["schema_version"] = SCHEMA_VERSION
@@ -0,0 +1,164 @@
+"""
+Offline stand-in for the Gemini models, for load tests and benchmarks.
+
+Each agent gets its own StubLlm holding a list of scripted rules. The stub
+finds the user's latest message and answers with the first rule whose regex
+matches it: either a function call (a tool, or transfer_to_agent) or text.
+Once a tool's result comes back it replies with a short text summary, which
+ends the turn like a real model would. In streaming mode text replies arrive
+as partial chunks before the full response.
+
+Select it with LEARNING_MAS_MODEL=stub. LEARNING_MAS_STUB_LATENCY_MS adds a
+delay per model call and LEARNING_MAS_STUB_SCRIPT points at a JSON file of
+rules ({agent_name: [rule, ...]}) replacing DEFAULT_SCRIPT.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+from typing import AsyncGenerator
+from google.genai import types
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+# Named like a Gemini 2 model so the built-in google_search tool accepts it
+STUB_MODEL = "gemini-2-stub"
+
+# Words per partial response when streaming text
+STREAM_CHUNK_WORDS = 4
+
+# Prefix ADK puts on other agents' turns when replaying them as user content
+FOREIGN_PREFIX = "For context:"
+
+# A rule is {"match": regex, "call": tool name, "args": {...}} or
+# {"match": regex, "text": reply}. Named groups fill {placeholders} in args
+# and text; args that are all digits are passed as integers.
+_TRANSFER = lambda agent: {"call": "transfer_to_agent", "args": {"agent_name": agent}}
+DEFAULT_SCRIPT = {
+    "manager_agent": [
+        {"match": r".*\b(tasks?|plan|schedule|finished|completed)\b.*", **_TRANSFER("academic_planning_agent")},
+        {"match": r".*\b(revise|review|reviewed|score)\b.*", **_TRANSFER("spaced_repetition_agent")},
+        {"match": r".*\b(learn|learned|prerequisite|know|next)\b.*", **_TRANSFER("dependency_agent")},
+        {"match": r".*", "text": "I can help with tasks, reviews and prerequisites."},
+    ],
+    "academic_planning_agent": [
+        {"match": r"add task (?P<task>.+) due (?P<due>\d\d-\d\d-\d{4})", "call": "add_task",
+         "args": {"task": "{task}", "due_date": "{due}"}},
+        {"match": r"i (?:finished|completed) (?P<topic>.+?) (?P<percent>\d+)%", "call": "update_study_progress",
+         "args": {"topic": "{topic}", "percent": "{percent}", "completed": False}},
+        {"match": r".*\b(plan|schedule)\b.*", "call": "generate_schedule", "args": {}},
+        {"match": r".*\btasks\b.*", "call": "list_tasks", "args": {}},
+    ],
+    "spaced_repetition_agent": [
+        {"match": r"i reviewed (?P<topic>.+?),? score (?P<score>\d)", "call": "record_review_result",
+         "args": {"topic": "{topic}", "score": "{score}"}},
+        {"match": r".*\b(revise|review)\b.*", "call": "get_due_reviews", "args": {}},
+    ],
+    "dependency_agent": [
+        {"match": r"add prerequisite (?P<required>.+) for (?P<topic>.+)", "call": "add_prerequisite",
+         "args": {"topic": "{topic}", "required": "{required}"}},
+        {"match": r"i learned (?P<topic>.+)", "call": "learned", "args": {"topic": "{topic}"}},
+        {"match": r"can i learn (?P<topic>.+?)\??", "call": "can_learn", "args": {"topic": "{topic}"}},
+        {"match": r".*\b(next|suggest)\b.*", "call": "suggest_next_topics", "args": {}},
+        {"match": r".*\bknow\b.*", "call": "list_known", "args": {}},
+    ],
+    "search_agent": [
+        {"match": r".*prerequisites to learn (?P<topic>.+?)\??",
+         "text": "Prerequisites for {topic}:\n- Basics of {topic}\n- Discrete math"},
+        {"match": r".*", "text": "No results found."},
+    ],
+}
+
+
+def _fill(value, groups: dict):
+    if not isinstance(value, str):
+        return value
+    value = value.format(**groups)
+    return int(value) if value.isdigit() else value
+
+
+class StubLlm(BaseLlm):
+    """
+    Scripted model for one agent; see the module docstring.
+    """
+
+    agent_name: str
+    rules: list = []
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        delay = (self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000
+        part = self._respond(llm_request.contents)
+        if stream and part.text:
+            # Half the delay before the first chunk, the rest spread over the others
+            words = part.text.split(" ")
+            chunks = [" ".join(words[i:i + STREAM_CHUNK_WORDS]) + " " for i in range(0, len(words), STREAM_CHUNK_WORDS)]
+            for i, chunk in enumerate(chunks):
+                await asyncio.sleep(delay / 2 if i == 0 else delay / 2 / max(1, len(chunks) - 1))
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=chunk)]), partial=True)
+        elif delay:
+            await asyncio.sleep(delay)
+        yield LlmResponse(content=types.Content(role="model", parts=[part]))
+
+    def _respond(self, contents: list) -> types.Part:
+        last = contents[-1] if contents else None
+        results = [p.function_response for p in (last.parts if last else []) if p.function_response]
+        if results:
+            return types.Part(text="; ".join(
+                f"{r.name}: {json.dumps(r.response, default=str, ensure_ascii=False)[:200]}" for r in results
+            ))
+
+        query = ""
+        for content in reversed(contents):
+            text = "".join(p.text or "" for p in content.parts or [])
+            if content.role == "user" and text and not text.startswith(FOREIGN_PREFIX):
+                query = text.strip()
+                break
+        # A sub-agent still active from an earlier turn hands unknown requests
+        # back to the manager; one that was just transferred to answers instead
+        transferred = last is not None and "".join(p.text or "" for p in last.parts or []).startswith(FOREIGN_PREFIX)
+
+        for rule in self.rules:
+            m = re.fullmatch(rule["match"], query, re.IGNORECASE | re.DOTALL)
+            if m:
+                groups = {k: v.strip() for k, v in m.groupdict().items() if v is not None}
+                if "call" in rule:
+                    args = {k: _fill(v, groups) for k, v in rule.get("args", {}).items()}
+                    return types.Part(function_call=types.FunctionCall(name=rule["call"], args=args))
+                return types.Part(text=_fill(rule["text"], groups))
+
+        if self.agent_name != "manager_agent" and not transferred:
+            return types.Part(function_call=types.FunctionCall(
+                name="transfer_to_agent", args={"agent_name": "manager_agent"}
+            ))
+        return types.Part(text=f"[{self.agent_name}] Sorry, I can't help with that.")
+
+
+def load_script() -> dict:
+    path = os.getenv("LEARNING_MAS_STUB_SCRIPT")
+    if not path:
+        return DEFAULT_SCRIPT
+    with open(path) as f:
+        return json.load(f)
+
+
+def agent_model(agent_name: str, default: str = "gemini-2.0-flash"):
+    """
+    The model for an agent: `default`, another model name from
+    LEARNING_MAS_MODEL, or a StubLlm when LEARNING_MAS_MODEL=stub.
+    """
+    model = os.getenv("LEARNING_MAS_MODEL", default)
+    if model != "stub":
+        return model
+    return StubLlm(
+        model=STUB_MODEL,
+        agent_name=agent_name,
+        rules=load_script().get(agent_name, []),
+        latency_ms=float(os.getenv("LEARNING_MAS_STUB_LATENCY_MS", "0")),
+        jitter_ms=float(os.getenv("LEARNING_MAS_STUB_JITTER_MS", "0")),
+    )
@@ -1,3 +1,8 @@
-from .dependency_agent import dependency_agent
-from .academic_planning_agent import academic_planning_agent
-from .search_agent import search_agent
\ No newline at end of file
+# Imported on first access, so importing a sibling module doesn't build the agents
+from .._lazy import lazy_exports
+
+__getattr__ = lazy_exports(__name__, {
+    "dependency_agent": ".dependency_agent",
+    "academic_planning_agent": ".academic_planning_agent",
+    "search_agent": ".search_agent",
+})
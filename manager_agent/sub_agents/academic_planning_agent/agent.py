@@ -1,130 +1,169 @@
-from datetime import datetime, timedelta
+import math
+from datetime import date
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
+from ...stub_llm import agent_model
 from ..search_agent import get_search_tool
+from ..dependency_agent.prereq_index import get_index
+from ..spaced_repetition_agent.review_index import load_schedule, due_until
+from .scheduler import plan_tasks, REVIEW_HOURS
+from ...topic_registry import resolve_topic
+from ...state_schema import (
+    Task, Progress, TASK_DATE_FORMAT, NEVER,
+    day_ordinal, format_day, today_ordinal, task_key, ensure_schema,
+)
 
 # === Tool 1: Add a learning task to the user's schedule ===
-def add_task(task: str, due_date: str, tool_context: ToolContext) -> dict:
+def add_task(task: str, due_date: str, tool_context: ToolContext, effort_hours: float = 1.0, topic: str = "") -> dict:
     """
     Adds a learning task (like 'Read Chapter 3' or 'Revise DP') to the schedule.
+    effort_hours: estimated hours of study the task needs.
+    topic: the topic the task covers, if any, so prerequisites get planned first.
     """
     try:
-        datetime.strptime(due_date, "%d-%m-%Y")
+        due = day_ordinal(due_date, TASK_DATE_FORMAT)
     except ValueError:
         return {"message": "❌ Invalid date format. Please use DD-MM-YYYY."}
+    if not math.isfinite(effort_hours) or effort_hours <= 0:
+        return {"message": "❌ Effort must be a positive number of hours."}
 
-    learning_tasks = tool_context.state.get("learning_tasks", [])
+    ensure_schema(tool_context.state)
+    learning_tasks = tool_context.state.get("learning_tasks", {})
     
-    if any(t["task"].lower() == task.lower() for t in learning_tasks):
+    if task_key(task) in learning_tasks:
         return {"message": f"⚠️ Task '{task}' already exists."}
 
-    learning_tasks.append({
-        "task": task,
-        "due_date": due_date,
-        "created_at": datetime.now().strftime("%d-%m-%Y"),
-    })
+    similar = []
+    if topic:
+        topic = resolve_topic(tool_context.state, topic, similar)
+    learning_tasks[task_key(task)] = Task(task, due, today_ordinal(), effort_hours, topic).dump()
     tool_context.state["learning_tasks"] = learning_tasks
-    return {"message": f"✅ Added task: '{task}' due by {due_date}"}
+    result = {"message": f"✅ Added task: '{task}' due by {due_date}"}
+    if similar:
+        result["similar_topics"] = similar
+    return result
 
 # === Tool 2: Generate a study plan for the week ===
-def generate_schedule(tool_context: ToolContext) -> dict:
+def generate_schedule(tool_context: ToolContext, hours_per_day: float = 2.0, days: int = 7) -> dict:
     """
-    Generates a smart weekly study plan by sorting tasks by due date.
+    Plans tasks into days of `hours_per_day` study time, earliest deadline first,
+    after today's due reviews and with prerequisite topics ahead of the topics
+    that need them. Shows the first `days` days and lists tasks that can't be
+    finished by their due date.
     Filters out tasks with invalid or missing due dates.
     """
-    learning_tasks = tool_context.state.get("learning_tasks", [])
+    if not math.isfinite(hours_per_day) or hours_per_day <= 0:
+        return {"message": "❌ Study hours per day must be positive."}
+
+    state = tool_context.state
+    ensure_schema(state)
+    learning_tasks = state.get("learning_tasks", {})
     if not learning_tasks:
         return {"message": "No tasks to schedule."}
 
-    # Validate due_date formats and filter valid tasks
-    valid_tasks = []
-    for t in learning_tasks:
-        try:
-            datetime.strptime(t["due_date"], "%d-%m-%Y")
-            valid_tasks.append(t)
-        except (ValueError, KeyError):
-            continue  # Skip if due_date is invalid or missing
+    # Tasks migrated with an unreadable due date are stored as NEVER
+    valid_tasks = [Task.load(t) for t in learning_tasks.values() if t["due"] < NEVER]
 
     if not valid_tasks:
         return {"message": "❌ All tasks have invalid or missing due dates."}
 
-    # Sort valid tasks by due date
-    sorted_tasks = sorted(
-        valid_tasks,
-        key=lambda t: datetime.strptime(t["due_date"], "%d-%m-%Y")
+    today = today_ordinal()
+    schedule, heap = load_schedule(state)
+    reviews = len(due_until(schedule, heap, today))
+    index = get_index(state) if any(t.topic for t in valid_tasks) else None
+    plan_days, planned = plan_tasks(
+        valid_tasks, today, hours_per_day, reserved_today=reviews * REVIEW_HOURS, index=index
     )
 
-    # Build weekly plan with pretty formatting
+    # Build the plan for the first few days with pretty formatting
+    due_by_task = {t.task: t.due for t in valid_tasks}
     plan = {}
-    start_date = datetime.now().date()
-    for i, task in enumerate(sorted_tasks):
-        day = (start_date + timedelta(days=i)).strftime("%A, %b %d")
-        plan.setdefault(day, []).append(f"{task['task'].capitalize()} (Due: {task['due_date']})")
+    if reviews:
+        label = date.fromordinal(today).strftime("%A, %b %d")
+        plan[label] = [f"🔁 {reviews} review(s) due today ({reviews * REVIEW_HOURS:g}h)"]
+    for day in range(today, today + max(1, days)):
+        for task, hours in plan_days.get(day, []):
+            label = date.fromordinal(day).strftime("%A, %b %d")
+            plan.setdefault(label, []).append(
+                f"{task.capitalize()} – {hours:g}h (Due: {format_day(due_by_task[task], TASK_DATE_FORMAT)})"
+            )
 
     pretty_output = "\n".join(
         f"\n📅 {day}:\n" + "\n".join(f"  {item}" for item in items)
         for day, items in plan.items()
     )
 
-    return {"weekly_plan": pretty_output}
+    result = {"weekly_plan": pretty_output}
+    later = sum(1 for t in planned if t.finish >= today + max(1, days))
+    if later:
+        last = max(t.finish for t in planned)
+        result["message"] = f"{later} more task(s) continue after this, finishing by {format_day(last, TASK_DATE_FORMAT)}."
+    late = [t for t in planned if t.late]
+    if late:
+        result["late_tasks"] = [
+            f"⚠️ {t.task}: due {format_day(t.due, TASK_DATE_FORMAT)}, earliest finish {format_day(t.finish, TASK_DATE_FORMAT)}"
+            for t in late
+        ]
+    return result
 
 # === Tool 3: Remove a task (by name) ===
 def remove_task(task: str, tool_context: ToolContext) -> dict:
-    tasks = tool_context.state.get("learning_tasks", [])
-    updated = [t for t in tasks if t["task"].lower() != task.lower()]
-    tool_context.state["learning_tasks"] = updated
+    ensure_schema(tool_context.state)
+    tasks = tool_context.state.get("learning_tasks", {})
+    tasks.pop(task_key(task), None)
+    tool_context.state["learning_tasks"] = tasks
     return {"message": f"Removed task '{task}'"}
 
 # === Tool 4: List all current learning tasks ===
 def list_tasks(tool_context: ToolContext) -> dict:
-    tasks = tool_context.state.get("learning_tasks", [])
+    ensure_schema(tool_context.state)
+    tasks = tool_context.state.get("learning_tasks", {})
     if not tasks:
         return {"message": "📭 You have no current learning tasks."}
     
     formatted = [
-        f"📌 {t['task'].capitalize()} (🗓 Due: {t['due_date']})"
-        for t in sorted(tasks, key=lambda x: datetime.strptime(x["due_date"], "%d-%m-%Y"))
+        f"📌 {t['task'].capitalize()} (🗓 Due: {format_day(t['due'], TASK_DATE_FORMAT)})"
+        for t in sorted(tasks.values(), key=lambda x: x["due"])
     ]
     return {"learning_tasks": formatted}
 
 # === Tool 5: Update study progress for a topic ===
 def update_study_progress(topic: str, percent: int, completed: bool = False, tool_context=None) -> dict:
-    progress = tool_context.state.get("study_progress", [])
+    ensure_schema(tool_context.state)
+    similar = []
+    topic = resolve_topic(tool_context.state, topic, similar)
+    progress = tool_context.state.get("study_progress", {})
     known_topics = tool_context.state.get("known_topics", [])
 
-    # Check if topic already exists in progress
-    entry = next((item for item in progress if item["topic"] == topic), None)
-
-    if entry:
-        entry.update({
-            "percent": percent,
-            "completed": completed
-        })
+    if topic in progress:
+        entry = Progress.load(progress[topic])
+        entry.percent = percent
+        entry.completed = completed
     else:
-        progress.append({
-            "topic": topic.capitalize(),
-            "percent": percent,
-            "completed": completed
-        })
+        entry = Progress(topic, percent, completed)
+    progress[topic] = entry.dump()
+
+    tool_context.state["study_progress"] = progress
 
     # Auto-sync to known_topics if completed and not already present
     if percent == 100 and topic not in known_topics:
         known_topics.append(topic)
+        tool_context.state["known_topics"] = known_topics
 
-    tool_context.state["study_progress"] = progress
-    tool_context.state["known_topics"] = known_topics
-
-    return {
+    result = {
         "message": f"Progress updated for '{topic}': {percent}% {'✅ (completed & added to known topics)' if percent == 100 else ''}"
     }
+    if similar:
+        result["similar_topics"] = similar
+    return result
 
 # === Tool 6: Suggest next topic based on study progress ===
 def suggest_next_topic(tool_context) -> dict:
-    progress = tool_context.state.get("study_progress", [])
-    pending = [t for t in progress if not t["completed"]]
-    pending_sorted = sorted(pending, key=lambda t: t["percent"])
-    if pending_sorted:
-        return {"next_topic": pending_sorted[0]["topic"]}
+    ensure_schema(tool_context.state)
+    progress = tool_context.state.get("study_progress", {})
+    pending = [t for t in progress.values() if not t["completed"]]
+    if pending:
+        return {"next_topic": min(pending, key=lambda t: t["percent"])["topic"]}
     return {"message": "All topics completed!"}
 
 
@@ -132,7 +171,7 @@ def suggest_next_topic(tool_context) -> dict:
 # === Create the Academic Planning Agent ===
 academic_planning_agent = Agent(
     name="academic_planning_agent",
-    model="gemini-2.0-flash",
+    model=agent_model("academic_planning_agent"),
     description="Helps the user create and manage a weekly learning schedule.",
     instruction="""
     You are an academic planning assistant.
@@ -141,12 +180,18 @@ academic_planning_agent = Agent(
     - Help the user build a balanced study plan for the week
     - Work with state['learning_tasks'] which contains user's tasks
 
-    Each task is a dictionary with keys: 'task', 'due_date', 'created_at'
+    Tasks are keyed by lowercase task name; each has 'task', 'due', 'created',
+    'effort' (hours) and an optional 'topic' (dates are day numbers; the tools
+    show them as DD-MM-YYYY)
 
     Examples:
     - If the user says "Add DBMS revision on Friday", use the add_task tool
     - If the user says "Remove algebra task", use the remove_task tool
     - If they ask "What's my plan this week?", use generate_schedule
+    - If the user says how long a task will take or how many hours a day they
+      can study, pass effort_hours to add_task or hours_per_day to generate_schedule
+    - If generate_schedule reports late_tasks, tell the user which tasks can't be
+      finished in time and suggest more hours per day or later due dates
 
     Never ask the user what they've already told you — use the current state.
     Be proactive in guiding their planning if they seem unsure.
@@ -157,6 +202,9 @@ academic_planning_agent = Agent(
     - percent: 80
     - completed: True if percent == 100 else False
     Then call the tool `update_study_progress` with all three parameters: topic, percent, and completed.
+    If add_task or update_study_progress returns similar_topics, the topic name
+    matched no saved topic and was added as a new one; ask whether the user
+    meant one of the similar topics.
     """,
     tools=[add_task, generate_schedule, remove_task, list_tasks, update_study_progress, suggest_next_topic, get_search_tool()],
 )
\ No newline at end of file
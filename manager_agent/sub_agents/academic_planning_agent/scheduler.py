@@ -0,0 +1,108 @@
+from dataclasses import dataclass
+from ...state_schema import NEVER
+
+# Study time is tracked in whole minutes so daily capacity adds up exactly
+MINUTES_PER_HOUR = 60
+
+# Time reserved on the first day for each review due that day
+REVIEW_HOURS = 0.25
+
+
+@dataclass(slots=True)
+class PlannedTask:
+    task: str
+    due: int
+    # Due date after pulling in the due dates of tasks that build on this one
+    deadline: int
+    start: int = 0
+    finish: int = 0
+
+    @property
+    def late(self) -> bool:
+        return self.finish > self.due
+
+
+def effective_deadlines(tasks: list, index=None) -> list[int]:
+    """
+    Each task's due date, moved up to the earliest due date of any task on a
+    topic that (directly or indirectly) requires this task's topic.
+
+    Ordering by these deadlines keeps prerequisite topics ahead of the topics
+    built on them, and still meets every deadline whenever some plan that
+    respects prerequisite order can.
+    """
+    if index is None:
+        return [t.due for t in tasks]
+
+    own = {}
+    for t in tasks:
+        v = index.ids.get(t.topic)
+        if v is not None:
+            own[v] = min(own.get(v, t.due), t.due)
+    if not own:
+        return [t.due for t in tasks]
+
+    # Only task topics and their prerequisites can receive a deadline; visit
+    # them from the most dependent down so each sees all of its dependents
+    reached, stack = set(own), list(own)
+    while stack:
+        for p in index.prereqs[stack.pop()]:
+            if p not in reached:
+                reached.add(p)
+                stack.append(p)
+    inherited = {}
+    for v in sorted(reached, key=index.ancestor_counts.__getitem__, reverse=True):
+        best = min(own.get(v, NEVER), inherited.get(v, NEVER))
+        if best == NEVER:
+            continue
+        for p in index.prereqs[v]:
+            if best < inherited.get(p, NEVER):
+                inherited[p] = best
+
+    return [
+        min(t.due, inherited.get(index.ids.get(t.topic), t.due))
+        for t in tasks
+    ]
+
+
+def plan_tasks(tasks: list, start: int, hours_per_day: float, reserved_today: float = 0.0, index=None):
+    """
+    Earliest-deadline-first plan over days of fixed study capacity.
+
+    tasks are Task records (due day ordinal, effort in hours, optional topic);
+    `reserved_today` hours on the first day go to other work such as reviews.
+    A task longer than what's left of a day continues on the next day.
+    Returns (days, planned): days maps day ordinal → [(task, hours)], and
+    planned holds a PlannedTask per task in plan order. EDF meets every
+    deadline whenever any plan can, so a late task here can't be fixed by
+    reordering — only by more hours per day, less effort or later due dates.
+    """
+    capacity = round(hours_per_day * MINUTES_PER_HOUR)
+    if capacity <= 0:
+        raise ValueError("hours_per_day must be positive")
+
+    deadlines = effective_deadlines(tasks, index)
+    if index is not None:
+        rank = lambda t: index.ancestor_counts[index.ids[t.topic]] if t.topic in index.ids else 0
+    else:
+        rank = lambda t: 0
+    order = sorted(range(len(tasks)), key=lambda i: (deadlines[i], rank(tasks[i]), tasks[i].due))
+
+    days, planned = {}, []
+    day, left = start, max(0, capacity - round(reserved_today * MINUTES_PER_HOUR))
+    for i in order:
+        t = tasks[i]
+        need = max(0, round(t.effort * MINUTES_PER_HOUR))
+        if left == 0 and need:
+            day, left = day + 1, capacity
+        item = PlannedTask(t.task, t.due, deadlines[i], start=day, finish=day)
+        while need:
+            if left == 0:
+                day, left = day + 1, capacity
+            used = min(need, left)
+            days.setdefault(day, []).append((t.task, used / MINUTES_PER_HOUR))
+            need -= used
+            left -= used
+        item.finish = day
+        planned.append(item)
+    return days, planned
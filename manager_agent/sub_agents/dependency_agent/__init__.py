@@ -1 +1,6 @@
-from .agent import dependency_agent
\ No newline at end of file
+# Imported on first access, so importing a sibling module doesn't build the agents
+from ..._lazy import lazy_exports
+
+__getattr__ = lazy_exports(__name__, {
+    "dependency_agent": ".agent",
+})
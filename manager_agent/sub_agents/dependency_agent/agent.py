@@ -1,50 +1,92 @@
 # sub_agents/dependency_agent/agent.py
+import asyncio
+import os
+import re
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
 from google.adk.tools import google_search
 from google.adk.tools.agent_tool import AgentTool
+from ...stub_llm import agent_model
 from ..search_agent import get_search_tool, search_for_prereqs
+from ..search_agent.cache import normalize_topic
+from ...state_schema import merge_topic_entries
+from ...topic_registry import get_registry, save_registry, resolve_topic, match_topic, topic_key
+from .prereq_index import get_index, save_index
+
+def _with_similar(result: dict, similar: list) -> dict:
+    # A name that matched no topic was added as a new one; these may be what was meant
+    if similar:
+        result["similar_topics"] = list(dict.fromkeys(similar))
+    return result
 
 # === Tool 1: Add a prerequisite ===
 def add_prerequisite(topic: str, required: str, tool_context: ToolContext) -> dict:
+    similar = []
+    topic = resolve_topic(tool_context.state, topic, similar)
+    required = resolve_topic(tool_context.state, required, similar)
+    index = get_index(tool_context.state)
+    if not index.add_edge(topic, required):
+        return {"message": f"❌ Can't add '{required}' → '{topic}': '{topic}' is already a prerequisite of '{required}', so this would create a cycle."}
+
     prereqs = tool_context.state.get("prereq_map", {})
     prereqs.setdefault(topic, [])
     if required not in prereqs[topic]:
         prereqs[topic].append(required)
     tool_context.state["prereq_map"] = prereqs
-    return {"message": f"Added prerequisite: '{required}' → '{topic}'"}
+    save_index(tool_context.state, index)
+    return _with_similar({"message": f"Added prerequisite: '{required}' → '{topic}'"}, similar)
 
 # === Tool 2: Remove a prerequisite ===
 def remove_prerequisite(topic: str, prereq: str, tool_context: ToolContext) -> dict:
+    topic = match_topic(tool_context.state, topic)
+    prereq = match_topic(tool_context.state, prereq)
+    index = get_index(tool_context.state)
+    index.remove_edge(topic, prereq)
+
     prereqs = tool_context.state.get("prereq_map", {})
     prereqs.setdefault(topic, [])
     if prereq in prereqs[topic]:
         prereqs[topic].remove(prereq)
     tool_context.state["prereq_map"] = prereqs
+    save_index(tool_context.state, index)
     return {"message": f"Removed '{prereq}' from prerequisites of '{topic}'"}
 
 # === Tool 3: Check if user can learn a topic ===
 def can_learn(topic: str, tool_context: ToolContext) -> dict:
-    prereqs = tool_context.state.get("prereq_map", {})
-    known = set(tool_context.state.get("known_topics", []))
-    required = set(prereqs.get(topic, []))
-    return {
-        "can_learn": required.issubset(known),
-        "missing": list(required - known),
+    # Checks indirect prerequisites too, listed in the order they can be learned
+    registry = get_registry(tool_context.state)
+    name = registry.lookup(topic)
+    missing = get_index(tool_context.state).missing(name) if name else []
+    result = {
+        "can_learn": not missing,
+        "missing": missing,
     }
+    similar = registry.similar(topic) if name is None else []
+    if similar:
+        result["similar_topics"] = similar
+    return result
 
 # === Tool 4: Mark topic as learned ===
 def learned(topic: str, tool_context: ToolContext) -> dict:
+    similar = []
+    topic = resolve_topic(tool_context.state, topic, similar)
+    index = get_index(tool_context.state)
     known = set(tool_context.state.get("known_topics", []))
     known.add(topic)
     tool_context.state["known_topics"] = list(known)
-    return {"message": f"Marked '{topic}' as learned."}
+    index.learn(topic)
+    save_index(tool_context.state, index)
+    return _with_similar({"message": f"Marked '{topic}' as learned."}, similar)
 
 # === Tool 5: Forget a topic ===
 def forget(topic: str, tool_context: ToolContext) -> dict:
+    topic = match_topic(tool_context.state, topic)
+    index = get_index(tool_context.state)
     known = set(tool_context.state.get("known_topics", []))
     known.discard(topic)
     tool_context.state["known_topics"] = list(known)
+    index.forget(topic)
+    save_index(tool_context.state, index)
     return {"message": f"Forgot topic '{topic}'."}
 
 # === Tool 6: List known topics ===
@@ -54,32 +96,42 @@ def list_known(tool_context: ToolContext) -> dict:
 # === Tool 7: List prerequisites for a topic ===
 def get_prereqs(topic: str, tool_context: ToolContext) -> dict:
     prereqs = tool_context.state.get("prereq_map", {})
-    return {"prerequisites": prereqs.get(topic, [])}
+    return {"prerequisites": prereqs.get(match_topic(tool_context.state, topic), [])}
 
 # === Tool 8: Suggest next topics based on what's learnable ===
-def suggest_next_topics(tool_context: ToolContext) -> dict:
-    prereqs = tool_context.state.get("prereq_map", {})
-    known = set(tool_context.state.get("known_topics", []))
-    suggestions = []
-    for topic, required in prereqs.items():
-        if topic not in known and set(required).issubset(known):
-            suggestions.append(topic)
-    return {"suggestions": suggestions}
+def suggest_next_topics(tool_context: ToolContext, rank_by_unlocks: bool = False) -> dict:
+    """
+    Suggests topics whose prerequisites are all known.
+    rank_by_unlocks: put first the topics that make the most other topics learnable.
+    """
+    suggestions = get_index(tool_context.state).suggest(rank=rank_by_unlocks)
+    if rank_by_unlocks:
+        return {
+            "suggestions": [topic for topic, _ in suggestions],
+            "unlocks": {topic: unlocks for topic, unlocks in suggestions},
+        }
+    return {"suggestions": [topic for topic, _ in suggestions]}
 
 # === Tool 9: Automatically update prereqs using Search Agent ===
 async def auto_update_prereqs(topic: str, tool_context: ToolContext) -> dict:
     try:
+        topic = resolve_topic(tool_context.state, topic)
         guesses = await search_for_prereqs(topic, tool_context)
-        valid_guesses = [g for g in guesses if not g.startswith("Error")]
+        registry = get_registry(tool_context.state)
+        valid_guesses = [registry.resolve(g) for g in guesses if not g.startswith("Error")]
 
         prereqs = tool_context.state.get("prereq_map", {})
 
         if valid_guesses:
+            index = get_index(tool_context.state)
             prereqs.setdefault(topic, [])
             for guess in valid_guesses:
-                if guess not in prereqs[topic]:
+                # Skip guesses that would make the prerequisite graph cyclic
+                if guess not in prereqs[topic] and index.add_edge(topic, guess):
                     prereqs[topic].append(guess)
             tool_context.state["prereq_map"] = prereqs
+            save_index(tool_context.state, index)
+            save_registry(tool_context.state, registry)
             return {
                 "message": f"Inferred prerequisites for '{topic}':\n" + "\n".join(f"- {g}" for g in valid_guesses),
                 "suggested": valid_guesses
@@ -89,10 +141,182 @@ async def auto_update_prereqs(topic: str, tool_context: ToolContext) -> dict:
     except Exception as e:
         return {"message": f"Search failed. Please manually add prerequisites for '{topic}'. Error: {e}"}
 
+# === Tool 10: Discover prerequisites for many topics at once ===
+
+# Searches running at once, and topics looked up per call at most
+DISCOVERY_CONCURRENCY = int(os.getenv("LEARNING_MAS_PREREQ_CONCURRENCY", "8"))
+MAX_DISCOVERED_TOPICS = 500
+
+# Search result lines longer than this are prose, not topic names
+MAX_TOPIC_CHARS = 80
+
+_BULLET = re.compile(r"^\s*(?:[-•*]|\d+[.)])\s*")
+
+
+def _prereq_names(guesses: list, topic: str) -> list:
+    # Topic names from search result lines, without bullets and headings
+    names = []
+    for guess in guesses:
+        if guess.startswith("Error"):
+            continue
+        name = _BULLET.sub("", guess).strip()
+        if (not name or name.endswith(":") or len(name) > MAX_TOPIC_CHARS
+                or normalize_topic(name) == normalize_topic(topic) or name in names):
+            continue
+        names.append(name)
+    return names
+
+
+def _unseen(topics: list, seen: set) -> list:
+    fresh = []
+    for topic in topics:
+        key = normalize_topic(topic)
+        if key and key not in seen and len(seen) < MAX_DISCOVERED_TOPICS:
+            seen.add(key)
+            fresh.append(topic.strip())
+    return fresh
+
+
+async def auto_update_prereqs_many(topics: list[str], tool_context: ToolContext, max_depth: int = 1) -> dict:
+    """
+    Looks up prerequisites for many topics concurrently, then for the
+    prerequisites found, up to max_depth levels further, and saves them all
+    to prereq_map at once.
+    """
+    limit = asyncio.Semaphore(DISCOVERY_CONCURRENCY)
+
+    async def lookup(topic):
+        async with limit:
+            try:
+                return await search_for_prereqs(topic, tool_context)
+            except Exception as e:
+                return [f"Error searching: {e}"]
+
+    registry = get_registry(tool_context.state)
+    requested = {topic: registry.resolve(topic) for topic in topics}
+    found, failed = {}, []
+    seen = set()
+    level = _unseen(list(requested.values()), seen)
+    for depth in range(max_depth + 1):
+        results = await asyncio.gather(*(lookup(topic) for topic in level))
+        discovered = []
+        for topic, guesses in zip(level, results):
+            names = [n for n in dict.fromkeys(map(registry.resolve, _prereq_names(guesses, topic))) if n != topic]
+            if names:
+                found[topic] = names
+                discovered.extend(names)
+            elif any(g.startswith("Error") for g in guesses):
+                failed.append(topic)
+        level = _unseen(discovered, seen) if depth < max_depth else []
+        if not level:
+            break
+
+    # Merge everything with one index pass and one state write
+    prereqs = tool_context.state.get("prereq_map", {})
+    index = get_index(tool_context.state)
+    added, rejected = 0, 0
+    for topic, names in found.items():
+        for name in names:
+            if name in prereqs.get(topic, []):
+                continue
+            # Skip prerequisites that would make the graph cyclic
+            if index.add_edge(topic, name):
+                prereqs.setdefault(topic, []).append(name)
+                added += 1
+            else:
+                rejected += 1
+    if added:
+        tool_context.state["prereq_map"] = prereqs
+        save_index(tool_context.state, index)
+        save_registry(tool_context.state, registry)
+
+    message = f"Looked up {len(seen)} topics and added {added} prerequisites."
+    if rejected:
+        message += f" Skipped {rejected} that would make the graph circular."
+    if failed:
+        message += f" Search failed for: {', '.join(failed)}."
+    return {
+        "message": message,
+        "prerequisites": {topic: found[name] for topic, name in requested.items() if name in found},
+        "failed": failed,
+    }
+
+# === Tool 11: Record another name for a topic ===
+def add_topic_alias(alias: str, topic: str, tool_context: ToolContext) -> dict:
+    """
+    Records that `alias` (e.g. 'graph theory') names the same topic as
+    `topic` (e.g. 'Graphs'). Anything already saved under the alias is
+    merged into the topic.
+    """
+    state = tool_context.state
+    registry = get_registry(state)
+    canonical = registry.add_alias(alias, topic)
+    aliases = state.get("topic_aliases", {})
+    aliases[topic_key(alias)] = canonical
+    state["topic_aliases"] = aliases
+    save_registry(state, registry)
+
+    merged = merge_topic_entries(state, lambda t: registry.lookup(t) or t)
+    message = f"'{alias}' now refers to '{canonical}'."
+    if merged:
+        message += f" Merged {merged} saved entries into '{canonical}'."
+    return {"message": message}
+
+# === Tool 12: Plan the path to a topic ===
+
+# Topics listed in a plan at most, and hours a topic takes when no task says
+MAX_PATH_TOPICS = 100
+DEFAULT_TOPIC_HOURS = 1.0
+
+
+def _hours_left(state):
+    # Hours still needed per topic: its tasks' effort, less the share studied
+    effort = {}
+    for task in (state.get("learning_tasks") or {}).values():
+        if task.get("topic"):
+            effort[task["topic"]] = effort.get(task["topic"], 0.0) + task.get("effort", DEFAULT_TOPIC_HOURS)
+    progress = state.get("study_progress") or {}
+
+    def hours(topic):
+        percent = progress[topic]["percent"] if topic in progress else 0
+        return effort.get(topic, DEFAULT_TOPIC_HOURS) * max(0, 100 - percent) / 100
+
+    return hours
+
+
+def plan_learning_path(topic: str, tool_context: ToolContext, use_progress: bool = False) -> dict:
+    """
+    Lists, in order, the topics to learn to get to `topic` from what the
+    user knows: its missing prerequisites (direct and indirect, skipping
+    those of topics already known), ending with the topic itself.
+    use_progress: when several topics could come next, put first the one
+    with the fewest hours left, from study progress and task effort.
+    """
+    state = tool_context.state
+    registry = get_registry(state)
+    name = registry.lookup(topic)
+    if name is None:
+        result = {"message": f"⚠️ '{topic}' isn't a known topic. Add its prerequisites first."}
+        similar = registry.similar(topic)
+        if similar:
+            result["similar_topics"] = similar
+        return result
+
+    hours = _hours_left(state) if use_progress else None
+    path = get_index(state).learning_path(name, hours)
+    if not path:
+        return {"message": f"✅ You already know '{name}'."}
+    result = {"topic": name, "path": path[:MAX_PATH_TOPICS], "steps": len(path)}
+    if len(path) > MAX_PATH_TOPICS:
+        result["message"] = f"Showing the first {MAX_PATH_TOPICS} of {len(path)} steps."
+    if hours is not None:
+        result["hours_left"] = round(sum(map(hours, path)), 1)
+    return result
+
 # === Create the Dependency Agent ===
 dependency_agent = Agent(
     name="dependency_agent",
-    model="gemini-2.0-flash",
+    model=agent_model("dependency_agent"),
     description="Helps users understand and navigate topic dependencies",
     instruction="""
     You are a learning path architect.
@@ -107,6 +331,24 @@ dependency_agent = Agent(
     - Remember what the user has learned or forgotten
     - Automatically infer dependencies via web search
 
+    can_learn reports every missing prerequisite, including prerequisites of
+    prerequisites, in the order they should be learned. When the user asks how
+    to get to a topic or what to study first, call plan_learning_path; it skips
+    prerequisites of topics they already know. Pass use_progress=True if they
+    want the quickest wins first or mention progress and effort. Prerequisites
+    that would make the graph circular are rejected; explain this to the user.
+    If the user wants the most useful next topic, call suggest_next_topics with
+    rank_by_unlocks=True.
+    To infer prerequisites for several topics (e.g. a whole syllabus), call
+    auto_update_prereqs_many once with the list instead of auto_update_prereqs
+    per topic.
+    Topic names are matched regardless of case and plurals, but not typos. If
+    a tool returns similar_topics, the name matched no topic (add_prerequisite
+    and learned saved it as a new one): ask whether the user meant one of
+    them, and if so call add_topic_alias to merge the new name. If the user
+    says two names mean the same topic (e.g. "graph theory" is "Graphs"), call
+    add_topic_alias.
+
     Never hardcode dependencies — evolve them based on user feedback.
     If you can't find a dependency, ask the user directly.
     """,
@@ -120,6 +362,9 @@ dependency_agent = Agent(
         get_prereqs,
         suggest_next_topics,
         auto_update_prereqs,
+        auto_update_prereqs_many,
+        add_topic_alias,
+        plan_learning_path,
         get_search_tool()
     ],
 )
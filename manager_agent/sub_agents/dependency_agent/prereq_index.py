@@ -0,0 +1,394 @@
+import heapq
+import uuid
+from collections import OrderedDict, deque
+
+# Compiled indexes kept in memory, keyed by the graph id stamped into state
+MAX_CACHED_INDEXES = 8
+_indexes = OrderedDict()
+
+# Learning paths remembered per index
+MAX_CACHED_PATHS = 64
+
+
+def _bit_ids(mask: int) -> list[int]:
+    # Scanning the binary string runs in C, unlike repeated big-int shifts
+    bits = bin(mask)[:1:-1]
+    ids, i = [], bits.find("1")
+    while i != -1:
+        ids.append(i)
+        i = bits.find("1", i + 1)
+    return ids
+
+
+class PrereqIndex:
+    """
+    Compiled DAG over prereq_map.
+
+    Every topic gets a dense integer id and an ancestor bitset (all direct and
+    indirect prerequisites), so the full missing set of a topic is one AND-NOT
+    against the known-topics mask. Edge and known-topic changes update the
+    bitsets in place instead of rebuilding them.
+
+    It also keeps reverse edges and a count of unmet direct prerequisites per
+    topic, so the learnable frontier changes only around the topic that was
+    learned, forgotten or re-linked.
+
+    Learning paths are remembered per target with the topics they depend on,
+    and dropped only when one of those is re-linked, learned or forgotten.
+    """
+
+    def __init__(self, prereq_map: dict):
+        self.graph_id = uuid.uuid4().hex
+        self.rev = 0
+        self.ids = {}
+        self.names = []
+        self.prereqs = []
+        self.dependents = []
+        self.ancestors = []
+        # popcount of each ancestor bitset; sorting by it gives a topological order
+        self.ancestor_counts = []
+        self.known_mask = 0
+        self.known = set()
+        self.known_names = set()
+        # Sum of the known names' hashes, kept as topics are learned and
+        # forgotten; any change to the set changes it
+        self._known_hash = 0
+        # Topics listed as keys of prereq_map; only these are ever suggested
+        self.listed = set()
+        self.unmet = []
+        self.frontier = set()
+        # target id → [path ids, ids the path depends on, path names, and the
+        # costs and cheapest-first order last asked for]
+        self.paths = OrderedDict()
+
+        for topic, required in prereq_map.items():
+            t = self._id(topic)
+            self.listed.add(t)
+            for r in map(self._id, required):
+                if r != t:
+                    self.prereqs[t].add(r)
+                    self.dependents[r].add(t)
+        self._build()
+        self.unmet = [len(p) for p in self.prereqs]
+        self.frontier = {v for v in self.listed if not self.unmet[v]}
+
+    def _id(self, topic: str) -> int:
+        if topic not in self.ids:
+            self.ids[topic] = len(self.names)
+            self.names.append(topic)
+            self.prereqs.append(set())
+            self.dependents.append(set())
+            self.ancestors.append(0)
+            self.ancestor_counts.append(0)
+            self.unmet.append(0)
+            if topic in self.known_names:
+                self.known.add(self.ids[topic])
+                self.known_mask |= 1 << self.ids[topic]
+        return self.ids[topic]
+
+    def _list(self, v: int):
+        if v not in self.listed:
+            self.listed.add(v)
+            if not self.unmet[v] and v not in self.known:
+                self.frontier.add(v)
+
+    def _set_ancestors(self, v: int, mask: int):
+        self.ancestors[v] = mask
+        self.ancestor_counts[v] = mask.bit_count()
+
+    def _build(self):
+        # Kahn's algorithm: each topic is closed after all of its prerequisites
+        pending = [len(p) for p in self.prereqs]
+        queue = deque(i for i, n in enumerate(pending) if n == 0)
+        done = 0
+        while queue:
+            v = queue.popleft()
+            done += 1
+            mask = 0
+            for p in self.prereqs[v]:
+                mask |= (1 << p) | self.ancestors[p]
+            self._set_ancestors(v, mask)
+            for d in self.dependents[v]:
+                pending[d] -= 1
+                if pending[d] == 0:
+                    queue.append(d)
+
+        # Topics on a cycle (only possible in maps saved before cycle checks)
+        # get their reachability by plain search
+        if done < len(self.names):
+            for v in (i for i, n in enumerate(pending) if n > 0):
+                mask, stack = 0, list(self.prereqs[v])
+                while stack:
+                    p = stack.pop()
+                    if not (mask >> p) & 1:
+                        mask |= 1 << p
+                        stack.extend(self.prereqs[p])
+                self._set_ancestors(v, mask)
+
+    def stamp(self) -> dict:
+        return {"id": self.graph_id, "rev": self.rev}
+
+    # --- Known topics ---
+
+    def sync_known(self, known: list):
+        # Other writers (study progress, imports, alias merges, another
+        # process) may rename or swap topics without changing the count, so
+        # the names themselves are compared
+        names = set(known)
+        if sum(map(hash, names)) != self._known_hash:
+            for topic in names - self.known_names:
+                self._learn(topic)
+            for topic in self.known_names - names:
+                self._forget(topic)
+
+    def learn(self, topic: str):
+        self._learn(topic)
+
+    def forget(self, topic: str):
+        self._forget(topic)
+
+    def _learn(self, topic: str):
+        if topic in self.known_names:
+            return
+        self.known_names.add(topic)
+        self._known_hash += hash(topic)
+        if topic not in self.ids:
+            return
+        v = self.ids[topic]
+        self._drop_paths(v)
+        self.known.add(v)
+        self.known_mask |= 1 << v
+        self.frontier.discard(v)
+        for d in self.dependents[v]:
+            self.unmet[d] -= 1
+            if not self.unmet[d] and d in self.listed and d not in self.known:
+                self.frontier.add(d)
+
+    def _forget(self, topic: str):
+        if topic not in self.known_names:
+            return
+        self.known_names.discard(topic)
+        self._known_hash -= hash(topic)
+        if topic not in self.ids:
+            return
+        v = self.ids[topic]
+        self._drop_paths(v)
+        self.known.discard(v)
+        self.known_mask &= ~(1 << v)
+        for d in self.dependents[v]:
+            if not self.unmet[d]:
+                self.frontier.discard(d)
+            self.unmet[d] += 1
+        if v in self.listed and not self.unmet[v]:
+            self.frontier.add(v)
+
+    # --- Edges ---
+
+    def would_cycle(self, topic: str, required: str) -> bool:
+        if topic == required:
+            return True
+        if topic not in self.ids or required not in self.ids:
+            return False
+        return bool((self.ancestors[self.ids[required]] >> self.ids[topic]) & 1)
+
+    def add_edge(self, topic: str, required: str) -> bool:
+        """
+        Adds `required` as a prerequisite of `topic`. Returns False (and changes
+        nothing) if the edge would create a cycle.
+        """
+        if self.would_cycle(topic, required):
+            return False
+        t, r = self._id(topic), self._id(required)
+        self._list(t)
+        if r in self.prereqs[t]:
+            return True
+        self._drop_paths(t)
+        self.prereqs[t].add(r)
+        self.dependents[r].add(t)
+        if r not in self.known:
+            self.unmet[t] += 1
+            self.frontier.discard(t)
+
+        # Push the new ancestors down to topic and its dependents, stopping at
+        # any topic that already had them
+        gain = (1 << r) | self.ancestors[r]
+        queue = deque([t])
+        while queue:
+            v = queue.popleft()
+            merged = self.ancestors[v] | gain
+            if merged != self.ancestors[v]:
+                self._set_ancestors(v, merged)
+                queue.extend(self.dependents[v])
+        return True
+
+    def remove_edge(self, topic: str, required: str):
+        t = self._id(topic)
+        self._list(t)
+        if required not in self.ids:
+            return
+        r = self.ids[required]
+        if r not in self.prereqs[t]:
+            return
+        self._drop_paths(t)
+        self.prereqs[t].discard(r)
+        self.dependents[r].discard(t)
+        if r not in self.known:
+            self.unmet[t] -= 1
+            if not self.unmet[t] and t not in self.known:
+                self.frontier.add(t)
+
+        # Recompute topic, then the dependents of each topic whose ancestors
+        # shrank, stopping where they didn't (usually at topic itself, when
+        # required is still reached through another prerequisite). Fewer
+        # ancestors means earlier in topological order, so taking topics by
+        # their count before the removal recomputes prerequisites first.
+        heap, queued = [(self.ancestor_counts[t], t)], {t}
+        while heap:
+            v = heapq.heappop(heap)[1]
+            mask = 0
+            for p in self.prereqs[v]:
+                mask |= (1 << p) | self.ancestors[p]
+            if mask == self.ancestors[v]:
+                continue
+            self._set_ancestors(v, mask)
+            for d in self.dependents[v]:
+                if d not in queued:
+                    queued.add(d)
+                    heapq.heappush(heap, (self.ancestor_counts[d], d))
+
+    # --- Queries ---
+
+    def missing(self, topic: str) -> list[str]:
+        """
+        All direct and indirect prerequisites of topic that aren't known,
+        in an order they can be learned.
+        """
+        if topic not in self.ids:
+            return []
+        ids = _bit_ids(self.ancestors[self.ids[topic]] & ~self.known_mask)
+        ids.sort(key=self.ancestor_counts.__getitem__)
+        return [self.names[i] for i in ids]
+
+    def suggest(self, rank: bool = False) -> list[tuple[str, int]]:
+        """
+        Listed topics that aren't known and whose direct prerequisites all are.
+        With rank=True they're ordered by how many topics learning them would
+        make learnable next; each item is (topic, unlocks).
+        """
+        if not rank:
+            return [(self.names[v], None) for v in sorted(self.frontier)]
+        unlocks = {
+            v: sum(1 for d in self.dependents[v] if self.unmet[d] == 1 and d not in self.known)
+            for v in self.frontier
+        }
+        order = sorted(self.frontier, key=lambda v: (-unlocks[v], v))
+        return [(self.names[v], unlocks[v]) for v in order]
+
+    # --- Learning paths ---
+
+    def _drop_paths(self, v: int):
+        if self.paths:
+            for target in [t for t, entry in self.paths.items() if v in entry[1]]:
+                del self.paths[target]
+
+    def _needed(self, t: int) -> tuple[set, set]:
+        # Unknown ancestors of t that can be reached without passing through a
+        # known topic (a known topic's prerequisites count as known), and the
+        # known topics where the search stopped
+        if not self.ancestors[t] & self.known_mask:
+            needed, stopped = set(_bit_ids(self.ancestors[t])), set()
+        else:
+            needed, stopped, stack = set(), set(), [t]
+            while stack:
+                for p in self.prereqs[stack.pop()]:
+                    if p in self.known:
+                        stopped.add(p)
+                    elif p not in needed:
+                        needed.add(p)
+                        stack.append(p)
+        # t is its own ancestor only on a cycle saved before cycle checks
+        needed.discard(t)
+        return needed, stopped
+
+    def learning_path(self, topic: str, cost=None) -> list[str]:
+        """
+        The topics to learn, in an order they can be learned, to be ready for
+        topic: its unknown prerequisites, direct and indirect, except those
+        only needed for topics already known, then topic itself. Empty if
+        topic is known.
+
+        With cost (a function of topic name → hours still needed), whenever
+        several topics could come next the cheapest goes first.
+        """
+        if topic in self.known_names:
+            return []
+        if topic not in self.ids:
+            return [topic]
+        t = self.ids[topic]
+        if t not in self.paths:
+            needed, stopped = self._needed(t)
+            path = sorted(needed, key=self.ancestor_counts.__getitem__) + [t]
+            self.paths[t] = [path, needed.union(stopped, (t,)), [self.names[v] for v in path], None, None]
+            while len(self.paths) > MAX_CACHED_PATHS:
+                self.paths.popitem(last=False)
+        self.paths.move_to_end(t)
+        entry = self.paths[t]
+        path, _, names, costs, cheapest = entry
+        if cost is None:
+            return list(names)
+
+        # Reordered only when the costs along the path changed
+        new_costs = tuple(map(cost, names))
+        if new_costs != costs:
+            order = self._cheapest_first(path, dict(zip(path, new_costs)))
+            cheapest = entry[4] = [self.names[v] for v in order]
+            entry[3] = new_costs
+        return list(cheapest)
+
+    def _cheapest_first(self, path: list, costs: dict) -> list:
+        # Kahn's algorithm over the path's topics, taking the cheapest ready one
+        unmet = {v: sum(1 for p in self.prereqs[v] if p in costs) for v in path}
+        ready = [(costs[v], self.ancestor_counts[v], v) for v in path if not unmet[v]]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            v = heapq.heappop(ready)[2]
+            order.append(v)
+            for d in self.dependents[v]:
+                if d in unmet:
+                    unmet[d] -= 1
+                    if not unmet[d]:
+                        heapq.heappush(ready, (costs[d], self.ancestor_counts[d], d))
+        return order
+
+    def topological_order(self) -> list[str]:
+        # A topic always has strictly more ancestors than any of its prerequisites
+        order = sorted(range(len(self.names)), key=self.ancestor_counts.__getitem__)
+        return [self.names[i] for i in order]
+
+
+def get_index(state) -> PrereqIndex:
+    """
+    Returns the compiled index for this state's prereq_map, rebuilding it only
+    when the state's stamp doesn't match an index held in memory.
+    """
+    stamp = state.get("prereq_index") or {}
+    index = _indexes.get(stamp.get("id"))
+    if index is None or index.rev != stamp.get("rev"):
+        _indexes.pop(stamp.get("id"), None)
+        index = PrereqIndex(state.get("prereq_map", {}))
+        _indexes[index.graph_id] = index
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+        state["prereq_index"] = index.stamp()
+    _indexes.move_to_end(index.graph_id)
+    index.sync_known(state.get("known_topics", []))
+    return index
+
+
+def save_index(state, index: PrereqIndex):
+    """
+    Marks a change made through the index so the next call reuses it.
+    """
+    index.rev += 1
+    state["prereq_index"] = index.stamp()
@@ -1 +1,9 @@
-from .agent import get_search_tool, search_for_prereqs, search_agent
\ No newline at end of file
+# Imported on first access, so importing a sibling module doesn't build the agents
+from ..._lazy import lazy_exports
+
+__getattr__ = lazy_exports(__name__, {
+    "get_search_tool": ".agent",
+    "search_for_prereqs": ".agent",
+    "search_agent": ".agent",
+    "prereq_cache": ".cache",
+})
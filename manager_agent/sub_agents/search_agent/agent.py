@@ -1,11 +1,16 @@
 # agents/search_agent.py
 from google.adk.agents import Agent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
 from google.adk.tools import google_search
 from google.adk.tools.agent_tool import AgentTool
+from ...stub_llm import agent_model
+from google.genai import types
+from .cache import prereq_cache
 
 search_agent = Agent(
     name="search_agent",
-    model="gemini-2.0-flash",
+    model=agent_model("search_agent"),
     description="An agent that performs reliable web searches and returns helpful summaries.",
     instruction="""
     You are a helpful research assistant.
@@ -23,17 +28,46 @@ search_tool = AgentTool(search_agent)
 def get_search_tool():
     return search_tool
 
+PREREQ_QUERY = "What are the prerequisites to learn {topic}?"
+
+# Searches made from tools run the agent in throwaway sessions of their own,
+# so the user's state isn't copied into them
+SEARCH_USER = "search"
+search_runner = Runner(app_name=search_agent.name, agent=search_agent, session_service=InMemorySessionService())
+
+
+async def run_search(query: str) -> str:
+    """
+    Asks the search agent `query` and returns the text of its final answer.
+    """
+    sessions = search_runner.session_service
+    session = sessions.create_session(app_name=search_runner.app_name, user_id=SEARCH_USER)
+    message = types.Content(role="user", parts=[types.Part(text=query)])
+    text = ""
+    try:
+        async for event in search_runner.run_async(user_id=SEARCH_USER, session_id=session.id, new_message=message):
+            if event.is_final_response() and event.content and event.content.parts:
+                text = "".join(part.text or "" for part in event.content.parts)
+    finally:
+        sessions.delete_session(app_name=search_runner.app_name, user_id=SEARCH_USER, session_id=session.id)
+    return text
+
+
 # Optional: utility function for delegation
 async def search_for_prereqs(topic: str, tool_context) -> list[str]:
-    try:
-        result = await tool_context.call_tool(search_tool, input=f"What are the prerequisites to learn {topic}?")
-        text = result.get("text") or result.get("results") or result.get("summary") or ""
-        
+    async def fetch():
+        text = await run_search(PREREQ_QUERY.format(topic=topic))
+
         # Optional: attempt to split into list (naive fallback)
         lines = [line.strip() for line in text.split("\n") if line.strip()]
         guesses = [line for line in lines if "prerequisite" in line.lower() or "-" in line or "•" in line]
 
         return guesses if guesses else [text[:300] + "..." if len(text) > 300 else text]
+
+    # Repeated topics are answered from the persistent cache instead of a new search
+    try:
+        value, ok = await prereq_cache.get_or_fetch(topic, PREREQ_QUERY, fetch)
     except Exception as e:
+        # Errors the cache doesn't keep (see cache.UNCACHED_ERRORS)
         return [f"Error searching: {e}"]
-    
+    return value if ok else [f"Error searching: {value}"]
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Successful lookups are kept for a week, failed ones retried after 10 minutes
+DEFAULT_TTL = 7 * 24 * 3600
+NEGATIVE_TTL = 600
+MAX_ENTRIES = 5000
+
+# Errors from bugs rather than from the search: raised to every caller and
+# never cached, so a fix takes effect at once
+UNCACHED_ERRORS = (AttributeError, TypeError, NameError)
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.casefold().split())
+
+
+class PrereqCache:
+    """
+    SQLite-backed cache for search results, keyed on normalized topic + query template.
+
+    Entries expire after a TTL, the least recently used ones are evicted past
+    `max_entries`, failed lookups are cached for a shorter time, and
+    concurrent lookups of the same key share one in-flight request. SQLite
+    is only used from worker threads, never on the event loop.
+    """
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL, negative_ttl: float = NEGATIVE_TTL,
+                 max_entries: int = MAX_ENTRIES):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._stats = {"hits": 0, "misses": 0, "negative_hits": 0, "expired": 0, "evictions": 0, "collapsed": 0}
+        self.path = path
+        self._conn = None
+
+    def _db(self) -> sqlite3.Connection:
+        # Opened on first use (with the lock held), so importing the module
+        # creates no file
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            with conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS search_cache (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        ok INTEGER NOT NULL,
+                        expires_at REAL NOT NULL,
+                        last_used REAL NOT NULL
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_search_cache_lru ON search_cache (last_used)")
+            self._conn = conn
+        return self._conn
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._db().execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+        return {**self._stats, "size": size}
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock, self._db() as conn:
+            row = conn.execute(
+                "SELECT value, ok, expires_at FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[2] <= now:
+                conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                self._stats["expired"] += 1
+                return None
+            conn.execute("UPDATE search_cache SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0]), bool(row[1])
+
+    def _put(self, key, value, ok: bool):
+        now = time.time()
+        ttl = self.ttl if ok else self.negative_ttl
+        with self._lock, self._db() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, value, ok, expires_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(value), int(ok), now + ttl, now),
+            )
+            overflow = conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM search_cache WHERE key IN "
+                    "(SELECT key FROM search_cache ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+                self._stats["evictions"] += overflow
+
+    async def get_or_fetch(self, topic: str, template: str, fetch) -> tuple:
+        """
+        Returns (value, ok) for the topic, calling `fetch()` only on a miss.
+        A `fetch` that raises is cached as a failed lookup with the error
+        text, except for UNCACHED_ERRORS, which are raised.
+        """
+        key = template + "\x00" + normalize_topic(topic)
+        cached = await asyncio.to_thread(self._get, key)
+        if cached is not None:
+            self._stats["hits" if cached[1] else "negative_hits"] += 1
+            return cached
+
+        if key in self._inflight:
+            self._stats["collapsed"] += 1
+            return await asyncio.shield(self._inflight[key])
+
+        self._stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            try:
+                result = (await fetch(), True)
+            except UNCACHED_ERRORS:
+                raise
+            except Exception as e:
+                result = (str(e), False)
+            await asyncio.to_thread(self._put, key, *result)
+            future.set_result(result)
+            return result
+        except UNCACHED_ERRORS as e:
+            # Waiters get the same error; marked retrieved in case there are none
+            future.set_exception(e)
+            future.exception()
+            raise
+        except BaseException:
+            # Cancelled mid-flight: waiters are cancelled too and nothing is cached
+            future.cancel()
+            raise
+        finally:
+            del self._inflight[key]
+
+
+prereq_cache = PrereqCache(os.getenv("LEARNING_MAS_SEARCH_CACHE", "./search_cache.db"))
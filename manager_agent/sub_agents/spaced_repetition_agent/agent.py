@@ -1,126 +1,244 @@
-from datetime import datetime, timedelta
+from datetime import date, timedelta
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
+from ...stub_llm import agent_model
+from ...state_schema import Review, REVIEW_DATE_FORMAT, format_day, today_ordinal
+from ...topic_registry import match_topic
+from .review_index import load_schedule, save_schedule, push_due, due_until
+from .review_fit import MIN_FIT_REVIEWS, fit_schedule_params
+from .review_scheduler import SM2Scheduler, get_scheduler
+
+# Days forecast_reviews looks ahead at most
+MAX_FORECAST_DAYS = 365
 
 # This function checks if a topic is either in the known topics list or scheduled for review.
 def is_known_or_scheduled(topic: str, state: dict) -> bool:
     known = state.get("known_topics", [])
-    scheduled = [t["topic"] for t in state.get("review_schedule", [])]
-    return topic in known or topic in scheduled
+    schedule, _ = load_schedule(state)
+    return topic in known or topic in schedule
+
+def _new_entry(topic: str, today: int, scheduler: SM2Scheduler) -> Review:
+    return Review(topic, last=today, due=today + 1, easiness=scheduler.start_easiness(topic))
 
 # === Tool 1: Record a review result and apply SM-2 logic ===
 def record_review_result(topic: str, score: int, tool_context: ToolContext) -> dict:
     """
-    Record a spaced repetition result using SM-2 algorithm.
+    Record a spaced repetition result using SM-2 algorithm (with the user's
+    fitted parameters once tune_review_schedule has run).
     score: integer between 0–5 (5 = perfect recall, 0 = complete blackout)
     """
+    topic = match_topic(tool_context.state, topic)
     if not is_known_or_scheduled(topic, tool_context.state):
         return {"message": f"⚠️ You need to learn '{topic}' first before reviewing it."}
 
-    schedule = tool_context.state.get("review_schedule", [])
-    today = datetime.now().date()
-    topic_entry = next((t for t in schedule if t["topic"] == topic), None)
-
-    if not topic_entry:
-        topic_entry = {
-            "topic": topic,
-            "last_reviewed": str(today),
-            "next_review_due": str(today + timedelta(days=1)),
-            "interval": 1,
-            "repetition": 1,
-            "easiness": 2.5,
-            "history": [],
-        }
-        schedule.append(topic_entry)
-
-    if score < 3:
-        topic_entry["repetition"] = 0
-        topic_entry["interval"] = 1
-    else:
-        topic_entry["repetition"] += 1
-        if topic_entry["repetition"] == 1:
-            topic_entry["interval"] = 1
-        elif topic_entry["repetition"] == 2:
-            topic_entry["interval"] = 6
-        else:
-            topic_entry["interval"] = int(
-                round(topic_entry["interval"] * topic_entry["easiness"])
-            )
-
-        # Update easiness factor
-        ef = topic_entry["easiness"]
-        ef += 0.1 - (5 - score) * (0.08 + (5 - score) * 0.02)
-        topic_entry["easiness"] = max(1.3, ef)
-
-    topic_entry["last_reviewed"] = str(today)
-    topic_entry["next_review_due"] = str(today + timedelta(days=topic_entry["interval"]))
-    topic_entry["history"].append({"date": str(today), "score": score})
-
-    tool_context.state["review_schedule"] = schedule
+    schedule, heap = load_schedule(tool_context.state)
+    scheduler = get_scheduler(tool_context.state)
+    today = today_ordinal()
+    entry = Review.load(schedule[topic]) if topic in schedule else _new_entry(topic, today, scheduler)
+
+    repetition, interval, easiness = scheduler.review(
+        [topic], [entry.repetition], [entry.interval], [entry.easiness], [score]
+    )
+    entry.repetition = int(repetition[0])
+    entry.interval = int(interval[0])
+    entry.easiness = float(easiness[0])
+    entry.last = today
+    entry.due = today + entry.interval
+    entry.history.append([today, score])
+
+    schedule[topic] = entry.dump()
+    push_due(heap, topic, schedule[topic])
+    save_schedule(tool_context.state, schedule, heap)
     return {
-        "message": f"Review recorded for '{topic}' with score {score}. Next review in {topic_entry['interval']} days."
+        "message": f"Review recorded for '{topic}' with score {score}. Next review in {entry.interval} days."
     }
 
 # === Tool 2: Get topics due for review today ===
-def get_due_reviews(tool_context: ToolContext) -> dict:
-    today = datetime.now().date()
-    schedule = tool_context.state.get("review_schedule", [])
-    due = []
-    for t in schedule:
-        try:
-            due_date = datetime.strptime(t["next_review_due"], "%Y-%m-%d").date()
-            if due_date <= today:
-                due.append(t["topic"])
-        except (KeyError, ValueError):
-            # Ignore or log broken/missing date entries
-            continue
-        
+def get_due_reviews(tool_context: ToolContext, days_ahead: int = 0) -> dict:
+    """
+    Lists topics due for review, most overdue first.
+    days_ahead: also include topics due within this many days from today.
+    """
+    schedule, heap = load_schedule(tool_context.state)
+    last_day = today_ordinal() + max(0, days_ahead)
+    due = due_until(schedule, heap, last_day)
+
     if not due:
+        if days_ahead:
+            return {"message": f"✅ Nothing is due for review in the next {days_ahead} days."}
         return {"message": "✅ You're all caught up! No topics are due for review today."}
     
     return {"due_topics": due}
 
 # === Tool 3: View review history for a topic ===
 def view_review_history(topic: str, tool_context: ToolContext) -> dict:
+    topic = match_topic(tool_context.state, topic)
     if not is_known_or_scheduled(topic, tool_context.state):
         return {"message": f"⚠️ You need to learn '{topic}' first before reviewing it."}
 
-    schedule = tool_context.state.get("review_schedule", [])
-    topic_entry = next((t for t in schedule if t["topic"] == topic), None)
-    if topic_entry:
-        return {"history": sorted(topic_entry["history"], key=lambda x: x["date"], reverse=True)}
+    schedule, _ = load_schedule(tool_context.state)
+    if topic in schedule:
+        history = sorted(schedule[topic]["history"], reverse=True)
+        return {"history": [
+            {"date": format_day(day, REVIEW_DATE_FORMAT), "score": score} for day, score in history
+        ]}
     return {"message": f"No review history found for '{topic}'"}
 
 # === Tool 4: Reset spaced repetition progress for a topic ===
 def reset_schedule(topic: str, tool_context: ToolContext) -> dict:
+    topic = match_topic(tool_context.state, topic)
     if not is_known_or_scheduled(topic, tool_context.state):
         return {"message": f"⚠️ You need to learn '{topic}' first before reviewing it."}
 
-    schedule = tool_context.state.get("review_schedule", [])
-    for entry in schedule:
-        if entry["topic"] == topic:
-            entry.update({
-                "repetition": 0,
-                "interval": 1,
-                "easiness": 2.5,
-                "next_review_due": str(datetime.now().date() + timedelta(days=1)),
-                "history": []
-            })
-            break
-    tool_context.state["review_schedule"] = schedule
+    schedule, heap = load_schedule(tool_context.state)
+    if topic in schedule:
+        entry = Review.load(schedule[topic])
+        entry.repetition = 0
+        entry.interval = 1
+        entry.easiness = get_scheduler(tool_context.state).start_easiness(topic)
+        entry.due = today_ordinal() + 1
+        entry.history = []
+        schedule[topic] = entry.dump()
+        push_due(heap, topic, schedule[topic])
+    save_schedule(tool_context.state, schedule, heap)
     return {"message": f"Reset review progress for '{topic}'"}
 
 # === Tool 5: List all topics in the review schedule ===
 def list_reviewed_topics(tool_context: ToolContext) -> dict:
-    schedule = tool_context.state.get("review_schedule", [])
+    schedule, _ = load_schedule(tool_context.state)
     if not schedule:
         return {"message": "You have no topics in your review schedule yet."}
-    return {"topics": [t["topic"] for t in schedule]}
+    return {"topics": list(schedule)}
+
+# === Tool 6: Record a whole review session at once ===
+def record_review_session(topics: list[str], scores: list[int], tool_context: ToolContext) -> dict:
+    """
+    Record several review results in one call, using the same SM-2 rules as record_review_result.
+    topics: topics reviewed, in order
+    scores: score (0–5) for each topic, in the same order
+    """
+    if len(topics) != len(scores):
+        return {"message": "❌ Please give exactly one score per topic."}
+
+    state = tool_context.state
+    topics = [match_topic(state, t) for t in topics]
+    schedule, heap = load_schedule(state)
+    scheduler = get_scheduler(state)
+    known = set(state.get("known_topics", []))
+    skipped = [t for t in topics if t not in known and t not in schedule]
+    reviews = [(t, s) for t, s in zip(topics, scores) if t in known or t in schedule]
+
+    today = today_ordinal()
+    entries = {}
+    for topic, _ in reviews:
+        if topic not in entries:
+            entries[topic] = Review.load(schedule[topic]) if topic in schedule else _new_entry(topic, today, scheduler)
+
+    # A topic reviewed twice gets its second score in the next round, as if
+    # record_review_result had been called once per score
+    while reviews:
+        batch, seen, rest = [], set(), []
+        for topic, score in reviews:
+            (rest if topic in seen else batch).append((topic, score))
+            seen.add(topic)
+        reviews = rest
+
+        batch_entries = [entries[topic] for topic, _ in batch]
+        repetition, interval, easiness = scheduler.review(
+            [topic for topic, _ in batch],
+            [e.repetition for e in batch_entries],
+            [e.interval for e in batch_entries],
+            [e.easiness for e in batch_entries],
+            [score for _, score in batch],
+        )
+        for i, (_, score) in enumerate(batch):
+            entry = batch_entries[i]
+            entry.repetition = int(repetition[i])
+            entry.interval = int(interval[i])
+            entry.easiness = float(easiness[i])
+            entry.last = today
+            entry.due = today + entry.interval
+            entry.history.append([today, score])
+
+    for topic, entry in entries.items():
+        schedule[topic] = entry.dump()
+        push_due(heap, topic, schedule[topic])
+    save_schedule(state, schedule, heap)
+    result = {"message": f"Recorded {len(topics) - len(skipped)} reviews."}
+    if skipped:
+        result["skipped"] = skipped
+        result["message"] += f" ⚠️ Learn these first before reviewing them: {', '.join(skipped)}"
+    return result
+
+# === Tool 7: Forecast the daily review load ===
+def forecast_reviews(tool_context: ToolContext, days: int = 30) -> dict:
+    """
+    Projects how many reviews will be due on each of the next `days` days,
+    assuming each review goes reasonably well (score 4).
+    """
+    if not 1 <= days <= MAX_FORECAST_DAYS:
+        return {"message": f"❌ Days must be between 1 and {MAX_FORECAST_DAYS}."}
+    schedule, _ = load_schedule(tool_context.state)
+    if not schedule:
+        return {"message": "You have no topics in your review schedule yet."}
+
+    today = date.today()
+    entries = list(schedule.values())
+    load = get_scheduler(tool_context.state).forecast(
+        list(schedule),
+        [e["due"] - today.toordinal() for e in entries],
+        [e["repetition"] for e in entries],
+        [e["interval"] for e in entries],
+        [e["easiness"] for e in entries],
+        days,
+    )
+    daily = {
+        str(today + timedelta(days=i)): int(n) for i, n in enumerate(load) if n
+    }
+    peak = int(load.argmax())
+    return {
+        "daily_reviews": daily,
+        "peak_day": str(today + timedelta(days=peak)),
+        "peak_reviews": int(load[peak]),
+    }
+
+# === Tool 8: Fit the review schedule to the user's own memory ===
+def tune_review_schedule(tool_context: ToolContext, per_topic: bool = False, reset: bool = False) -> dict:
+    """
+    Fits the starting easiness and first two review intervals to how well
+    the user actually remembered topics in past reviews, and uses them for
+    future reviews instead of the standard SM-2 values (2.5, 1 and 6 days).
+    per_topic: also fit each topic with enough reviews of its own.
+    reset: go back to standard SM-2.
+    """
+    state = tool_context.state
+    if reset:
+        state["review_params"] = None
+        return {"message": "Reviews are scheduled with standard SM-2 again."}
+
+    schedule, _ = load_schedule(state)
+    params = fit_schedule_params(schedule, per_topic)
+    if params["reviews"] < MIN_FIT_REVIEWS:
+        return {"message": (
+            f"⚠️ Not enough review history yet: {params['reviews']} reviews a day or more after the "
+            f"previous one, {MIN_FIT_REVIEWS} are needed. Reviews still use standard SM-2."
+        )}
+    state["review_params"] = params
+    result = {
+        "message": f"📈 Fitted your review schedule to {params['reviews']} past reviews. "
+                   "It applies from each topic's next review.",
+        "start_easiness": params["easiness"],
+        "first_interval_days": params["first_interval"],
+        "second_interval_days": params["second_interval"],
+    }
+    if per_topic:
+        result["topics_fitted"] = len(params["topics"])
+    return result
 
 # === Create the Spaced Repetition Agent ===
 spaced_repetition_agent = Agent(
     name="spaced_repetition_agent",
-    model="gemini-2.0-flash",
+    model=agent_model("spaced_repetition_agent"),
     description="Manages spaced repetition and memory tracking for learning topics.",
     instruction="""
     You are a spaced repetition memory coach.
@@ -143,13 +261,22 @@ spaced_repetition_agent = Agent(
     - 0: Completely forgot
 
     Use 'record_review_result(topic, score)' to update a topic.
-    Use 'get_due_reviews' to show what to revise today.
+    Use 'record_review_session(topics, scores)' when the user reports several review scores at once.
+    Use 'forecast_reviews' when the user asks how busy upcoming review days will be.
+    Use 'tune_review_schedule' when the user wants review intervals that fit how
+    well they actually remember (per_topic=True to fit topics separately, or
+    reset=True to go back to standard SM-2).
+    Use 'get_due_reviews' to show what to revise today (most overdue first), or
+    pass days_ahead to show what is coming up in the next few days.
     """,
     tools=[
         record_review_result,
         get_due_reviews,
         view_review_history,
         reset_schedule,
-        list_reviewed_topics
+        list_reviewed_topics,
+        record_review_session,
+        forecast_reviews,
+        tune_review_schedule,
     ],
 )
\ No newline at end of file
@@ -0,0 +1,184 @@
+"""
+Fits the review schedule to how well topics were actually remembered.
+
+The model is SM-2 with three free parameters: the starting easiness and the
+first and second intervals (SM-2 uses 2.5, 1 and 6 days). Each interval is
+read as the topic's memory stability: after `elapsed` days, the chance of
+recalling it (a score of 3 or more) is TARGET_RECALL ** (elapsed / interval),
+so a well-fitted schedule brings topics back when they are 90% likely to be
+remembered. Every review that follows an earlier one by a day or more is a
+data point, and the parameters maximize the likelihood of the recorded
+scores, per group of histories (e.g. per user or per topic).
+
+All reviews are evaluated at once with NumPy: repetition counts, easiness and
+the product of easiness factors along each streak are segmented scans over
+the concatenated histories, so each starting easiness tried costs a few
+passes over the arrays, not a replay of every review.
+"""
+import numpy as np
+from .sm2 import FIRST_INTERVAL, MIN_EASINESS, NEW_EASINESS, NEW_REPETITION, SECOND_INTERVAL
+
+# Chance of recall a schedule aims for when a topic falls due
+TARGET_RECALL = 0.9
+# Starting easiness values tried, and the days a fitted interval is kept within
+EASINESS_GRID = np.round(np.arange(MIN_EASINESS, 3.5 + 1e-9, 0.1), 1)
+INTERVAL_RANGE = (1.0, 90.0)
+# Data points a group needs before its own fit replaces the defaults
+MIN_FIT_REVIEWS = 20
+BISECTION_STEPS = 16
+
+
+def history_arrays(histories: list) -> tuple:
+    """
+    Flattens review histories ([day ordinal, score] pairs, oldest first) into
+    (lengths, days, scores) arrays.
+    """
+    lengths = np.fromiter(map(len, histories), dtype=np.int64, count=len(histories))
+    pairs = np.array([pair for history in histories for pair in history], dtype=np.int64).reshape(-1, 2)
+    return lengths, pairs[:, 0], pairs[:, 1]
+
+
+def _segmented(values, start):
+    # Running sum and running minimum of values, restarting at each history
+    total = np.cumsum(values)
+    total -= total[start] - values[start]
+    # Earlier histories are shifted above every later value, so they never
+    # win the running minimum
+    span = float(total.max() - total.min()) + 1.0 if total.size else 1.0
+    shift = np.cumsum(start == np.arange(total.size)) * span
+    return total, np.minimum.accumulate(total - shift) + shift
+
+
+def _fit_interval(x, recalled, group, n_groups):
+    # Per group, the interval I maximizing the likelihood of the recalls when
+    # p(recall) = exp(-x / I). The negative log-likelihood is convex in 1 / I
+    # and its derivative, sum(x | recalled) - sum(x / expm1(x / I) | forgot),
+    # rises with 1 / I, so its sign change is found by bisection.
+    forgot = ~recalled
+    x_forgot, g_forgot = x[forgot], group[forgot]
+    recalled_x = np.bincount(group[recalled], x[recalled], n_groups)
+    lo = np.full(n_groups, -np.log(INTERVAL_RANGE[1]))
+    hi = np.full(n_groups, -np.log(INTERVAL_RANGE[0]))
+    with np.errstate(over="ignore", divide="ignore"):
+        for _ in range(BISECTION_STEPS):
+            mid = (lo + hi) / 2
+            slope = recalled_x - np.bincount(g_forgot, x_forgot / np.expm1(np.exp(mid)[g_forgot] * x_forgot), n_groups)
+            rising = slope > 0
+            hi = np.where(rising, mid, hi)
+            lo = np.where(rising, lo, mid)
+        rate = np.exp((lo + hi) / 2)
+        loss = rate * recalled_x - np.bincount(g_forgot, np.log(-np.expm1(-rate[g_forgot] * x_forgot)), n_groups)
+    return 1 / rate, loss
+
+
+def fit_review_params(lengths, days, scores, groups=None, defaults=None) -> tuple:
+    """
+    Fits (starting easiness, first interval, second interval) per group.
+
+    lengths: reviews per history; days, scores: the histories concatenated,
+    each oldest first. groups: group id (0..n-1) per history, or None for a
+    single group. defaults: (easiness, first, second), scalars or one value
+    per group, kept where a group has fewer than MIN_FIT_REVIEWS data points.
+    Returns (easiness, first, second, data points) arrays, one value per group.
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    days = np.asarray(days, dtype=np.int64)
+    scores = np.asarray(scores, dtype=np.int64)
+    if groups is None:
+        groups, n_groups = np.zeros(lengths.size, dtype=np.int64), 1
+    else:
+        groups = np.asarray(groups, dtype=np.int64)
+        n_groups = int(groups.max()) + 1 if groups.size else 0
+    fitted = [
+        np.array(np.broadcast_to(value, n_groups), dtype=np.float64)
+        for value in (defaults or (NEW_EASINESS, FIRST_INTERVAL, SECOND_INTERVAL))
+    ]
+    if not days.size:
+        return (*fitted, np.zeros(n_groups, dtype=np.int64))
+
+    index = np.arange(days.size)
+    opens = np.zeros(days.size, dtype=bool)
+    opens[(np.cumsum(lengths) - lengths)[lengths > 0]] = True
+    start = np.maximum.accumulate(np.where(opens, index, 0))
+    group = np.repeat(groups, lengths)
+    passed = scores >= 3
+
+    # Repetition after each review, counted from the last failure or from a
+    # new topic's NEW_REPETITION
+    last_fail = np.maximum.accumulate(np.where(passed, -1, index))
+    repetition = np.where(last_fail >= start, index - last_fail, index - start + NEW_REPETITION + 1)
+
+    # Easiness after each review is E0 + gained, floored at MIN_EASINESS:
+    # with lowest the running minimum of gained, that is
+    # max(E0 + gained, MIN_EASINESS + gained - lowest), whatever E0 is
+    lapse = 5 - scores
+    gained, lowest = _segmented(np.where(passed, 0.1 - lapse * (0.08 + lapse * 0.02), 0.0), start)
+    floored = MIN_EASINESS + gained - lowest
+
+    # Data points: reviews a day or more after the previous one, whose
+    # interval was set by that previous review
+    used = np.flatnonzero(~opens & (np.diff(days, prepend=days[0]) > 0))
+    prev = used - 1
+    elapsed = (days[used] - days[prev]) * -np.log(TARGET_RECALL)
+    recalled = passed[used]
+    counts = np.bincount(group[used], minlength=n_groups)
+    early = repetition[prev] <= 1
+    late = ~early
+
+    # After a failure or a first success the interval is the first interval
+    first, _ = _fit_interval(elapsed[early], recalled[early], group[used[early]], n_groups)
+    enough = np.bincount(group[used[early]], minlength=n_groups) >= MIN_FIT_REVIEWS
+    fitted[1] = np.where(enough, first, fitted[1])
+
+    # Later it is the second interval times the easiness factors used since
+    # the streak's second success, which depend on the starting easiness: try
+    # each, keep the likeliest. Only reviews at repetition 3 or more
+    # contribute a factor (the easiness before them, i.e. after the previous
+    # review), and each data point needs the sum of their logs along its streak
+    grown = np.flatnonzero(repetition >= 3)
+    streak = np.maximum.accumulate(np.where(repetition <= 2, index, 0))
+    late_prev, late_x, late_recalled, late_group = prev[late], elapsed[late], recalled[late], group[used[late]]
+    upto = np.searchsorted(grown, late_prev, side="right")
+    since = np.searchsorted(grown, streak[late_prev], side="right")
+    gained_before, floored_before = gained[grown - 1], floored[grown - 1]
+    best_loss = np.full(n_groups, np.inf)
+    best = np.zeros((2, n_groups))
+    for easiness in EASINESS_GRID:
+        factors = np.zeros(grown.size + 1)
+        np.cumsum(np.log(np.maximum(easiness + gained_before, floored_before)), out=factors[1:])
+        x = late_x * np.exp(factors[since] - factors[upto])
+        second, loss = _fit_interval(x, late_recalled, late_group, n_groups)
+        better = loss < best_loss
+        best_loss = np.where(better, loss, best_loss)
+        best[0] = np.where(better, easiness, best[0])
+        best[1] = np.where(better, second, best[1])
+    enough = np.bincount(late_group, minlength=n_groups) >= MIN_FIT_REVIEWS
+    fitted[0] = np.where(enough, best[0], fitted[0])
+    fitted[2] = np.where(enough, best[1], fitted[2])
+    return (*fitted, counts)
+
+
+def fit_schedule_params(schedule: dict, per_topic: bool = False) -> dict:
+    """
+    Fits a review schedule's histories and returns the review_params state
+    value for FittedScheduler: the user's parameters and, with per_topic,
+    those of each topic with enough reviews of its own.
+    """
+    topics = list(schedule)
+    lengths, days, scores = history_arrays([schedule[t]["history"] for t in topics])
+    easiness, first, second, counts = fit_review_params(lengths, days, scores)
+    params = {
+        "scheduler": "fitted",
+        "easiness": round(float(easiness[0]), 2),
+        "first_interval": round(float(first[0]), 2),
+        "second_interval": round(float(second[0]), 2),
+        "reviews": int(counts[0]),
+        "topics": {},
+    }
+    if per_topic and topics:
+        fits = fit_review_params(
+            lengths, days, scores, np.arange(len(topics)), (easiness[0], first[0], second[0])
+        )
+        for i in np.flatnonzero(fits[3] >= MIN_FIT_REVIEWS):
+            params["topics"][topics[i]] = [round(float(f[i]), 2) for f in fits[:3]]
+    return params
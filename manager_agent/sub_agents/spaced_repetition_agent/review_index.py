@@ -0,0 +1,62 @@
+import heapq
+from ...state_schema import ensure_schema
+
+# The heap is rebuilt once stale items outnumber live ones by this factor
+STALE_FACTOR = 2
+
+
+def load_schedule(state) -> tuple[dict, list]:
+    """
+    Returns (schedule, heap) for the state's review schedule.
+
+    schedule maps topic → stored Review record, whose `due` is the integer
+    day ordinal of its next review. heap is a min-heap of [due, topic] pairs;
+    a pair is stale once its topic has been rescheduled. A missing or mostly
+    stale heap is rebuilt and written back.
+    """
+    ensure_schema(state)
+    schedule = state.get("review_schedule", {})
+    heap = state.get("review_due_heap")
+
+    if heap is None or len(heap) > STALE_FACTOR * len(schedule) + 16:
+        heap = [[entry["due"], topic] for topic, entry in schedule.items()]
+        heapq.heapify(heap)
+        save_schedule(state, schedule, heap)
+    return schedule, heap
+
+
+def save_schedule(state, schedule: dict, heap: list):
+    state["review_schedule"] = schedule
+    state["review_due_heap"] = heap
+
+
+def push_due(heap: list, topic: str, entry: dict):
+    """
+    Records a topic's new due day; its previous heap pair becomes stale.
+    """
+    heapq.heappush(heap, [entry["due"], topic])
+
+
+def due_until(schedule: dict, heap: list, last_ordinal: int) -> list[str]:
+    """
+    Topics due on or before `last_ordinal`, most overdue first.
+
+    Walks the heap array from the root, only descending into children of
+    pairs that are still due, so the cost is O(k log k) for k visited pairs
+    rather than a scan of the whole schedule.
+    """
+    due, seen = [], set()
+    frontier = [(heap[0][0], 0)] if heap else []
+    while frontier:
+        ordinal, i = heapq.heappop(frontier)
+        if ordinal > last_ordinal:
+            break
+        topic = heap[i][1]
+        entry = schedule.get(topic)
+        if entry is not None and entry["due"] == ordinal and topic not in seen:
+            seen.add(topic)
+            due.append(topic)
+        for child in (2 * i + 1, 2 * i + 2):
+            if child < len(heap):
+                heapq.heappush(frontier, (heap[child][0], child))
+    return due
@@ -0,0 +1,91 @@
+"""
+Schedulers turn review scores into each topic's next interval. The spaced
+repetition tools only go through get_scheduler, so a scheduler fitted to the
+user's history (or any other one added to SCHEDULERS) replaces SM-2 without
+changing them.
+
+A scheduler provides:
+- start_easiness(topic): easiness of a topic reviewed for the first time
+- review(topics, repetition, interval, easiness, scores): one review of
+  each topic, returning new (repetition, interval, easiness) arrays
+- forecast(topics, due_offsets, repetition, interval, easiness, days):
+  reviews falling on each of the next `days` days
+
+It is built from the state's review_params with from_params.
+"""
+import numpy as np
+from .sm2 import FIRST_INTERVAL, NEW_EASINESS, SECOND_INTERVAL, forecast_load, sm2_batch
+
+
+def _days(interval):
+    return np.maximum(1, np.rint(interval)).astype(np.int64)
+
+
+class SM2Scheduler:
+    """
+    SM-2 with the same starting easiness and first two intervals for every topic.
+    """
+    name = "sm2"
+
+    def __init__(self, easiness: float = NEW_EASINESS, first_interval: float = FIRST_INTERVAL,
+                 second_interval: float = SECOND_INTERVAL):
+        self.easiness = easiness
+        self.first_interval = first_interval
+        self.second_interval = second_interval
+
+    @classmethod
+    def from_params(cls, params: dict) -> "SM2Scheduler":
+        return cls()
+
+    def params(self, topics: list) -> tuple:
+        # (starting easiness, first interval, second interval), as scalars or
+        # one value per topic
+        return self.easiness, self.first_interval, self.second_interval
+
+    def start_easiness(self, topic: str) -> float:
+        return float(np.broadcast_to(self.params([topic])[0], 1)[0])
+
+    def review(self, topics: list, repetition, interval, easiness, scores) -> tuple:
+        _, first, second = self.params(topics)
+        return sm2_batch(repetition, interval, easiness, scores, _days(first), _days(second))
+
+    def forecast(self, topics: list, due_offsets, repetition, interval, easiness, days: int):
+        _, first, second = self.params(topics)
+        return forecast_load(
+            due_offsets, repetition, interval, easiness, days,
+            first_interval=_days(first), second_interval=_days(second),
+        )
+
+
+class FittedScheduler(SM2Scheduler):
+    """
+    SM-2 with the user's fitted parameters (see review_fit), and the topic's
+    own where it had enough reviews to fit them.
+    """
+    name = "fitted"
+
+    def __init__(self, easiness: float, first_interval: float, second_interval: float, topics: dict = None):
+        super().__init__(easiness, first_interval, second_interval)
+        self.topics = topics or {}
+
+    @classmethod
+    def from_params(cls, params: dict) -> "FittedScheduler":
+        return cls(params["easiness"], params["first_interval"], params["second_interval"], params.get("topics"))
+
+    def params(self, topics: list) -> tuple:
+        if not self.topics:
+            return super().params(topics)
+        default = [self.easiness, self.first_interval, self.second_interval]
+        rows = np.array([self.topics.get(t, default) for t in topics], dtype=np.float64).reshape(-1, 3)
+        return rows[:, 0], rows[:, 1], rows[:, 2]
+
+
+SCHEDULERS = {scheduler.name: scheduler for scheduler in (SM2Scheduler, FittedScheduler)}
+
+
+def get_scheduler(state) -> SM2Scheduler:
+    """
+    The scheduler the state's review_params select; plain SM-2 if none.
+    """
+    params = state.get("review_params") or {}
+    return SCHEDULERS.get(params.get("scheduler"), SM2Scheduler).from_params(params)
@@ -0,0 +1,74 @@
+import numpy as np
+
+# Starting values for a topic's first review, as in record_review_result
+NEW_REPETITION = 1
+NEW_INTERVAL = 1
+NEW_EASINESS = 2.5
+MIN_EASINESS = 1.3
+# Days until the next review after the first and second successful reviews
+# in a row (a failed review also starts over at the first)
+FIRST_INTERVAL = 1
+SECOND_INTERVAL = 6
+
+
+def sm2_batch(repetition, interval, easiness, scores,
+              first_interval=FIRST_INTERVAL, second_interval=SECOND_INTERVAL):
+    """
+    Applies one SM-2 review to many topics at once.
+
+    A score below 3 resets repetition and the interval and leaves easiness
+    alone; otherwise repetition goes up, the interval becomes first_interval,
+    second_interval or round(interval * easiness), and easiness is adjusted
+    with a floor of 1.3. The intervals may be arrays with one value per topic.
+    Returns new (repetition, interval, easiness).
+    """
+    repetition = np.asarray(repetition, dtype=np.int64)
+    interval = np.asarray(interval, dtype=np.int64)
+    easiness = np.asarray(easiness, dtype=np.float64)
+    scores = np.asarray(scores, dtype=np.int64)
+
+    passed = scores >= 3
+    new_repetition = np.where(passed, repetition + 1, 0)
+    # np.rint rounds halves to even, like Python's round()
+    grown = np.rint(interval * easiness).astype(np.int64)
+    new_interval = np.where(
+        ~passed | (new_repetition == 1), first_interval, np.where(new_repetition == 2, second_interval, grown)
+    )
+    lapse = 5 - scores
+    adjusted = np.maximum(MIN_EASINESS, easiness + (0.1 - lapse * (0.08 + lapse * 0.02)))
+    new_easiness = np.where(passed, adjusted, easiness)
+    return new_repetition, new_interval, new_easiness
+
+
+def forecast_load(due_offsets, repetition, interval, easiness, days: int, assumed_score: int = 4,
+                  first_interval=FIRST_INTERVAL, second_interval=SECOND_INTERVAL):
+    """
+    Projects how many reviews fall on each of the next `days` days.
+
+    due_offsets are days from today until each topic is next due (overdue
+    topics count as today). Every review is assumed to score `assumed_score`
+    and reschedules the topic with sm2_batch, so topics due often are counted
+    several times. Loops once per review round, not once per day.
+    """
+    offsets = np.maximum(np.asarray(due_offsets, dtype=np.int64), 0)
+    columns = [
+        np.asarray(repetition, dtype=np.int64),
+        np.asarray(interval, dtype=np.int64),
+        np.asarray(easiness, dtype=np.float64),
+        np.broadcast_to(first_interval, offsets.shape),
+        np.broadcast_to(second_interval, offsets.shape),
+    ]
+
+    load = np.zeros(days, dtype=np.int64)
+    active = offsets < days
+    offsets, columns = offsets[active], [c[active] for c in columns]
+    while offsets.size:
+        load += np.bincount(offsets, minlength=days)
+        repetition, interval, easiness, first, second = columns
+        columns[:3] = sm2_batch(
+            repetition, interval, easiness, np.full(offsets.size, assumed_score), first, second
+        )
+        offsets = offsets + columns[1]
+        active = offsets < days
+        offsets, columns = offsets[active], [c[active] for c in columns]
+    return load
@@ -0,0 +1,322 @@
+"""
+Shared registry of topic names.
+
+Users and agents name the same topic in different ways ("graphs", "Graphs",
+"graph"), so every tool resolves a topic name before using it as a state
+key. A topic's canonical ID is its normalized name (topic_key) and its
+canonical name is the first spelling seen. A name resolves, in order, by:
+
+- an alias in state['topic_aliases'] (alias ID → canonical name),
+- its ID,
+- its folded form, which ignores punctuation and plural endings.
+
+A name matching none of these is a new topic. Misspellings are never
+resolved automatically, since short names one edit apart are often
+different topics ("DFS" and "BFS", "CSV" and "CSS"); similar() only
+suggests registered topics, which tools pass back as similar_topics.
+For suggestions, a word no topic uses is replaced by words within one edit
+of it that some topic does use. Only words of five or more letters are
+corrected, and numbers never are, so "Calculus 3" doesn't become
+"Calculus 2".
+
+Corrections come from a trigram index over the distinct words of all topic
+names, built on the first suggestion; a word within one edit shares all
+but at most four of its trigrams, so only words with that many in common
+(and at least two) are compared. Its size follows the vocabulary rather
+than the number of topics, which keeps suggestions under a millisecond
+with 100k topics.
+"""
+import re
+import uuid
+from collections import Counter, OrderedDict
+
+# Corrections tried per misspelled word, and the shortest word corrected
+MAX_CORRECTIONS = 3
+MIN_CORRECTED_CHARS = 5
+
+# Share of words a topic must have in common with a name to be suggested,
+# and the rarest words of the name used to find such topics
+SUGGEST_THRESHOLD = 0.3
+SUGGEST_WORDS = 2
+
+# Registries kept in memory, keyed by the registry id stamped into state
+MAX_CACHED_REGISTRIES = 8
+_registries = OrderedDict()
+
+_WORD = re.compile(r"[a-z0-9+#]+")
+# Words that tell numbered topics apart ("Calculus 2", "Physics II")
+_NUMERAL = re.compile(r"\d+|[ivx]+")
+
+
+def topic_key(topic: str) -> str:
+    # Topic names are the same regardless of case and spacing
+    return " ".join(topic.casefold().split())
+
+
+def _singular(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def fold(topic: str) -> str:
+    return " ".join(_singular(w) for w in _WORD.findall(topic.casefold()))
+
+
+def trigrams(word: str) -> frozenset:
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def one_edit(a: str, b: str) -> bool:
+    """
+    Whether b is a with one letter inserted, deleted, replaced, or two
+    neighbouring letters swapped.
+    """
+    if abs(len(a) - len(b)) > 1 or a == b:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) < len(b):
+        return a[i:] == b[i + 1:]
+    return a[i + 1:] == b[i + 1:] or a[i + 2:] == b[i + 2:] and a[i] == b[i + 1] and a[i + 1] == b[i]
+
+
+def state_topics(state):
+    """
+    Every topic name stored in state, in a stable order.
+    """
+    yield from state.get("known_topics") or []
+    for topic, required in (state.get("prereq_map") or {}).items():
+        yield topic
+        yield from required
+    for key in ("review_schedule", "study_progress"):
+        entries = state.get(key)
+        if isinstance(entries, dict):
+            yield from entries
+    tasks = state.get("learning_tasks")
+    if isinstance(tasks, dict):
+        yield from (t["topic"] for t in tasks.values() if t.get("topic"))
+
+
+class TopicRegistry:
+    """
+    Canonical topic names with an alias table, a word index and a trigram
+    index of words; see the module docstring.
+    """
+
+    def __init__(self, topics=(), aliases=None):
+        self.registry_id = uuid.uuid4().hex
+        self.rev = 0
+        self.names = []
+        self.ids = {}
+        self.aliases = {}
+        self.folded = {}
+        # Topics that became aliases of another, by number
+        self.redirects = {}
+        # word → numbers of the topics (and aliases) using it, and the
+        # number of words in each topic name
+        self.word_topics = {}
+        self.word_counts = []
+        # Trigram index over word_topics' words, in the order they appeared
+        self.words = []
+        self.gram_words = {}
+        self._indexed = 0
+        for alias, topic in (aliases or {}).items():
+            self.add_alias(alias, topic)
+        for topic in topics:
+            self.add(topic)
+        # Bumped by every topic or alias registered from here on
+        self.rev = 0
+
+    @classmethod
+    def from_state(cls, state) -> "TopicRegistry":
+        return cls(state_topics(state), state.get("topic_aliases"))
+
+    def stamp(self) -> dict:
+        return {"id": self.registry_id, "rev": self.rev}
+
+    def __len__(self) -> int:
+        return len(self.names) - len(self.redirects)
+
+    def _target(self, n: int) -> int:
+        while n in self.redirects:
+            n = self.redirects[n]
+        return n
+
+    def _index_words(self, n: int, words: set):
+        for word in words:
+            if word not in self.word_topics:
+                self.word_topics[word] = []
+                self.words.append(word)
+            self.word_topics[word].append(n)
+
+    def _find(self, topic: str):
+        key = topic_key(topic)
+        n = self.aliases.get(key, self.ids.get(key))
+        if n is None:
+            n = self.folded.get(fold(topic))
+        return None if n is None else self._target(n)
+
+    def corrections(self, word: str) -> list[str]:
+        """
+        The word itself if a topic uses it, else the used words within one
+        edit of it, most used first.
+        """
+        if word in self.word_topics:
+            return [word]
+        if len(word) < MIN_CORRECTED_CHARS or _NUMERAL.fullmatch(word):
+            return []
+        for w in self.words[self._indexed:]:
+            for g in trigrams(w):
+                self.gram_words.setdefault(g, []).append(w)
+        self._indexed = len(self.words)
+
+        grams = trigrams(word)
+        hits = Counter()
+        for g in grams:
+            hits.update(self.gram_words.get(g, ()))
+        need = max(2, len(grams) - 4)
+        found = [w for w, count in hits.items() if count >= need and one_edit(w, word)]
+        found.sort(key=lambda w: -len(self.word_topics[w]))
+        return found[:MAX_CORRECTIONS]
+
+    def lookup(self, topic: str):
+        """
+        The canonical name for topic, or None if it matches no topic.
+        """
+        n = self._find(topic)
+        return None if n is None else self.names[n]
+
+    def add(self, topic: str) -> str:
+        """
+        Registers topic unless it already names one; returns its canonical
+        name.
+        """
+        key = topic_key(topic)
+        n = self.aliases.get(key, self.ids.get(key))
+        if n is None:
+            folded = fold(topic)
+            n = self.folded.get(folded)
+            if n is None:
+                if not key:
+                    return ""
+                n = len(self.names)
+                self.names.append(" ".join(topic.split()))
+                self.ids[key] = n
+                if folded:
+                    self.folded[folded] = n
+                words = set(folded.split())
+                self._index_words(n, words)
+                self.word_counts.append(len(words))
+                self.rev += 1
+                return self.names[n]
+        return self.names[self._target(n)]
+
+    def resolve(self, topic: str) -> str:
+        """
+        The canonical name for topic, registering it as a new topic if it
+        matches none.
+        """
+        return self.lookup(topic) or self.add(topic)
+
+    def add_alias(self, alias: str, topic: str) -> str:
+        """
+        Makes alias resolve to topic (registered if new). If alias was a
+        topic of its own, it now redirects there. Returns topic's canonical
+        name.
+        """
+        canonical = self.add(topic)
+        n = self._find(canonical)
+        old = self._find(alias)
+        if old is not None and old != n:
+            self.redirects[old] = n
+        key = topic_key(alias)
+        if key and key != topic_key(canonical):
+            self.aliases[key] = n
+            self.folded[fold(alias)] = n
+            self._index_words(n, set(fold(alias).split()))
+        self.rev += 1
+        return canonical
+
+    def similar(self, topic: str, limit: int = 5) -> list[str]:
+        """
+        Canonical names of the registered topics sharing the most words
+        with topic (after corrections).
+        """
+        words = {c for word in fold(topic).split() for c in self.corrections(word)[:1]}
+        if not words:
+            return []
+        hits = Counter()
+        for word in sorted(words, key=lambda w: len(self.word_topics[w]))[:SUGGEST_WORDS]:
+            hits.update(self.word_topics[word])
+        scored = {}
+        for n, common in hits.items():
+            # Words of the topic's aliases count as its own, so the union is
+            # at least the name's words
+            score = common / max(len(words) + self.word_counts[n] - common, len(words))
+            if score >= SUGGEST_THRESHOLD:
+                n = self._target(n)
+                scored[n] = max(score, scored.get(n, 0.0))
+        best = sorted(scored.items(), key=lambda s: (-s[1], s[0]))
+        return [self.names[n] for n, _ in best[:limit]]
+
+
+def get_registry(state) -> TopicRegistry:
+    """
+    Returns the registry for this state's topics, rebuilding it only when
+    the state's stamp doesn't match a registry held in memory. Never writes
+    state: a registry is built from state alone, so a rebuilt one takes
+    over the stamp found there.
+    """
+    stamp = state.get("topic_index") or {}
+    registry = _registries.get(stamp.get("id"))
+    if registry is None or registry.rev != stamp.get("rev"):
+        registry = TopicRegistry.from_state(state)
+        if not stamp:
+            return registry
+        registry.registry_id, registry.rev = stamp["id"], stamp["rev"]
+        _remember(registry)
+    _registries.move_to_end(registry.registry_id)
+    return registry
+
+
+def _remember(registry: TopicRegistry):
+    _registries[registry.registry_id] = registry
+    while len(_registries) > MAX_CACHED_REGISTRIES:
+        _registries.popitem(last=False)
+
+
+def save_registry(state, registry: TopicRegistry):
+    """
+    For tools writing topics: saves the registry's stamp if it gained a
+    topic or alias (or state has none), so other processes rebuild it and
+    the next call here reuses it.
+    """
+    if state.get("topic_index") != registry.stamp():
+        state["topic_index"] = registry.stamp()
+        _remember(registry)
+
+
+def resolve_topic(state, topic: str, similar: list = None) -> str:
+    """
+    For topics being written: names matching no topic become new topics.
+    A new name's similar registered topics are added to `similar`, if
+    given, for the tool to suggest; they are never used in its place.
+    """
+    registry = get_registry(state)
+    if similar is not None and registry.lookup(topic) is None:
+        similar.extend(registry.similar(topic))
+    name = registry.resolve(topic)
+    save_registry(state, registry)
+    return name
+
+
+def match_topic(state, topic: str) -> str:
+    # For topics being looked up: unknown names are returned as given
+    return get_registry(state).lookup(topic) or topic.strip()
@@ -0,0 +1,238 @@
+"""
+Multi-user server mode.
+
+Serves many learners from one process. One Runner and one session service are
+shared by everyone; each user gets their own session, created on first contact
+with the same initial state as main.py.
+
+- POST /users/{user_id}/messages  {"message": "..."} → {"reply": ..., "session_id": ...}
+- WS   /users/{user_id}/ws        send a message as text; receive {"type": "chunk", "text": ...}
+                                  while the reply streams, then {"type": "reply", ...}
+- GET  /health                    current load
+
+A user's turns run one at a time, so their state writes never interleave, and
+at most LEARNING_MAS_MAX_TURNS turns run at once. Requests beyond that wait,
+up to LEARNING_MAS_MAX_PENDING in total and LEARNING_MAS_MAX_USER_QUEUE per
+user; past either limit they are refused with 429 and a Retry-After header
+(over the WebSocket: {"type": "busy", "retry_after": ...}).
+
+Usage: python server.py [--host 127.0.0.1] [--port 8000] [--db sqlite:///./learning_mas.db]
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+import argparse
+import asyncio
+import contextlib
+from dotenv import load_dotenv
+
+# Loaded before the project imports, which read their settings at import time
+load_dotenv()
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel
+from google.adk.runners import Runner
+from manager_agent.agent import manager_agent
+from sharded_session_service import ShardedSessionService
+from state_store import run_compaction
+from tracing import tracer
+from context_window import context_window
+from manager_agent.state_schema import new_session_state
+from utils import TurnOutput, call_agent_async, final_response_text, migrate_session_state
+
+APP_NAME = "LearningMAS"
+
+MAX_TURNS = int(os.getenv("LEARNING_MAS_MAX_TURNS", "32"))
+MAX_PENDING = int(os.getenv("LEARNING_MAS_MAX_PENDING", "64"))
+MAX_USER_QUEUE = int(os.getenv("LEARNING_MAS_MAX_USER_QUEUE", "4"))
+
+# Seconds a refused client is asked to wait before retrying
+RETRY_AFTER = 1
+
+
+class Busy(Exception):
+    pass
+
+
+class QuietOutput(TurnOutput):
+    """
+    Turn output for server requests: nothing is printed, streamed text goes
+    to `on_chunk` and the error, if any, is kept for the response.
+    """
+
+    def __init__(self, on_chunk=None):
+        super().__init__(stream=False)
+        self.on_chunk = on_chunk
+        self.error_message = None
+
+    def query(self, query):
+        pass
+
+    async def event(self, event):
+        if event.partial:
+            if self.on_chunk and event.content and event.content.parts:
+                for part in event.content.parts:
+                    if part.text:
+                        await self.on_chunk(part.text)
+            return None
+        return final_response_text(event)
+
+    def reply(self, text):
+        pass
+
+    def error(self, message):
+        self.error_message = message
+
+
+class LearnerGateway:
+    """
+    Runs turns for many users on a shared Runner, with a session, a lock and
+    a bounded queue per user and a global limit on concurrent turns.
+    """
+
+    def __init__(self, runner, max_turns=MAX_TURNS, max_pending=MAX_PENDING, max_user_queue=MAX_USER_QUEUE):
+        self.runner = runner
+        self.session_service = runner.session_service
+        self.app_name = runner.app_name
+        self.max_turns = max_turns
+        self.max_pending = max_pending
+        self.max_user_queue = max_user_queue
+        self._slots = asyncio.Semaphore(max_turns)
+        self._sessions = {}
+        self._locks = {}
+        # Requests accepted and not yet finished, per user and in total
+        self._queued = {}
+        self.active = 0
+        self.running = 0
+        self.served = 0
+        self.refused = 0
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._sessions),
+            "running": self.running,
+            "waiting": self.active - self.running,
+            "served": self.served,
+            "refused": self.refused,
+        }
+
+    def _open_session(self, user_id) -> str:
+        sessions = self.session_service.list_sessions(app_name=self.app_name, user_id=user_id)
+        if sessions.sessions:
+            session_id = sessions.sessions[0].id
+        else:
+            session_id = self.session_service.create_session(
+                app_name=self.app_name, user_id=user_id, state=new_session_state(user_id.title())
+            ).id
+        migrate_session_state(self.session_service, self.app_name, user_id, session_id)
+        return session_id
+
+    async def session_id(self, user_id) -> str:
+        # Only called under the user's lock, so a session is opened once
+        if user_id not in self._sessions:
+            self._sessions[user_id] = await asyncio.to_thread(self._open_session, user_id)
+        return self._sessions[user_id]
+
+    async def run(self, user_id, message, on_chunk=None) -> dict:
+        """
+        Runs one turn for `user_id`. Raises Busy when the queues are full.
+        """
+        queued = self._queued.get(user_id, 0)
+        if self.active >= self.max_turns + self.max_pending or queued >= self.max_user_queue:
+            self.refused += 1
+            raise Busy()
+        self._queued[user_id] = queued + 1
+        self.active += 1
+        try:
+            # Wait for this user's previous turn before taking a global slot
+            async with self._locks.setdefault(user_id, asyncio.Lock()), self._slots:
+                self.running += 1
+                try:
+                    session_id = await self.session_id(user_id)
+                    output = QuietOutput(on_chunk)
+                    reply = await call_agent_async(
+                        self.runner, user_id, session_id, message, stream=on_chunk is not None, output=output
+                    )
+                finally:
+                    self.running -= 1
+            self.served += 1
+            return {"session_id": session_id, "reply": reply, "error": output.error_message}
+        finally:
+            self.active -= 1
+            self._queued[user_id] -= 1
+            if not self._queued[user_id]:
+                # Nobody holds or waits on the lock any more
+                del self._queued[user_id]
+                del self._locks[user_id]
+
+
+class Message(BaseModel):
+    message: str
+
+
+def create_app(gateway: LearnerGateway) -> FastAPI:
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        # Roll old interaction history into compressed archives in the background
+        compaction_task = asyncio.create_task(run_compaction(gateway.session_service.state_store))
+        yield
+        compaction_task.cancel()
+        tracer.close()
+
+    app = FastAPI(title="LearningMAS", lifespan=lifespan)
+
+    @app.get("/health")
+    async def health():
+        return gateway.stats()
+
+    @app.post("/users/{user_id}/messages")
+    async def post_message(user_id: str, body: Message):
+        try:
+            return await gateway.run(user_id, body.message)
+        except Busy:
+            raise HTTPException(status_code=429, detail="Server busy", headers={"Retry-After": str(RETRY_AFTER)})
+
+    @app.websocket("/users/{user_id}/ws")
+    async def chat(websocket: WebSocket, user_id: str):
+        await websocket.accept()
+
+        async def send_chunk(text):
+            await websocket.send_json({"type": "chunk", "text": text})
+
+        try:
+            while True:
+                message = await websocket.receive_text()
+                try:
+                    result = await gateway.run(user_id, message, on_chunk=send_chunk)
+                except Busy:
+                    await websocket.send_json({"type": "busy", "retry_after": RETRY_AFTER})
+                    continue
+                await websocket.send_json({"type": "reply", **result})
+        except WebSocketDisconnect:
+            pass
+
+    return app
+
+
+def build_gateway(db_url: str) -> LearnerGateway:
+    session_service = ShardedSessionService(db_url=db_url, window=context_window)
+    tracer.instrument_session_service(session_service)
+    tracer.instrument_agents(manager_agent)
+    context_window.instrument_agents(manager_agent)
+    runner = Runner(agent=manager_agent, app_name=APP_NAME, session_service=session_service)
+    return LearnerGateway(runner)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve LearningMAS to many users over HTTP and WebSocket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--db", default="sqlite:///./learning_mas.db")
+    args = parser.parse_args()
+    uvicorn.run(create_app(build_gateway(args.db)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
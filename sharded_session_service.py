@@ -0,0 +1,271 @@
+from datetime import datetime
+from functools import partial
+from google.adk.events.event import Event
+from google.adk.sessions import DatabaseSessionService, _session_util
+from google.adk.sessions.base_session_service import GetSessionConfig
+from google.adk.sessions.database_session_service import StorageEvent
+from google.adk.sessions.state import State
+from state_store import StateStore, Turn, drop_value, merge_maps
+from context_window import SUMMARY_KEY
+from manager_agent.state_schema import merge_review
+
+# Keys with these prefixes are handled by DatabaseSessionService itself
+SHARED_PREFIXES = (State.APP_PREFIX, State.USER_PREFIX, State.TEMP_PREFIX)
+
+# How concurrent writes to these keys are merged; other keys use merge_value
+MERGERS = {
+    "review_schedule": partial(merge_maps, merge_entry=merge_review),
+    # Derived from other keys and rebuilt when missing
+    "review_due_heap": drop_value,
+    "prereq_index": drop_value,
+    "topic_index": drop_value,
+}
+
+# Makes DatabaseSessionService.get_session load no events (it keeps those
+# *before* after_timestamp, compared as is with the stored datetimes). Its
+# num_recent_events can't be used to load the newest ones: the query fails.
+NO_EVENTS = GetSessionConfig.model_construct(num_recent_events=None, after_timestamp=datetime.min)
+
+
+def split_state(state: dict) -> tuple[dict, dict]:
+    shared = {k: v for k, v in state.items() if k.startswith(SHARED_PREFIXES)}
+    local = {k: v for k, v in state.items() if not k.startswith(SHARED_PREFIXES)}
+    return shared, local
+
+
+class LazyState(dict):
+    """
+    Session state dict that fetches a key from the store on first access.
+    """
+
+    def __init__(self, loader, names, preloaded):
+        super().__init__(preloaded)
+        self._loader = loader
+        self._pending = set(names) - set(preloaded)
+
+    def _load(self, key):
+        if key in self._pending:
+            self._pending.discard(key)
+            try:
+                dict.__setitem__(self, key, self._loader(key))
+            except KeyError:
+                pass
+
+    def _load_all(self):
+        for key in list(self._pending):
+            self._load(key)
+
+    def __getitem__(self, key):
+        self._load(key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self._load(key)
+        return super().get(key, default)
+
+    def __contains__(self, key):
+        return key in self._pending or super().__contains__(key)
+
+    def __setitem__(self, key, value):
+        self._pending.discard(key)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._load(key)
+        super().__delitem__(key)
+
+    def setdefault(self, key, default=None):
+        self._load(key)
+        return super().setdefault(key, default)
+
+    def pop(self, key, *default):
+        self._load(key)
+        return super().pop(key, *default)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __iter__(self):
+        self._load_all()
+        return super().__iter__()
+
+    def __len__(self):
+        return len(self._pending) + super().__len__()
+
+    def keys(self):
+        self._load_all()
+        return super().keys()
+
+    def values(self):
+        self._load_all()
+        return super().values()
+
+    def items(self):
+        self._load_all()
+        return super().items()
+
+    def copy(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        self._load_all()
+        return super().__eq__(other)
+
+    def __repr__(self):
+        self._load_all()
+        return super().__repr__()
+
+    def __reduce__(self):
+        return (dict, (self.copy(),))
+
+
+class ShardedSessionService(DatabaseSessionService):
+    """
+    DatabaseSessionService that keeps session-scoped state in per-key rows.
+
+    State deltas from events are buffered per session and only the dirty keys
+    are written back when the turn's final response is appended (or on flush).
+    Inside begin_turn/commit_turn they are held until the turn is committed.
+
+    With a ContextWindow, sessions are loaded with only the newest events
+    that fit its token budget (see context_window.py).
+    """
+
+    def __init__(self, db_url: str, window=None):
+        super().__init__(db_url=db_url)
+        self.window = window if window is not None and window.enabled else None
+        self.state_store = StateStore(self, MERGERS)
+        self.io_counter = self.state_store.io_counter
+        self._dirty = {}
+        self._turns = {}
+        self.last_turn = None
+
+    def _lazy_state(self, app_name, user_id, session_id, shared: dict, listing=None) -> LazyState:
+        names, small = listing or self.state_store.key_values(app_name, user_id, session_id)
+        return LazyState(
+            lambda key: self.state_store.load_key(app_name, user_id, session_id, key),
+            names,
+            {**shared, **small},
+        )
+
+    def create_session(self, *, app_name, user_id, state=None, session_id=None):
+        shared, local = split_state(state or {})
+        session = super().create_session(
+            app_name=app_name, user_id=user_id, state=shared, session_id=session_id
+        )
+        self.state_store.create(app_name, user_id, session.id, local)
+        session.state = self._lazy_state(app_name, user_id, session.id, session.state, ([], local))
+        return session
+
+    def get_session(self, *, app_name, user_id, session_id, config=None):
+        # Listing the keys first also moves any legacy state blob out of the
+        # sessions row before ADK reads it
+        listing = self.state_store.key_values(app_name, user_id, session_id)
+        windowed = self.window is not None and config is None
+        session = super().get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=NO_EVENTS if windowed else config
+        )
+        self.io_counter.reads += 1
+        if session is None:
+            return None
+        session.state = self._lazy_state(app_name, user_id, session_id, session.state, listing)
+        if windowed:
+            self._load_window(session)
+        return session
+
+    def _load_window(self, session):
+        events = self._recent_events(session.app_name, session.user_id, session.id, self.window.max_events)
+        dropped, session.events = self.window.trim(events)
+        summary = session.state.get(SUMMARY_KEY)
+        updated = self.window.summarize(summary, dropped)
+        if updated is not summary:
+            session.state[SUMMARY_KEY] = updated
+            key = (session.app_name, session.user_id, session.id)
+            if key in self._turns:
+                self._turns[key].set(SUMMARY_KEY, updated)
+            else:
+                self.state_store.set_keys(*key, {SUMMARY_KEY: updated})
+
+    def _recent_events(self, app_name, user_id, session_id, limit) -> list:
+        # The newest `limit` events, oldest first
+        with self.DatabaseSessionFactory() as db:
+            rows = (
+                db.query(StorageEvent)
+                .filter(StorageEvent.app_name == app_name)
+                .filter(StorageEvent.user_id == user_id)
+                .filter(StorageEvent.session_id == session_id)
+                .order_by(StorageEvent.timestamp.desc())
+                .limit(limit)
+                .all()
+            )
+            return [
+                Event(
+                    id=e.id,
+                    author=e.author,
+                    branch=e.branch,
+                    invocation_id=e.invocation_id,
+                    content=_session_util.decode_content(e.content),
+                    actions=e.actions,
+                    timestamp=e.timestamp.timestamp(),
+                    long_running_tool_ids=e.long_running_tool_ids,
+                    grounding_metadata=e.grounding_metadata,
+                    partial=e.partial,
+                    turn_complete=e.turn_complete,
+                    error_code=e.error_code,
+                    error_message=e.error_message,
+                    interrupted=e.interrupted,
+                )
+                for e in reversed(rows)
+            ]
+
+    def delete_session(self, *, app_name, user_id, session_id):
+        super().delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        self.state_store.delete(app_name, user_id, session_id)
+        self._dirty.pop((app_name, user_id, session_id), None)
+
+    def append_event(self, session, event):
+        if event.partial:
+            return event
+
+        stored, local = event, {}
+        if event.actions and event.actions.state_delta:
+            shared, local = split_state(event.actions.state_delta)
+            if local:
+                # Keep session keys out of the sessions row; they go to state_keys
+                actions = event.actions.model_copy(update={"state_delta": shared})
+                stored = event.model_copy(update={"actions": actions})
+
+        super().append_event(session=session, event=stored)
+        self.io_counter.writes += 1
+
+        key = (session.app_name, session.user_id, session.id)
+        if local:
+            session.state.update(local)
+            self._dirty.setdefault(key, {}).update(local)
+        if event.is_final_response() and key not in self._turns:
+            self.flush(*key)
+        return event
+
+    def begin_turn(self, app_name, user_id, session_id) -> Turn:
+        """
+        Starts buffering a turn: history entries and tool state deltas are
+        held until commit_turn writes them in one transaction.
+        """
+        turn = self.state_store.begin_turn(app_name, user_id, session_id)
+        self._turns[(app_name, user_id, session_id)] = turn
+        return turn
+
+    def commit_turn(self, turn: Turn):
+        key = (turn.app_name, turn.user_id, turn.session_id)
+        self._turns.pop(key, None)
+        self.state_store.commit_turn(turn, self._dirty.pop(key, None))
+        self.last_turn = turn
+
+    def flush(self, app_name, user_id, session_id):
+        """
+        Writes the session's dirty keys in one transaction.
+        """
+        dirty = self._dirty.pop((app_name, user_id, session_id), None)
+        if dirty:
+            self.state_store.set_keys(app_name, user_id, session_id, dirty)
@@ -0,0 +1,843 @@
+import asyncio
+import json
+import random
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+# Keys whose entries live in the append-only `state_log` table
+LOG_KEYS = ("interaction_history",)
+
+# Number of newest log entries mirrored into session state
+TAIL_SIZE = 20
+
+# Log rows rolled into one compressed archive segment
+SEGMENT_SIZE = 1000
+
+# Newest log rows that compaction always leaves uncompressed
+KEEP_LIVE = 2 * SEGMENT_SIZE
+
+# Lists longer than this are stored as several `state_chunks` rows
+CHUNK_SIZE = 500
+
+# Values up to this size are fetched together with the key listing
+SMALL_VALUE_BYTES = 4096
+
+# Sessions whose per-key versions and chunk texts are kept in memory; the
+# least recently used one is dropped first and re-read when next used
+MAX_CACHED_SESSIONS = 256
+
+# Tries per write transaction before a conflict or lock error is given up on
+MAX_WRITE_ATTEMPTS = 10
+
+# Base delay in seconds before retrying a conflicting or locked transaction;
+# it grows with each attempt and is jittered so writers don't retry in step
+RETRY_BACKOFF = 0.01
+
+SCHEMA = [
+    # Append-only rows for list keys (e.g. interaction_history), one row per entry
+    """
+    CREATE TABLE IF NOT EXISTS state_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        app_name VARCHAR(128) NOT NULL,
+        user_id VARCHAR(128) NOT NULL,
+        session_id VARCHAR(128) NOT NULL,
+        key VARCHAR(128) NOT NULL,
+        value TEXT NOT NULL,
+        created_at VARCHAR(32) NOT NULL
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_state_log_session
+    ON state_log (app_name, user_id, session_id, key, id)
+    """,
+    # Older log entries, compressed in segments of SEGMENT_SIZE rows
+    """
+    CREATE TABLE IF NOT EXISTS state_log_archive (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        app_name VARCHAR(128) NOT NULL,
+        user_id VARCHAR(128) NOT NULL,
+        session_id VARCHAR(128) NOT NULL,
+        key VARCHAR(128) NOT NULL,
+        first_id INTEGER NOT NULL,
+        last_id INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        data BLOB NOT NULL
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_state_log_archive_session
+    ON state_log_archive (app_name, user_id, session_id, key, last_id)
+    """,
+    # One row per top-level state key; value is NULL when the key is chunked.
+    # version is bumped on every write so writers can detect lost updates.
+    """
+    CREATE TABLE IF NOT EXISTS state_keys (
+        app_name VARCHAR(128) NOT NULL,
+        user_id VARCHAR(128) NOT NULL,
+        session_id VARCHAR(128) NOT NULL,
+        key VARCHAR(128) NOT NULL,
+        value TEXT,
+        chunks INTEGER NOT NULL DEFAULT 0,
+        version INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (app_name, user_id, session_id, key)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS state_chunks (
+        app_name VARCHAR(128) NOT NULL,
+        user_id VARCHAR(128) NOT NULL,
+        session_id VARCHAR(128) NOT NULL,
+        key VARCHAR(128) NOT NULL,
+        chunk_no INTEGER NOT NULL,
+        value TEXT NOT NULL,
+        PRIMARY KEY (app_name, user_id, session_id, key, chunk_no)
+    )
+    """,
+]
+
+
+class IOCounter:
+    """
+    Counts session-store transactions so tests can catch extra round-trips.
+    """
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        # Writes retried after another writer changed the same keys
+        self.conflicts = 0
+
+    def snapshot(self) -> dict:
+        return {"reads": self.reads, "writes": self.writes, "conflicts": self.conflicts}
+
+    def since(self, snapshot: dict) -> dict:
+        return {name: value - snapshot[name] for name, value in self.snapshot().items()}
+
+
+class SessionCache:
+    """
+    Values per (app_name, user_id, session_id, key), kept for the
+    MAX_CACHED_SESSIONS most recently used sessions only.
+    """
+
+    def __init__(self, max_sessions: int = MAX_CACHED_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+
+    def get(self, cache_key, default=None):
+        entries = self._sessions.get(cache_key[:3])
+        if entries is None:
+            return default
+        self._sessions.move_to_end(cache_key[:3])
+        return entries.get(cache_key[3], default)
+
+    def __setitem__(self, cache_key, value):
+        session = cache_key[:3]
+        if session not in self._sessions:
+            self._sessions[session] = {}
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session)
+        self._sessions[session][cache_key[3]] = value
+
+    def pop(self, cache_key, default=None):
+        entries = self._sessions.get(cache_key[:3])
+        if entries is None:
+            return default
+        return entries.pop(cache_key[3], default)
+
+    def drop_session(self, app_name, user_id, session_id):
+        self._sessions.pop((app_name, user_id, session_id), None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class StaleStateError(Exception):
+    """
+    Raised when keys were changed by another writer since they were read.
+    """
+
+    def __init__(self, keys: list):
+        super().__init__(f"State changed concurrently: {', '.join(keys)}")
+        self.keys = keys
+
+
+class Turn:
+    """
+    State changes buffered during one user turn and committed together.
+    """
+
+    def __init__(self, app_name, user_id, session_id, io_start: dict):
+        self.app_name = app_name
+        self.user_id = user_id
+        self.session_id = session_id
+        self.log = []
+        self.values = {}
+        self.io_start = io_start
+        # Filled in on commit: store reads/writes made during the turn, and
+        # every key written with its committed value (merged, for keys another
+        # writer changed; the new tail, for log keys)
+        self.io = None
+        self.written = {}
+
+    def append(self, key, entry: dict):
+        self.log.append((key, entry))
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+def _chunk_texts(value: list) -> list[str]:
+    return [json.dumps(value[i:i + CHUNK_SIZE]) for i in range(0, len(value), CHUNK_SIZE)]
+
+
+def _decode(stored):
+    # A stored value is one JSON text, or a list of chunk texts
+    if isinstance(stored, str):
+        return json.loads(stored)
+    value = []
+    for chunk in stored:
+        value.extend(json.loads(chunk))
+    return value
+
+
+# --- Merging concurrent writes ---
+
+def merge_value(base, mine, theirs):
+    """
+    Three-way merge of a value both we and another writer changed since
+    `base`: our changes are applied on top of theirs. Maps merge per entry,
+    lists keep both sides' additions and removals, and for anything else our
+    value wins if we changed it.
+    """
+    if isinstance(mine, dict) and isinstance(theirs, dict):
+        return merge_maps(base, mine, theirs)
+    if isinstance(mine, list) and isinstance(theirs, list):
+        return merge_lists(base, mine, theirs)
+    return theirs if mine == base else mine
+
+
+def merge_maps(base, mine: dict, theirs: dict, merge_entry=merge_value) -> dict:
+    base = base if isinstance(base, dict) else {}
+    merged = dict(theirs)
+    for key in base.keys() - mine.keys():
+        # Removed on our side
+        merged.pop(key, None)
+    for key, value in mine.items():
+        if key in base and value == base[key]:
+            continue
+        if key in theirs and theirs[key] != base.get(key):
+            merged[key] = merge_entry(base.get(key), value, theirs[key])
+        else:
+            merged[key] = value
+    return merged
+
+
+def merge_lists(base, mine: list, theirs: list) -> list:
+    base = base if isinstance(base, list) else []
+    removed = [item for item in base if item not in mine]
+    added = [item for item in mine if item not in base and item not in theirs]
+    return [item for item in theirs if item not in removed] + added
+
+
+def drop_value(base, mine, theirs):
+    # For derived keys: forget both sides and let the owner rebuild it
+    return None
+
+
+class StateStore:
+    """
+    Per-key storage for session state, sharing the DatabaseSessionService engine.
+
+    Each top-level key is its own row in `state_keys`, long lists are split
+    into `state_chunks` rows, and log keys are appended to `state_log`, so
+    writing one key never rewrites the others.
+    """
+
+    def __init__(self, session_service, mergers: dict = None):
+        self.engine = session_service.db_engine
+        self._migrated = set()
+        # Last chunk texts read or written per key, used to skip unchanged chunks
+        self._chunk_cache = SessionCache()
+        # (version, stored value) per key as last read or written here: the
+        # version a write expects to replace and the base for merging. A
+        # session dropped from it writes as if another writer had created its
+        # keys: the stored values are re-read and merged.
+        self._versions = SessionCache()
+        # Key → merge function (base, mine, theirs) used instead of merge_value
+        self.mergers = mergers or {}
+        self.io_counter = IOCounter()
+        with self.engine.begin() as conn:
+            for statement in SCHEMA:
+                conn.execute(text(statement))
+            columns = [row[1] for row in conn.execute(text("PRAGMA table_info(state_keys)"))]
+            if "version" not in columns:
+                conn.execute(text("ALTER TABLE state_keys ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+
+    @contextmanager
+    def _reading(self):
+        self.io_counter.reads += 1
+        with self.engine.begin() as conn:
+            yield conn
+
+    @contextmanager
+    def _writing(self):
+        self.io_counter.writes += 1
+        with self.engine.begin() as conn:
+            yield conn
+
+    # --- Keys ---
+
+    def key_values(self, app_name, user_id, session_id) -> tuple[list, dict]:
+        """
+        Returns all key names of a session, plus the values of the small ones.
+        """
+        with self._reading() as conn:
+            self._migrate_blob(conn, app_name, user_id, session_id)
+            rows = conn.execute(
+                text(
+                    "SELECT key, CASE WHEN chunks = 0 AND length(value) <= :small "
+                    "THEN value END, version FROM state_keys "
+                    "WHERE app_name = :app_name AND user_id = :user_id AND session_id = :session_id"
+                ),
+                {
+                    "small": SMALL_VALUE_BYTES,
+                    "app_name": app_name,
+                    "user_id": user_id,
+                    "session_id": session_id,
+                },
+            ).fetchall()
+        names = [row[0] for row in rows]
+        small = {row[0]: json.loads(row[1]) for row in rows if row[1] is not None}
+        for key, stored, version in rows:
+            if stored is not None:
+                self._versions[(app_name, user_id, session_id, key)] = (version, stored)
+        return names, small
+
+    def load_key(self, app_name, user_id, session_id, key):
+        """
+        Loads a single key, reassembling it from chunks if needed.
+        Raises KeyError if the session has no such key.
+        """
+        with self._reading() as conn:
+            stored = self._read_key(conn, app_name, user_id, session_id, key)
+        if stored is None:
+            raise KeyError(key)
+        return _decode(stored)
+
+    def _read_key(self, conn, app_name, user_id, session_id, key):
+        # Returns the stored value (text or chunk texts), or None if missing,
+        # and remembers its version
+        params = {"app_name": app_name, "user_id": user_id, "session_id": session_id, "key": key}
+        cache_key = (app_name, user_id, session_id, key)
+        row = conn.execute(
+            text(
+                "SELECT value, chunks, version FROM state_keys WHERE app_name = :app_name "
+                "AND user_id = :user_id AND session_id = :session_id AND key = :key"
+            ),
+            params,
+        ).fetchone()
+        if row is None:
+            self._versions.pop(cache_key, None)
+            return None
+        stored = row[0]
+        if row[1]:
+            stored = [
+                r[0]
+                for r in conn.execute(
+                    text(
+                        "SELECT value FROM state_chunks WHERE app_name = :app_name "
+                        "AND user_id = :user_id AND session_id = :session_id AND key = :key "
+                        "ORDER BY chunk_no"
+                    ),
+                    params,
+                )
+            ]
+            self._chunk_cache[cache_key] = stored
+        else:
+            self._chunk_cache.pop(cache_key, None)
+        self._versions[cache_key] = (row[2], stored)
+        return stored
+
+    def set_keys(self, app_name, user_id, session_id, values: dict) -> dict:
+        """
+        Writes one or more top-level state keys in a single transaction.
+        Returns the values written, after merging any concurrent changes.
+        """
+        return self._transact(app_name, user_id, session_id, values)
+
+    def _transact(self, app_name, user_id, session_id, values: dict, before=None) -> dict:
+        """
+        Runs `before(conn)` and a checked write of `values` in one
+        transaction, retrying after a delay if the database is locked.
+        """
+        for attempt in range(MAX_WRITE_ATTEMPTS):
+            cache_keys = [(app_name, user_id, session_id, key) for key in values]
+            saved = [(k, self._versions.get(k), self._chunk_cache.get(k)) for k in cache_keys]
+            try:
+                with self._writing() as conn:
+                    if before is not None:
+                        before(conn)
+                    return self._write_keys(conn, app_name, user_id, session_id, values)
+            except OperationalError as e:
+                if "locked" not in str(e) or attempt == MAX_WRITE_ATTEMPTS - 1:
+                    raise
+                # The commit may have failed after the caches were updated
+                for cache_key, version, chunks in saved:
+                    for cache, cached in ((self._versions, version), (self._chunk_cache, chunks)):
+                        if cached is None:
+                            cache.pop(cache_key, None)
+                        else:
+                            cache[cache_key] = cached
+                time.sleep(RETRY_BACKOFF * (attempt + 1) * random.random())
+
+    def _write_keys(self, conn, app_name, user_id, session_id, values: dict, check: bool = True) -> dict:
+        """
+        Writes keys inside `conn`'s transaction and returns what was written.
+
+        With `check`, a key is only replaced if its version is still the one
+        we last read or wrote (or, for a key we never saw, if it doesn't exist
+        yet). A key another writer changed in the meantime is re-read, merged
+        with our value and written; the failed update already holds SQLite's
+        write lock, so it can't change again before we commit.
+        """
+        written, stale = [], []
+        for key, value in values.items():
+            swapped = self._swap(conn, app_name, user_id, session_id, key, value, check)
+            if swapped is None:
+                stale.append(key)
+            else:
+                written.append(swapped)
+
+        if stale:
+            self.io_counter.conflicts += 1
+            values = dict(values)
+            for key in stale:
+                cache_key = (app_name, user_id, session_id, key)
+                base = self._versions.get(cache_key)
+                stored = self._read_key(conn, app_name, user_id, session_id, key)
+                if stored is not None:
+                    merge = self.mergers.get(key, merge_value)
+                    values[key] = merge(_decode(base[1]) if base else None, values[key], _decode(stored))
+                swapped = self._swap(conn, app_name, user_id, session_id, key, values[key], check)
+                if swapped is None:
+                    raise StaleStateError([key])
+                written.append(swapped)
+
+        for params, cache_key, texts, version in written:
+            if isinstance(texts, list):
+                previous = self._chunk_cache.get(cache_key, [])
+                changed = [
+                    {**params, "chunk_no": i, "value": chunk}
+                    for i, chunk in enumerate(texts)
+                    if i >= len(previous) or previous[i] != chunk
+                ]
+                if changed:
+                    conn.execute(
+                        text(
+                            "INSERT INTO state_chunks (app_name, user_id, session_id, key, chunk_no, value) "
+                            "VALUES (:app_name, :user_id, :session_id, :key, :chunk_no, :value) "
+                            "ON CONFLICT (app_name, user_id, session_id, key, chunk_no) "
+                            "DO UPDATE SET value = excluded.value"
+                        ),
+                        changed,
+                    )
+                conn.execute(
+                    text(
+                        "DELETE FROM state_chunks WHERE app_name = :app_name AND user_id = :user_id "
+                        "AND session_id = :session_id AND key = :key AND chunk_no >= :count"
+                    ),
+                    {**params, "count": len(texts)},
+                )
+                self._chunk_cache[cache_key] = texts
+            elif self._chunk_cache.pop(cache_key, None) is not None:
+                # Chunks of a session dropped from the cache stay behind; with
+                # chunks = 0 they're never read, and the next chunked write
+                # replaces them
+                conn.execute(
+                    text(
+                        "DELETE FROM state_chunks WHERE app_name = :app_name AND user_id = :user_id "
+                        "AND session_id = :session_id AND key = :key"
+                    ),
+                    params,
+                )
+            self._versions[cache_key] = (version, texts)
+        return values
+
+    def _swap(self, conn, app_name, user_id, session_id, key, value, check: bool):
+        # Writes the state_keys row; returns None if the version check failed
+        params = {"app_name": app_name, "user_id": user_id, "session_id": session_id, "key": key}
+        cache_key = (app_name, user_id, session_id, key)
+        if isinstance(value, list) and len(value) > CHUNK_SIZE:
+            texts = _chunk_texts(value)
+            row = {**params, "value": None, "chunks": len(texts)}
+        else:
+            texts = json.dumps(value)
+            row = {**params, "value": texts, "chunks": 0}
+
+        seen = self._versions.get(cache_key)
+        if not check:
+            version = conn.execute(
+                text(
+                    "INSERT INTO state_keys (app_name, user_id, session_id, key, value, chunks, version) "
+                    "VALUES (:app_name, :user_id, :session_id, :key, :value, :chunks, 1) "
+                    "ON CONFLICT (app_name, user_id, session_id, key) "
+                    "DO UPDATE SET value = excluded.value, chunks = excluded.chunks, "
+                    "version = state_keys.version + 1 RETURNING version"
+                ),
+                row,
+            ).scalar()
+        elif seen is None:
+            inserted = conn.execute(
+                text(
+                    "INSERT INTO state_keys (app_name, user_id, session_id, key, value, chunks, version) "
+                    "VALUES (:app_name, :user_id, :session_id, :key, :value, :chunks, 1) "
+                    "ON CONFLICT (app_name, user_id, session_id, key) DO NOTHING"
+                ),
+                row,
+            ).rowcount
+            version = 1 if inserted else None
+        else:
+            updated = conn.execute(
+                text(
+                    "UPDATE state_keys SET value = :value, chunks = :chunks, version = version + 1 "
+                    "WHERE app_name = :app_name AND user_id = :user_id "
+                    "AND session_id = :session_id AND key = :key AND version = :version"
+                ),
+                {**row, "version": seen[0]},
+            ).rowcount
+            version = seen[0] + 1 if updated else None
+        if version is None:
+            return None
+        return params, cache_key, texts, version
+
+    # --- Log keys ---
+
+    def append(self, app_name, user_id, session_id, key, entry: dict):
+        """
+        Appends one entry to a log key and refreshes its tail in session state.
+        Cost does not depend on the length of the history.
+        """
+        with self._writing() as conn:
+            self._migrate_blob(conn, app_name, user_id, session_id)
+            self._insert(conn, app_name, user_id, session_id, key, [entry])
+            self._refresh_tail(conn, app_name, user_id, session_id, key)
+
+    def begin_turn(self, app_name, user_id, session_id) -> Turn:
+        return Turn(app_name, user_id, session_id, self.io_counter.snapshot())
+
+    def commit_turn(self, turn: Turn, values: dict = None):
+        """
+        Writes a turn's log entries, their tails and changed keys in one transaction.
+        """
+        values = {**(values or {}), **turn.values}
+        if turn.log or values:
+            tails = {}
+
+            def write_log(conn):
+                self._migrate_blob(conn, turn.app_name, turn.user_id, turn.session_id)
+                for key, entry in turn.log:
+                    self._insert(conn, turn.app_name, turn.user_id, turn.session_id, key, [entry])
+                for key in dict.fromkeys(key for key, _ in turn.log):
+                    tails.update(self._refresh_tail(conn, turn.app_name, turn.user_id, turn.session_id, key))
+
+            # Log entries are plain inserts, so a retry never loses or repeats them
+            written = self._transact(turn.app_name, turn.user_id, turn.session_id, values, write_log)
+            turn.written = {**tails, **written}
+        turn.io = self.io_counter.since(turn.io_start)
+
+    def tail(self, app_name, user_id, session_id, key, limit: int = 5) -> list:
+        """
+        Returns the last `limit` entries of a log key, oldest first.
+        """
+        with self._reading() as conn:
+            self._migrate_blob(conn, app_name, user_id, session_id)
+            return self._tail_rows(conn, app_name, user_id, session_id, key, limit)
+
+    def page(self, app_name, user_id, session_id, key, page: int = 0, page_size: int = 20) -> dict:
+        """
+        Returns one page of a log key, newest first. Archive segments are only
+        decompressed when they overlap the requested page.
+        """
+        params = {"app_name": app_name, "user_id": user_id, "session_id": session_id, "key": key}
+        offset = page * page_size
+        entries = []
+        with self._reading() as conn:
+            live = conn.execute(
+                text(
+                    "SELECT COUNT(*) FROM state_log WHERE app_name = :app_name "
+                    "AND user_id = :user_id AND session_id = :session_id AND key = :key"
+                ),
+                params,
+            ).scalar()
+            archived = conn.execute(
+                text(
+                    "SELECT COALESCE(SUM(count), 0) FROM state_log_archive WHERE app_name = :app_name "
+                    "AND user_id = :user_id AND session_id = :session_id AND key = :key"
+                ),
+                params,
+            ).scalar()
+            if offset < live:
+                rows = conn.execute(
+                    text(
+                        "SELECT value FROM state_log WHERE app_name = :app_name "
+                        "AND user_id = :user_id AND session_id = :session_id AND key = :key "
+                        "ORDER BY id DESC LIMIT :limit OFFSET :offset"
+                    ),
+                    {**params, "limit": page_size, "offset": offset},
+                ).fetchall()
+                entries = [json.loads(row[0]) for row in rows]
+
+            # Walk segments newest first, skipping whole segments by their count
+            skip = max(0, offset - live)
+            segments = conn.execute(
+                text(
+                    "SELECT id, count FROM state_log_archive WHERE app_name = :app_name "
+                    "AND user_id = :user_id AND session_id = :session_id AND key = :key "
+                    "ORDER BY last_id DESC"
+                ),
+                params,
+            ).fetchall()
+            for segment_id, count in segments:
+                if len(entries) >= page_size:
+                    break
+                if skip >= count:
+                    skip -= count
+                    continue
+                newest_first = self._read_segment(conn, segment_id)[::-1]
+                entries.extend(newest_first[skip:skip + page_size - len(entries)])
+                skip = 0
+
+        return {"entries": entries, "page": page, "page_size": page_size, "total": live + archived}
+
+    def search(self, app_name, user_id, session_id, key, query: str, limit: int = 20) -> list:
+        """
+        Returns up to `limit` entries containing `query`, newest first.
+        Archive segments are decompressed one at a time and only until enough
+        matches are found.
+        """
+        params = {"app_name": app_name, "user_id": user_id, "session_id": session_id, "key": key}
+        needle = query.lower()
+        with self._reading() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT value FROM state_log WHERE app_name = :app_name "
+                    "AND user_id = :user_id AND session_id = :session_id AND key = :key "
+                    "AND lower(value) LIKE :pattern ORDER BY id DESC LIMIT :limit"
+                ),
+                {**params, "pattern": f"%{needle}%", "limit": limit},
+            ).fetchall()
+            matches = [json.loads(row[0]) for row in rows]
+            segments = conn.execute(
+                text(
+                    "SELECT id FROM state_log_archive WHERE app_name = :app_name "
+                    "AND user_id = :user_id AND session_id = :session_id AND key = :key "
+                    "ORDER BY last_id DESC"
+                ),
+                params,
+            ).fetchall()
+            for (segment_id,) in segments:
+                if len(matches) >= limit:
+                    break
+                for entry in reversed(self._read_segment(conn, segment_id)):
+                    if needle in json.dumps(entry).lower():
+                        matches.append(entry)
+                        if len(matches) >= limit:
+                            break
+        return matches
+
+    def compact(self, app_name, user_id, session_id, key) -> int:
+        """
+        Rolls the oldest log rows into compressed archive segments, keeping the
+        newest KEEP_LIVE rows uncompressed. Returns the number of segments written.
+        """
+        params = {"app_name": app_name, "user_id": user_id, "session_id": session_id, "key": key}
+        written = 0
+        while True:
+            # One transaction per segment keeps the write lock short
+            with self.engine.begin() as conn:
+                live = conn.execute(
+                    text(
+                        "SELECT COUNT(*) FROM state_log WHERE app_name = :app_name "
+                        "AND user_id = :user_id AND session_id = :session_id AND key = :key"
+                    ),
+                    params,
+                ).scalar()
+                if live - SEGMENT_SIZE < KEEP_LIVE:
+                    return written
+                rows = conn.execute(
+                    text(
+                        "SELECT id, value FROM state_log WHERE app_name = :app_name "
+                        "AND user_id = :user_id AND session_id = :session_id AND key = :key "
+                        "ORDER BY id LIMIT :limit"
+                    ),
+                    {**params, "limit": SEGMENT_SIZE},
+                ).fetchall()
+                data = zlib.compress(("[" + ",".join(row[1] for row in rows) + "]").encode("utf-8"))
+                conn.execute(
+                    text(
+                        "INSERT INTO state_log_archive "
+                        "(app_name, user_id, session_id, key, first_id, last_id, count, data) "
+                        "VALUES (:app_name, :user_id, :session_id, :key, :first_id, :last_id, :count, :data)"
+                    ),
+                    {**params, "first_id": rows[0][0], "last_id": rows[-1][0], "count": len(rows), "data": data},
+                )
+                conn.execute(
+                    text(
+                        "DELETE FROM state_log WHERE app_name = :app_name AND user_id = :user_id "
+                        "AND session_id = :session_id AND key = :key AND id <= :last_id"
+                    ),
+                    {**params, "last_id": rows[-1][0]},
+                )
+                written += 1
+
+    def compact_all(self) -> int:
+        """
+        Compacts every session/key whose live log has grown past a segment.
+        """
+        with self.engine.begin() as conn:
+            targets = conn.execute(
+                text(
+                    "SELECT app_name, user_id, session_id, key FROM state_log "
+                    "GROUP BY app_name, user_id, session_id, key HAVING COUNT(*) >= :threshold"
+                ),
+                {"threshold": KEEP_LIVE + SEGMENT_SIZE},
+            ).fetchall()
+        return sum(self.compact(*target) for target in targets)
+
+    def _read_segment(self, conn, segment_id) -> list:
+        data = conn.execute(
+            text("SELECT data FROM state_log_archive WHERE id = :id"), {"id": segment_id}
+        ).scalar()
+        return json.loads(zlib.decompress(data).decode("utf-8"))
+
+    def _tail_rows(self, conn, app_name, user_id, session_id, key, limit) -> list:
+        rows = conn.execute(
+            text(
+                "SELECT value FROM state_log "
+                "WHERE app_name = :app_name AND user_id = :user_id "
+                "AND session_id = :session_id AND key = :key "
+                "ORDER BY id DESC LIMIT :limit"
+            ),
+            {
+                "app_name": app_name,
+                "user_id": user_id,
+                "session_id": session_id,
+                "key": key,
+                "limit": limit,
+            },
+        ).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
+    def _refresh_tail(self, conn, app_name, user_id, session_id, key) -> dict:
+        # Session state only mirrors a bounded ring buffer of the newest entries
+        tail = self._tail_rows(conn, app_name, user_id, session_id, key, TAIL_SIZE)
+        return self._write_keys(conn, app_name, user_id, session_id, {key: tail}, check=False)
+
+    def _insert(self, conn, app_name, user_id, session_id, key, entries):
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn.execute(
+            text(
+                "INSERT INTO state_log (app_name, user_id, session_id, key, value, created_at) "
+                "VALUES (:app_name, :user_id, :session_id, :key, :value, :created_at)"
+            ),
+            [
+                {
+                    "app_name": app_name,
+                    "user_id": user_id,
+                    "session_id": session_id,
+                    "key": key,
+                    "value": json.dumps(entry),
+                    "created_at": now,
+                }
+                for entry in entries
+            ],
+        )
+
+    # --- Session lifecycle ---
+
+    def create(self, app_name, user_id, session_id, state: dict):
+        with self._writing() as conn:
+            self._store_initial(conn, app_name, user_id, session_id, state)
+        self._migrated.add((app_name, user_id, session_id))
+
+    def delete(self, app_name, user_id, session_id):
+        params = {"app_name": app_name, "user_id": user_id, "session_id": session_id}
+        with self._writing() as conn:
+            for table in ("state_keys", "state_chunks", "state_log", "state_log_archive"):
+                conn.execute(
+                    text(
+                        f"DELETE FROM {table} WHERE app_name = :app_name "
+                        "AND user_id = :user_id AND session_id = :session_id"
+                    ),
+                    params,
+                )
+        self._migrated.discard((app_name, user_id, session_id))
+        for cache in (self._chunk_cache, self._versions):
+            cache.drop_session(app_name, user_id, session_id)
+
+    def _store_initial(self, conn, app_name, user_id, session_id, state: dict):
+        keys = {}
+        for key, value in state.items():
+            if key in LOG_KEYS and isinstance(value, list):
+                if value:
+                    self._insert(conn, app_name, user_id, session_id, key, value)
+                keys[key] = value[-TAIL_SIZE:]
+            else:
+                keys[key] = value
+        self._write_keys(conn, app_name, user_id, session_id, keys, check=False)
+
+    def _migrate_blob(self, conn, app_name, user_id, session_id):
+        # Sessions created before per-key storage keep their whole state in the
+        # sessions row; move it into key/log rows once and leave an empty blob.
+        marker = (app_name, user_id, session_id)
+        if marker in self._migrated:
+            return
+        params = {"app_name": app_name, "user_id": user_id, "session_id": session_id}
+        row = conn.execute(
+            text(
+                "SELECT state FROM sessions WHERE app_name = :app_name "
+                "AND user_id = :user_id AND id = :session_id"
+            ),
+            params,
+        ).fetchone()
+        state = json.loads(row[0]) if row and row[0] else {}
+        if state:
+            self._store_initial(conn, app_name, user_id, session_id, state)
+            conn.execute(
+                text(
+                    "UPDATE sessions SET state = '{}' WHERE app_name = :app_name "
+                    "AND user_id = :user_id AND id = :session_id"
+                ),
+                params,
+            )
+        self._migrated.add(marker)
+
+
+def get_state_store(session_service) -> StateStore:
+    """
+    The per-key store behind a ShardedSessionService. Other session services
+    keep no such store.
+    """
+    store = getattr(session_service, "state_store", None)
+    if store is None:
+        raise TypeError(f"{type(session_service).__name__} has no per-key state store; use ShardedSessionService")
+    return store
+
+
+async def run_compaction(store: StateStore, interval: float = 300.0):
+    """
+    Background task that periodically rolls old log rows into archives.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(store.compact_all)
+        except Exception as e:
+            print(f"Error compacting interaction log: {e}")
+        await asyncio.sleep(interval)
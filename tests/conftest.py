@@ -0,0 +1,7 @@
+import os
+import sys
+import warnings
+
+# Tests import the app's top-level modules the way main.py does
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+warnings.filterwarnings("ignore", module=r"google\.|vertexai")
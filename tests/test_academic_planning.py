@@ -0,0 +1,18 @@
+from types import SimpleNamespace
+import pytest
+from manager_agent.state_schema import new_session_state
+from manager_agent.sub_agents.academic_planning_agent.agent import add_task, generate_schedule
+
+
+@pytest.mark.parametrize("effort", [0, -1, float("inf"), float("nan")])
+def test_add_task_rejects_effort_that_is_not_a_positive_number(effort):
+    context = SimpleNamespace(state=new_session_state("Test"))
+    result = add_task("Revise", "01-01-2030", context, effort_hours=effort)
+    assert result["message"] == "❌ Effort must be a positive number of hours."
+    assert context.state["learning_tasks"] == {}
+
+
+@pytest.mark.parametrize("hours", [0, float("inf"), float("nan")])
+def test_generate_schedule_rejects_hours_that_are_not_a_positive_number(hours):
+    context = SimpleNamespace(state=new_session_state("Test"))
+    assert generate_schedule(context, hours_per_day=hours)["message"] == "❌ Study hours per day must be positive."
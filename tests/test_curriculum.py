@@ -0,0 +1,133 @@
+import io
+import json
+from datetime import date
+import pytest
+from curriculum import export_curriculum, import_curriculum
+from sharded_session_service import ShardedSessionService
+from state_store import get_state_store
+from manager_agent.state_schema import new_session_state
+
+APP_NAME = "LearningMASTest"
+USER_ID = "test"
+CURRICULUM_KEYS = ("known_topics", "prereq_map", "learning_tasks", "review_schedule")
+
+RECORDS = [
+    {"type": "known", "topic": "Algebra"},
+    {"type": "edge", "topic": "Calculus", "requires": "Algebra"},
+    {"type": "edge", "topic": "Linear Algebra", "requires": "Algebra"},
+    {"type": "edge", "topic": "Machine Learning", "requires": "Calculus"},
+    {"type": "edge", "topic": "Machine Learning", "requires": "Linear Algebra"},
+    {"type": "task", "task": "Read chapter 1", "due": "01-02-2030", "topic": "Calculus", "effort": 2.5},
+    {"type": "task", "task": "Practice sets", "due": ""},
+    {"type": "review", "topic": "Algebra", "date": "2030-01-01", "score": 4},
+    {"type": "review", "topic": "Algebra", "date": "2030-01-03", "score": 2},
+]
+
+
+@pytest.fixture
+def session_service(tmp_path):
+    return ShardedSessionService(db_url=f"sqlite:///{tmp_path}/test.db")
+
+
+def new_session(session_service, **state) -> str:
+    return session_service.create_session(
+        app_name=APP_NAME, user_id=USER_ID, state={**new_session_state("Test"), **state}
+    ).id
+
+
+def lines(records) -> list:
+    return [json.dumps(record) + "\n" for record in records]
+
+
+def run_import(session_service, session_id, records, **kwargs) -> dict:
+    return import_curriculum(session_service, APP_NAME, USER_ID, session_id, lines(records), **kwargs)
+
+
+def curriculum(session_service, session_id) -> dict:
+    store = get_state_store(session_service)
+    return {key: store.load_key(APP_NAME, USER_ID, session_id, key) for key in CURRICULUM_KEYS}
+
+
+def export(session_service, session_id, fmt="jsonl") -> str:
+    out = io.StringIO()
+    export_curriculum(session_service, APP_NAME, USER_ID, session_id, out, fmt)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "csv"])
+def test_export_then_import_round_trips(session_service, fmt):
+    source = new_session(session_service)
+    result = run_import(session_service, source, RECORDS)
+    assert result["written"] and result["error_count"] == 0
+    assert (result["edges"], result["tasks"], result["known"], result["reviews"]) == (4, 2, 1, 2)
+
+    exported = export(session_service, source, fmt)
+    copy = new_session(session_service)
+    text = io.StringIO(exported)
+    assert import_curriculum(session_service, APP_NAME, USER_ID, copy, text, fmt)["written"]
+    assert curriculum(session_service, copy) == curriculum(session_service, source)
+    assert export(session_service, copy, fmt) == exported
+
+    # Importing the same file again adds nothing
+    again = import_curriculum(session_service, APP_NAME, USER_ID, copy, io.StringIO(exported), fmt)
+    assert not again["written"]
+    assert (again["edges"], again["tasks"], again["known"], again["reviews"]) == (0, 0, 0, 0)
+
+
+def test_cycle_rejects_the_whole_import(session_service):
+    session_id = new_session(session_service, prereq_map={"Calculus": ["Algebra"]})
+    before = curriculum(session_service, session_id)
+    writes = get_state_store(session_service).io_counter.writes
+
+    result = run_import(session_service, session_id, RECORDS[:1] + [
+        {"type": "edge", "topic": "Algebra", "requires": "Calculus"},
+        {"type": "task", "task": "Read chapter 1", "due": "01-02-2030"},
+    ])
+    assert not result["written"]
+    assert result["errors"] == ["'Algebra' requiring 'Calculus' would create a cycle"]
+    assert curriculum(session_service, session_id) == before
+    assert get_state_store(session_service).io_counter.writes == writes
+
+
+def test_skip_invalid_drops_only_the_bad_records(session_service):
+    session_id = new_session(session_service, prereq_map={"Calculus": ["Algebra"]})
+    result = run_import(session_service, session_id, [
+        {"type": "edge", "topic": "Algebra", "requires": "Calculus"},
+        {"type": "edge", "topic": "Machine Learning", "requires": "Calculus"},
+        {"type": "review", "topic": "Algebra", "date": "2030-01-01", "score": 9},
+        {"type": "review", "topic": "Algebra", "date": "2030-01-02", "score": 5},
+        {"type": "task", "task": "Read chapter 1", "due": "2030-02-01"},
+        {"type": "task", "task": "Practice sets", "effort": -1},
+        {"type": "task", "task": "Read everything", "effort": "inf"},
+        {"type": "task", "task": "Revise", "effort": 3},
+        {"type": "lesson", "topic": "Calculus"},
+    ], skip_invalid=True)
+    assert result["written"]
+    assert result["error_count"] == 6
+    assert (result["edges"], result["tasks"], result["reviews"]) == (1, 1, 1)
+
+    state = curriculum(session_service, session_id)
+    assert state["prereq_map"] == {"Calculus": ["Algebra"], "Machine Learning": ["Calculus"]}
+    assert list(state["learning_tasks"]) == ["revise"]
+    assert state["review_schedule"]["Algebra"]["history"] == [[date(2030, 1, 2).toordinal(), 5]]
+
+
+def test_topic_names_merge_through_the_registry(session_service):
+    session_id = new_session(
+        session_service,
+        known_topics=["Graphs"],
+        topic_aliases={"graph theory": "Graphs"},
+    )
+    result = run_import(session_service, session_id, [
+        {"type": "known", "topic": "graphs"},
+        {"type": "known", "topic": "Graph Theory"},
+        {"type": "edge", "topic": "dynamic  programming", "requires": "GRAPHS"},
+        {"type": "edge", "topic": "Dynamic Programming", "requires": "graph theory"},
+        {"type": "task", "task": "Shortest paths", "topic": "Graph", "effort": 1},
+    ])
+    assert result["written"] and result["known"] == 0 and result["edges"] == 1
+
+    state = curriculum(session_service, session_id)
+    assert state["known_topics"] == ["Graphs"]
+    assert state["prereq_map"] == {"dynamic programming": ["Graphs"]}
+    assert state["learning_tasks"]["shortest paths"]["topic"] == "Graphs"
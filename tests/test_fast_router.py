@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+import pytest
+from fast_router import FastRouter
+from manager_agent.state_schema import new_session_state
+
+
+class Turn:
+    def __init__(self):
+        self.changed = {}
+
+    def set(self, key, value):
+        self.changed[key] = value
+
+
+def ask(query, **state):
+    session_state = new_session_state("Test")
+    session_state.update(state)
+    service = SimpleNamespace(get_session=lambda **kwargs: SimpleNamespace(state=session_state))
+    router = FastRouter(enabled=True)
+    turn = Turn()
+    return router.handle(service, "app", "user", "session", query, turn), router, turn
+
+
+PREREQS = {"prereq_map": {"Dynamic Programming": ["Graphs"]}, "known_topics": ["Graphs"]}
+
+
+def test_can_learn_answers_registered_topics():
+    reply, router, _ = ask("can I learn dynamic programming?", **PREREQS)
+    assert reply == "✅ You can learn 'dynamic programming' now."
+    assert router.hits["can_learn"] == 1
+
+
+@pytest.mark.parametrize("query", ["can I learn Quantum Computing", "can I learn Dynamic Programing"])
+def test_can_learn_leaves_unknown_and_misspelled_topics_to_the_agent(query):
+    reply, router, turn = ask(query, **PREREQS)
+    assert reply is None
+    assert router.hits["can_learn"] == 0
+    assert turn.changed == {}
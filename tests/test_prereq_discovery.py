@@ -0,0 +1,123 @@
+import asyncio
+import re
+import pytest
+from manager_agent.stub_llm import agent_model
+from manager_agent.sub_agents.search_agent import agent as search_agent
+from manager_agent.sub_agents.search_agent.cache import PrereqCache
+from manager_agent.sub_agents.dependency_agent.agent import auto_update_prereqs_many
+
+QUERY = re.compile(r"What are the prerequisites to learn (?P<topic>.+)\?")
+
+CURRICULUM = {
+    "Machine Learning": ["Linear Algebra", "Probability"],
+    "Deep Learning": ["Machine Learning", "Calculus"],
+    "Probability": ["Combinatorics"],
+    "Linear Algebra": ["Matrices"],
+}
+
+
+class FakeState(dict):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def __setitem__(self, key, value):
+        if key == "prereq_map":
+            self.writes += 1
+        super().__setitem__(key, value)
+
+
+class FakeSearch:
+    """
+    Stands in for search_agent.run_search: answers with the topic's
+    prerequisites in CURRICULUM, as a search summary would, and raises for
+    the topics in `fail`.
+    """
+
+    def __init__(self):
+        self.fail = set()
+        self.asked = []
+
+    async def __call__(self, query: str) -> str:
+        topic = QUERY.fullmatch(query)["topic"]
+        self.asked.append(topic)
+        await asyncio.sleep(0)
+        if topic in self.fail:
+            raise RuntimeError("search is down")
+        lines = [f"Prerequisites for {topic}:"] + [f"- {p}" for p in CURRICULUM.get(topic, [])]
+        return "\n".join(lines)
+
+
+class FakeToolContext:
+    def __init__(self):
+        self.state = FakeState()
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_agent, "prereq_cache", PrereqCache(str(tmp_path / "search_cache.db")))
+
+
+@pytest.fixture
+def search(monkeypatch):
+    fake = FakeSearch()
+    monkeypatch.setattr(search_agent, "run_search", fake)
+    return fake
+
+
+def test_batch_discovers_levels_with_one_write(search):
+    context = FakeToolContext()
+    result = asyncio.run(auto_update_prereqs_many(["Deep Learning", "Probability"], context, max_depth=2))
+
+    assert context.state["prereq_map"] == {
+        "Deep Learning": ["Machine Learning", "Calculus"],
+        "Probability": ["Combinatorics"],
+        "Machine Learning": ["Linear Algebra", "Probability"],
+        "Linear Algebra": ["Matrices"],
+    }
+    assert context.state.writes == 1
+    assert result["failed"] == []
+    assert result["prerequisites"] == {
+        "Deep Learning": ["Machine Learning", "Calculus"],
+        "Probability": ["Combinatorics"],
+    }
+    # Each topic is searched once, even when reached twice
+    assert sorted(search.asked) == sorted(set(search.asked))
+
+
+def test_depth_limits_the_search(search):
+    context = FakeToolContext()
+    asyncio.run(auto_update_prereqs_many(["Deep Learning"], context, max_depth=0))
+    assert context.state["prereq_map"] == {"Deep Learning": ["Machine Learning", "Calculus"]}
+    assert search.asked == ["Deep Learning"]
+
+
+def test_failing_topic_does_not_abort_the_batch(search):
+    search.fail = {"Probability"}
+    context = FakeToolContext()
+    result = asyncio.run(auto_update_prereqs_many(["Machine Learning", "Probability"], context, max_depth=0))
+
+    assert result["failed"] == ["Probability"]
+    assert "Search failed for: Probability" in result["message"]
+    assert context.state["prereq_map"] == {"Machine Learning": ["Linear Algebra", "Probability"]}
+    assert context.state.writes == 1
+
+
+def test_nothing_found_writes_nothing(search):
+    search.fail = {"Calculus"}
+    context = FakeToolContext()
+    result = asyncio.run(auto_update_prereqs_many(["Calculus"], context))
+    assert result["failed"] == ["Calculus"]
+    assert "prereq_map" not in context.state
+    assert context.state.writes == 0
+
+
+
+def test_search_runs_the_search_agent(monkeypatch):
+    # The real invocation path, with the scripted offline model
+    monkeypatch.setenv("LEARNING_MAS_MODEL", "stub")
+    monkeypatch.setattr(search_agent.search_agent, "model", agent_model("search_agent"))
+    context = FakeToolContext()
+    result = asyncio.run(auto_update_prereqs_many(["Topology"], context, max_depth=0))
+    assert result["failed"] == []
+    assert context.state["prereq_map"] == {"Topology": ["Basics of Topology", "Discrete math"]}
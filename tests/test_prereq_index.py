@@ -0,0 +1,88 @@
+import random
+from types import SimpleNamespace
+import pytest
+from manager_agent.state_schema import new_session_state
+from manager_agent.sub_agents.dependency_agent.agent import (
+    add_prerequisite, add_topic_alias, can_learn, forget, learned, plan_learning_path, suggest_next_topics,
+)
+from manager_agent.sub_agents.dependency_agent.prereq_index import PrereqIndex, get_index
+
+
+def tool_context():
+    return SimpleNamespace(state=new_session_state("Test"))
+
+
+def test_alias_rename_of_a_known_topic_updates_the_index():
+    context = tool_context()
+    add_prerequisite("Dynamic Programming", "Graphs", context)
+    learned("graph theory", context)
+    # Warm the index before the rename
+    assert can_learn("Dynamic Programming", context)["missing"] == ["Graphs"]
+
+    add_topic_alias("graph theory", "Graphs", context)
+    assert context.state["known_topics"] == ["Graphs"]
+    assert can_learn("Dynamic Programming", context) == {"can_learn": True, "missing": []}
+    assert suggest_next_topics(context)["suggestions"] == ["Dynamic Programming"]
+    assert plan_learning_path("Dynamic Programming", context)["path"] == ["Dynamic Programming"]
+
+
+def test_same_length_change_by_another_writer_is_picked_up():
+    context = tool_context()
+    add_prerequisite("Calculus", "Algebra", context)
+    add_prerequisite("Statistics", "Probability", context)
+    learned("Algebra", context)
+    assert suggest_next_topics(context)["suggestions"] == ["Calculus"]
+
+    # Forget one topic and learn another outside the tools: same length
+    context.state["known_topics"] = ["Probability"]
+    assert can_learn("Calculus", context)["missing"] == ["Algebra"]
+    assert can_learn("Statistics", context)["can_learn"]
+    assert suggest_next_topics(context)["suggestions"] == ["Statistics"]
+
+
+def test_learned_and_forget_move_the_index_stamp():
+    context = tool_context()
+    add_prerequisite("Calculus", "Algebra", context)
+    stamp = dict(context.state["prereq_index"])
+    learned("Algebra", context)
+    assert context.state["prereq_index"]["rev"] == stamp["rev"] + 1
+    forget("Algebra", context)
+    assert context.state["prereq_index"]["rev"] == stamp["rev"] + 2
+    assert get_index(context.state).missing("Calculus") == ["Algebra"]
+
+
+def reference_missing(edges: dict, known: set, topic: str) -> set:
+    # Breadth-first search over the current edges
+    seen, queue = set(), list(edges.get(topic, ()))
+    while queue:
+        required = queue.pop(0)
+        if required not in seen:
+            seen.add(required)
+            queue.extend(edges.get(required, ()))
+    return seen - known
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_missing_matches_search_after_edge_changes(seed):
+    rng = random.Random(seed)
+    names = [f"Topic {i}" for i in range(40)]
+    edges = {}
+    index = PrereqIndex({})
+    known = set(rng.sample(names, 10))
+    index.sync_known(sorted(known))
+    for _ in range(400):
+        # Edges point to earlier topics, so the graph stays acyclic
+        v = rng.randrange(1, len(names))
+        topic, required = names[v], names[rng.randrange(max(0, v - 8), v)]
+        if required in edges.get(topic, ()) and rng.random() < 0.6:
+            index.remove_edge(topic, required)
+            edges[topic].discard(required)
+        else:
+            assert index.add_edge(topic, required)
+            edges.setdefault(topic, set()).add(required)
+        for name in rng.sample(names, 5):
+            missing = index.missing(name)
+            assert set(missing) == reference_missing(edges, known, name)
+            # In an order they can be learned
+            for i, prereq in enumerate(missing):
+                assert not reference_missing(edges, known, prereq) & set(missing[i + 1:])
@@ -0,0 +1,174 @@
+import inspect
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from manager_agent.state_schema import Review, new_session_state, today_ordinal
+from manager_agent.sub_agents.spaced_repetition_agent import agent
+from manager_agent.sub_agents.spaced_repetition_agent.review_fit import (
+    MIN_FIT_REVIEWS, TARGET_RECALL, fit_review_params, fit_schedule_params,
+)
+from manager_agent.sub_agents.spaced_repetition_agent.review_scheduler import (
+    FittedScheduler, SM2Scheduler, get_scheduler,
+)
+from manager_agent.sub_agents.spaced_repetition_agent.sm2 import (
+    FIRST_INTERVAL, MIN_EASINESS, NEW_EASINESS, NEW_INTERVAL, NEW_REPETITION, SECOND_INTERVAL,
+    forecast_load, sm2_batch,
+)
+
+DEFAULTS = (NEW_EASINESS, FIRST_INTERVAL, SECOND_INTERVAL)
+
+
+def simulate(true, topics, reviews, seed):
+    # Histories of a learner whose memory follows SM-2 with the `true`
+    # (easiness, first, second) parameters, reviewing on a plain SM-2
+    # schedule a bit early or late
+    rng = np.random.default_rng(seed)
+    e_true, first, second = (np.full(topics, value, dtype=np.float64) for value in true)
+    repetition = np.full(topics, NEW_REPETITION)
+    interval = np.full(topics, NEW_INTERVAL)
+    easiness = np.full(topics, NEW_EASINESS)
+    stability = np.ones(topics)
+    day = 700_000 + rng.integers(0, 30, topics)
+    days, scores = np.empty((reviews, topics), dtype=np.int64), np.empty((reviews, topics), dtype=np.int64)
+    for r in range(reviews):
+        if r:
+            day = day + np.maximum(1, np.rint(interval * rng.lognormal(0, 0.5, topics))).astype(np.int64)
+            recalled = rng.random(topics) < TARGET_RECALL ** ((day - days[r - 1]) / stability)
+        else:
+            recalled = rng.random(topics) < 0.8
+        score = np.where(recalled, rng.integers(3, 6, topics), rng.integers(0, 3, topics))
+        days[r], scores[r] = day, score
+
+        passed = score >= 3
+        new_repetition = np.where(passed, repetition + 1, 0)
+        stability = np.where(new_repetition <= 1, first, np.where(new_repetition == 2, second, stability * e_true))
+        lapse = 5 - score
+        e_true = np.where(passed, np.maximum(MIN_EASINESS, e_true + 0.1 - lapse * (0.08 + lapse * 0.02)), e_true)
+        repetition, interval, easiness = sm2_batch(repetition, interval, easiness, score)
+    return np.full(topics, reviews), days.T.ravel(), scores.T.ravel()
+
+
+def assert_recovered(fitted, true):
+    easiness, first, second = fitted
+    assert easiness == pytest.approx(true[0], abs=0.15)
+    assert first == pytest.approx(true[1], rel=0.25)
+    assert second == pytest.approx(true[2], rel=0.1)
+
+
+@pytest.mark.parametrize("true", [(2.0, 3.0, 8.0), (2.8, 1.5, 4.0), (1.7, 2.0, 10.0)])
+def test_fit_recovers_simulated_parameters(true):
+    easiness, first, second, counts = fit_review_params(*simulate(true, 1000, 10, seed=1))
+    assert counts[0] == 9000
+    assert_recovered((easiness[0], first[0], second[0]), true)
+
+
+def test_fit_per_group_recovers_each_group():
+    trues = [(2.0, 3.0, 8.0), (2.8, 1.5, 4.0)]
+    runs = [simulate(true, 1000, 10, seed) for seed, true in enumerate(trues)]
+    lengths, days, scores = (np.concatenate(parts) for parts in zip(*runs))
+    groups = np.repeat([0, 1], 1000)
+    easiness, first, second, _ = fit_review_params(lengths, days, scores, groups)
+    for g, true in enumerate(trues):
+        assert_recovered((easiness[g], first[g], second[g]), true)
+
+
+def test_too_little_data_keeps_the_defaults():
+    lengths, days, scores = simulate((2.0, 3.0, 8.0), 2, 10, seed=0)
+    fitted = fit_review_params(lengths, days, scores)
+    assert fitted[3][0] < MIN_FIT_REVIEWS
+    assert [f[0] for f in fitted[:3]] == list(DEFAULTS)
+    assert [f[0] for f in fit_review_params([], [], [])[:3]] == list(DEFAULTS)
+
+
+def random_columns(rng, n):
+    return rng.integers(0, 8, n), rng.integers(1, 200, n), rng.uniform(1.3, 3.5, n), rng.integers(0, 6, n)
+
+
+@pytest.mark.parametrize("scheduler", [
+    FittedScheduler(*DEFAULTS),
+    FittedScheduler(*DEFAULTS, topics={"Unfitted": list(DEFAULTS)}),
+    FittedScheduler.from_params(fit_schedule_params({})),
+])
+def test_fitted_scheduler_with_default_parameters_is_sm2(scheduler):
+    rng = np.random.default_rng(5)
+    topics = [f"Topic {i}" for i in range(300)]
+    repetition, interval, easiness, scores = random_columns(rng, len(topics))
+    expected = sm2_batch(repetition, interval, easiness, scores)
+    for got, plain, want in zip(
+        scheduler.review(topics, repetition, interval, easiness, scores),
+        SM2Scheduler().review(topics, repetition, interval, easiness, scores),
+        expected,
+    ):
+        np.testing.assert_array_equal(got, want)
+        np.testing.assert_array_equal(plain, want)
+
+    offsets = rng.integers(-5, 40, len(topics))
+    np.testing.assert_array_equal(
+        scheduler.forecast(topics, offsets, repetition, interval, easiness, 60),
+        forecast_load(offsets, repetition, interval, easiness, 60),
+    )
+    assert scheduler.start_easiness("Topic 0") == NEW_EASINESS
+
+
+def test_get_scheduler_follows_review_params():
+    assert type(get_scheduler({})) is SM2Scheduler
+    assert type(get_scheduler({"review_params": None})) is SM2Scheduler
+    fitted = get_scheduler({"review_params": {
+        "scheduler": "fitted", "easiness": 2.0, "first_interval": 3.0, "second_interval": 8.0,
+        "topics": {"Graphs": [1.5, 2.0, 5.0]},
+    }})
+    assert type(fitted) is FittedScheduler
+    assert fitted.start_easiness("Graphs") == 1.5
+    assert fitted.start_easiness("Calculus") == 2.0
+    _, interval, _ = fitted.review(["Graphs", "Calculus"], [1, 1], [1, 1], [2.0, 2.0], [5, 5])
+    assert interval.tolist() == [5, 8]
+
+
+def schedule_state(reviews_per_topic, topics):
+    state = new_session_state("Test")
+    today = today_ordinal()
+    state["known_topics"] = list(topics)
+    for topic in topics:
+        history = [[today - 10 * (reviews_per_topic - i), 4] for i in range(reviews_per_topic)]
+        state["review_schedule"][topic] = Review(topic, history[-1][0], today + 1, 2, 1, 2.5, history).dump()
+    return state
+
+
+def test_tune_with_too_little_history_keeps_sm2():
+    context = SimpleNamespace(state=schedule_state(3, ["Graphs", "Calculus"]))
+    result = agent.tune_review_schedule(context)
+    assert "Not enough review history" in result["message"]
+    assert not context.state.get("review_params")
+    assert type(get_scheduler(context.state)) is SM2Scheduler
+
+
+def test_tune_then_reset():
+    context = SimpleNamespace(state=schedule_state(6, [f"Topic {i}" for i in range(10)]))
+    result = agent.tune_review_schedule(context)
+    assert set(result) == {"message", "start_easiness", "first_interval_days", "second_interval_days"}
+    assert context.state["review_params"]["scheduler"] == "fitted"
+    assert type(get_scheduler(context.state)) is FittedScheduler
+    agent.tune_review_schedule(context, reset=True)
+    assert type(get_scheduler(context.state)) is SM2Scheduler
+
+
+def test_review_tools_keep_their_signatures():
+    def params(tool):
+        return [(p.name, p.default) for p in inspect.signature(tool).parameters.values()]
+
+    empty = inspect.Parameter.empty
+    assert params(agent.record_review_result) == [("topic", empty), ("score", empty), ("tool_context", empty)]
+    assert params(agent.get_due_reviews) == [("tool_context", empty), ("days_ahead", 0)]
+    assert params(agent.record_review_session) == [("topics", empty), ("scores", empty), ("tool_context", empty)]
+    assert params(agent.forecast_reviews) == [("tool_context", empty), ("days", 30)]
+
+
+def test_review_tools_keep_their_return_shape():
+    context = SimpleNamespace(state=new_session_state("Test"))
+    context.state["known_topics"] = ["Graphs"]
+    result = agent.record_review_result("Graphs", 4, context)
+    assert result == {"message": "Review recorded for 'Graphs' with score 4. Next review in 6 days."}
+    assert agent.get_due_reviews(context) == {
+        "message": "✅ You're all caught up! No topics are due for review today."
+    }
+    assert agent.get_due_reviews(context, days_ahead=6) == {"due_topics": ["Graphs"]}
@@ -0,0 +1,84 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from google.adk.sessions import DatabaseSessionService
+from fast_router import FastRouter
+from sharded_session_service import ShardedSessionService
+from manager_agent.state_schema import Progress, new_session_state
+from utils import StateView, call_agent_async
+
+APP_NAME = "LearningMASTest"
+USER_ID = "test"
+
+
+class FailingRouter:
+    def handle(self, *args):
+        raise KeyError("broken tool")
+
+    def record_llm_turn(self, seconds):
+        self.llm_turns = getattr(self, "llm_turns", 0) + 1
+
+
+def test_router_error_falls_through_and_commits_turn(tmp_path):
+    session_service = ShardedSessionService(db_url=f"sqlite:///{tmp_path}/test.db")
+    session = session_service.create_session(app_name=APP_NAME, user_id=USER_ID, state=new_session_state("Test"))
+    asked = []
+
+    async def run_async(**kwargs):
+        asked.append(kwargs["new_message"].parts[0].text)
+        return
+        yield
+
+    runner = SimpleNamespace(session_service=session_service, app_name=APP_NAME, run_async=run_async)
+    router = FailingRouter()
+    asyncio.run(call_agent_async(runner, USER_ID, session.id, "what do I know", router=router))
+
+    assert asked == ["what do I know"]
+    assert router.llm_turns == 1
+    state = session_service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session.id).state
+    assert [e["query"] for e in state["interaction_history"]] == ["what do I know"]
+
+
+@pytest.fixture
+def session_service(tmp_path):
+    return ShardedSessionService(db_url=f"sqlite:///{tmp_path}/test.db")
+
+
+def test_turn_touching_one_key_reads_and_writes_once(session_service):
+    state = new_session_state("Test")
+    state["study_progress"] = {"Graphs": Progress("Graphs", 10, False).dump()}
+    session = session_service.create_session(app_name=APP_NAME, user_id=USER_ID, state=state)
+    runner = SimpleNamespace(session_service=session_service, app_name=APP_NAME)
+    router = FastRouter(enabled=True)
+    asyncio.run(call_agent_async(runner, USER_ID, session.id, "I finished Graphs 50%", router=router))
+
+    asyncio.run(call_agent_async(runner, USER_ID, session.id, "I finished Graphs 60%", router=router))
+    turn = session_service.last_turn
+    # One read lists the state keys (with their small values) and one reads
+    # ADK's session row; the query, the reply and study_progress are
+    # committed in one write
+    assert turn.io == {"reads": 2, "writes": 1, "conflicts": 0}
+    assert set(turn.written) == {"study_progress", "interaction_history"}
+    assert turn.written["study_progress"]["Graphs"]["percent"] == 60
+
+
+def test_turn_without_changes_writes_nothing(session_service):
+    session = session_service.create_session(app_name=APP_NAME, user_id=USER_ID, state=new_session_state("Test"))
+    turn = session_service.begin_turn(APP_NAME, USER_ID, session.id)
+    session_service.commit_turn(turn)
+    assert turn.io == {"reads": 0, "writes": 0, "conflicts": 0}
+    assert turn.written == {}
+
+
+def test_plain_database_session_service_is_rejected(tmp_path):
+    runner = SimpleNamespace(session_service=DatabaseSessionService(db_url=f"sqlite:///{tmp_path}/test.db"), app_name=APP_NAME)
+    with pytest.raises(TypeError, match="ShardedSessionService"):
+        asyncio.run(call_agent_async(runner, USER_ID, "session", "what do I know"))
+
+
+def test_state_view_hides_the_conversation_summary(capsys):
+    view = StateView()
+    view.snapshot = {"user_name": "Test", "known_topics": []}
+    turn = SimpleNamespace(written={"context_summary": "- asked about graphs", "topic_index": {"id": "x", "rev": 1}})
+    view.show_changes(None, APP_NAME, USER_ID, "session", turn)
+    assert capsys.readouterr().out.strip() == "State Changes: none"
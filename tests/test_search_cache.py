@@ -0,0 +1,158 @@
+import asyncio
+import importlib
+import threading
+from types import SimpleNamespace
+import pytest
+from manager_agent.sub_agents.search_agent import cache
+from manager_agent.sub_agents.search_agent.cache import PrereqCache
+
+TEMPLATE = "prerequisites of {topic}"
+
+
+class FakeSearch:
+    """
+    Stand-in for the search tool: answers per topic, counts calls, and can
+    fail or wait for a signal before answering.
+    """
+
+    def __init__(self, fail=(), error=RuntimeError):
+        self.calls = []
+        self.fail = set(fail)
+        self.error = error
+        self.release = None
+
+    def fetch(self, topic):
+        async def run():
+            self.calls.append(topic)
+            if self.release is not None:
+                await self.release.wait()
+            if topic in self.fail:
+                raise self.error(f"search failed for {topic}")
+            return f"results for {topic}"
+        return run
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1_000_000.0)
+    monkeypatch.setattr(cache, "time", SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    return lambda **kwargs: PrereqCache(str(tmp_path / "cache.db"), **kwargs)
+
+
+def lookup(prereq_cache, search, topic):
+    return asyncio.run(prereq_cache.get_or_fetch(topic, TEMPLATE, search.fetch(topic)))
+
+
+def test_hit_after_miss_and_normalized_key(make_cache, clock):
+    prereq_cache, search = make_cache(), FakeSearch()
+    assert lookup(prereq_cache, search, "Graph Theory") == ("results for Graph Theory", True)
+    assert lookup(prereq_cache, search, "  graph   theory ") == ("results for Graph Theory", True)
+    assert search.calls == ["Graph Theory"]
+    stats = prereq_cache.stats()
+    assert (stats["misses"], stats["hits"], stats["size"]) == (1, 1, 1)
+
+
+def test_entries_expire_after_ttl(make_cache, clock):
+    prereq_cache, search = make_cache(ttl=100), FakeSearch()
+    lookup(prereq_cache, search, "Algebra")
+    clock.value += 99
+    lookup(prereq_cache, search, "Algebra")
+    assert len(search.calls) == 1
+    clock.value += 2
+    lookup(prereq_cache, search, "Algebra")
+    assert len(search.calls) == 2
+    stats = prereq_cache.stats()
+    assert (stats["expired"], stats["misses"], stats["hits"]) == (1, 2, 1)
+
+
+def test_least_recently_used_is_evicted(make_cache, clock):
+    prereq_cache, search = make_cache(max_entries=2), FakeSearch()
+    for topic in ("A", "B"):
+        lookup(prereq_cache, search, topic)
+        clock.value += 1
+    # Using A makes B the least recently used
+    lookup(prereq_cache, search, "A")
+    clock.value += 1
+    lookup(prereq_cache, search, "C")
+    assert prereq_cache.stats()["evictions"] == 1
+    assert prereq_cache.stats()["size"] == 2
+
+    search.calls.clear()
+    lookup(prereq_cache, search, "A")
+    lookup(prereq_cache, search, "C")
+    lookup(prereq_cache, search, "B")
+    assert search.calls == ["B"]
+
+
+def test_failures_are_cached_for_the_negative_ttl(make_cache, clock):
+    prereq_cache, search = make_cache(ttl=1000, negative_ttl=10), FakeSearch(fail={"Quantum"})
+    assert lookup(prereq_cache, search, "Quantum") == ("search failed for Quantum", False)
+    assert lookup(prereq_cache, search, "Quantum") == ("search failed for Quantum", False)
+    assert search.calls == ["Quantum"]
+    assert prereq_cache.stats()["negative_hits"] == 1
+
+    clock.value += 11
+    search.fail.clear()
+    assert lookup(prereq_cache, search, "Quantum") == ("results for Quantum", True)
+    assert search.calls == ["Quantum", "Quantum"]
+
+
+def test_concurrent_lookups_share_one_fetch(make_cache, clock):
+    prereq_cache, search = make_cache(), FakeSearch()
+
+    async def run():
+        search.release = asyncio.Event()
+        lookups = [
+            asyncio.create_task(prereq_cache.get_or_fetch("Calculus", TEMPLATE, search.fetch("Calculus")))
+            for _ in range(5)
+        ]
+        # Released once the other four wait on the first one's fetch
+        while prereq_cache.stats()["collapsed"] < 4:
+            await asyncio.sleep(0.001)
+        search.release.set()
+        return await asyncio.gather(*lookups)
+
+    results = asyncio.run(run())
+    assert results == [("results for Calculus", True)] * 5
+    assert search.calls == ["Calculus"]
+    stats = prereq_cache.stats()
+    assert (stats["misses"], stats["collapsed"], stats["hits"]) == (1, 4, 0)
+
+
+@pytest.mark.parametrize("error", [AttributeError, TypeError])
+def test_programming_errors_are_raised_and_not_cached(make_cache, clock, error):
+    prereq_cache, search = make_cache(), FakeSearch(fail={"Quantum"}, error=error)
+    for _ in range(2):
+        with pytest.raises(error):
+            lookup(prereq_cache, search, "Quantum")
+    assert search.calls == ["Quantum", "Quantum"]
+    assert prereq_cache.stats()["size"] == 0
+
+    search.fail.clear()
+    assert lookup(prereq_cache, search, "Quantum") == ("results for Quantum", True)
+
+
+def test_database_is_used_off_the_event_loop(make_cache, clock, monkeypatch):
+    prereq_cache, search = make_cache(), FakeSearch()
+    threads = []
+    for name in ("_get", "_put"):
+        method = getattr(prereq_cache, name)
+        monkeypatch.setattr(prereq_cache, name, lambda *args, m=method: threads.append(threading.current_thread()) or m(*args))
+    lookup(prereq_cache, search, "Algebra")
+    lookup(prereq_cache, search, "Algebra")
+    assert len(threads) == 3
+    assert threading.main_thread() not in threads
+
+
+def test_importing_creates_no_database(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("LEARNING_MAS_SEARCH_CACHE", raising=False)
+    importlib.reload(cache)
+    assert not (tmp_path / "search_cache.db").exists()
+    assert cache.prereq_cache.stats()["size"] == 0
+    assert (tmp_path / "search_cache.db").exists()
@@ -0,0 +1,80 @@
+import copy
+import random
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from manager_agent.state_schema import Review, new_session_state, today_ordinal
+from manager_agent.sub_agents.spaced_repetition_agent.agent import (
+    forecast_reviews, record_review_result, record_review_session,
+)
+from manager_agent.sub_agents.spaced_repetition_agent.sm2 import sm2_batch
+
+
+def scalar_sm2(repetition, interval, easiness, score):
+    # The textbook rules, one review at a time
+    if score < 3:
+        return 0, 1, easiness
+    repetition += 1
+    interval = 1 if repetition == 1 else 6 if repetition == 2 else int(round(interval * easiness))
+    return repetition, interval, max(1.3, easiness + 0.1 - (5 - score) * (0.08 + (5 - score) * 0.02))
+
+
+def random_state(rng, topics):
+    today = today_ordinal()
+    state = new_session_state("Test")
+    state["known_topics"] = list(topics)
+    for topic in topics[:len(topics) // 2]:
+        last = today - rng.randint(0, 30)
+        state["review_schedule"][topic] = Review(
+            topic, last, last + rng.randint(1, 60), rng.randint(1, 200),
+            rng.randint(0, 10), rng.uniform(1.3, 3.5), [[last, rng.randint(0, 5)]],
+        ).dump()
+    return state
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_sm2_batch_matches_scalar_rules(seed):
+    rng = random.Random(seed)
+    rows = [(rng.randint(0, 12), rng.randint(1, 400), rng.uniform(1.3, 3.5), rng.randint(0, 5)) for _ in range(500)]
+    repetition, interval, easiness = sm2_batch(*zip(*rows))
+    for i, row in enumerate(rows):
+        expected = scalar_sm2(*row)
+        assert (repetition[i], interval[i]) == expected[:2]
+        assert easiness[i] == pytest.approx(expected[2], abs=1e-12)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_review_session_matches_repeated_single_reviews(seed):
+    rng = random.Random(seed)
+    topics = [f"Topic {i}" for i in range(12)]
+    state = random_state(rng, topics)
+    # Duplicates included: a topic may be reviewed several times in one session
+    reviewed = [rng.choice(topics) for _ in range(rng.randint(1, 30))]
+    scores = [rng.randint(0, 5) for _ in reviewed]
+
+    single = SimpleNamespace(state=copy.deepcopy(state))
+    for topic, score in zip(reviewed, scores):
+        record_review_result(topic, score, single)
+    batch = SimpleNamespace(state=copy.deepcopy(state))
+    record_review_session(reviewed, scores, batch)
+
+    assert batch.state["review_schedule"] == single.state["review_schedule"]
+
+
+def test_review_session_rejects_mismatched_scores():
+    ctx = SimpleNamespace(state=new_session_state("Test"))
+    assert "exactly one score" in record_review_session(["A", "B"], [3], ctx)["message"]
+
+
+def test_sm2_batch_keeps_easiness_floor():
+    _, _, easiness = sm2_batch(np.full(6, 3), np.full(6, 10), np.full(6, 1.3), np.arange(6))
+    assert easiness.min() >= 1.3
+
+
+@pytest.mark.parametrize("days", [0, -3, 366])
+def test_forecast_rejects_out_of_range_days(days):
+    ctx = SimpleNamespace(state=new_session_state("Test"))
+    ctx.state["known_topics"] = ["A"]
+    record_review_result("A", 4, ctx)
+    assert "between 1 and 365" in forecast_reviews(ctx, days=days)["message"]
+    assert forecast_reviews(ctx, days=1)["peak_reviews"] == 0
@@ -0,0 +1,66 @@
+import pytest
+from sharded_session_service import ShardedSessionService
+from state_store import CHUNK_SIZE, get_state_store
+from manager_agent.state_schema import Progress, new_session_state
+
+APP_NAME = "LearningMASTest"
+USER_ID = "test"
+
+
+@pytest.fixture
+def services(tmp_path):
+    # Two writers on the same database, as two processes would be
+    db_url = f"sqlite:///{tmp_path}/test.db"
+    return ShardedSessionService(db_url=db_url), ShardedSessionService(db_url=db_url)
+
+
+def progress(*topics) -> dict:
+    return {topic: Progress(topic, 50, False).dump() for topic in topics}
+
+
+def test_conflicting_writes_from_two_stores_are_merged(services):
+    first, second = services
+    session = first.create_session(app_name=APP_NAME, user_id=USER_ID, state=new_session_state("Test"))
+    stores = [get_state_store(s) for s in services]
+    for store in stores:
+        store.key_values(APP_NAME, USER_ID, session.id)
+
+    stores[0].set_keys(APP_NAME, USER_ID, session.id, {
+        "study_progress": progress("Graphs"),
+        "prereq_map": {"Dynamic Programming": ["Graphs"]},
+    })
+    assert stores[0].io_counter.conflicts == 0
+
+    # Based on the state read before the first write
+    written = stores[1].set_keys(APP_NAME, USER_ID, session.id, {
+        "study_progress": progress("Trees"),
+        "prereq_map": {"Dynamic Programming": ["Recursion"], "Heaps": ["Trees"]},
+    })
+    assert stores[1].io_counter.conflicts == 1
+    assert written["study_progress"] == progress("Graphs", "Trees")
+    assert written["prereq_map"] == {"Dynamic Programming": ["Graphs", "Recursion"], "Heaps": ["Trees"]}
+
+    for service in services:
+        state = service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session.id).state
+        assert state["study_progress"] == progress("Graphs", "Trees")
+        assert state["prereq_map"] == written["prereq_map"]
+
+
+def test_caches_keep_only_recent_sessions(services):
+    service, other = services
+    store = get_state_store(service)
+    store._versions.max_sessions = store._chunk_cache.max_sessions = 2
+    long_list = [f"Topic {i}" for i in range(CHUNK_SIZE + 1)]
+    sessions = [
+        service.create_session(app_name=APP_NAME, user_id=USER_ID, state={"known_topics": long_list})
+        for _ in range(3)
+    ]
+    assert len(store._versions) == 2
+    assert len(store._chunk_cache) == 2
+
+    # The dropped session's next write re-reads what is stored and merges
+    first = sessions[0].id
+    get_state_store(other).set_keys(APP_NAME, USER_ID, first, {"known_topics": long_list + ["Graphs"]})
+    store.set_keys(APP_NAME, USER_ID, first, {"known_topics": long_list + ["Trees"]})
+    assert store.io_counter.conflicts == 1
+    assert store.load_key(APP_NAME, USER_ID, first, "known_topics") == long_list + ["Graphs", "Trees"]
@@ -0,0 +1,88 @@
+from collections import OrderedDict
+from types import SimpleNamespace
+import pytest
+from manager_agent import topic_registry
+from manager_agent.state_schema import new_session_state
+from manager_agent.topic_registry import TopicRegistry, get_registry
+from manager_agent.sub_agents.dependency_agent.agent import add_prerequisite, can_learn, learned, list_known
+from manager_agent.sub_agents.academic_planning_agent.agent import add_task
+
+SHORT_NAMES = ["BFS", "REST", "CNN", "CSS", "CPU", "Sets"]
+
+
+@pytest.mark.parametrize("name", ["DFS", "Rust", "RNN", "CSV", "GPU", "Gets"])
+def test_short_names_one_edit_apart_stay_distinct(name):
+    registry = TopicRegistry(SHORT_NAMES)
+    assert registry.lookup(name) is None
+    assert registry.similar(name) == []
+    assert registry.resolve(name) == name
+
+
+def test_names_resolve_by_case_plural_and_alias():
+    registry = TopicRegistry(["Graphs", "Dynamic Programming"])
+    registry.add_alias("graph theory", "Graphs")
+    assert registry.lookup("  graphs ") == "Graphs"
+    assert registry.lookup("Graph") == "Graphs"
+    assert registry.lookup("Graph Theory") == "Graphs"
+    assert registry.lookup("dynamic programing") is None
+
+
+def test_typos_are_only_suggested():
+    registry = TopicRegistry(["Dynamic Programming", "Calculus 2"])
+    assert "Dynamic Programming" in registry.similar("Dynamic Programing")
+    assert registry.resolve("Dynamic Programing") == "Dynamic Programing"
+    assert registry.lookup("Calculus 3") is None
+
+
+def tool_context(*known):
+    state = new_session_state("Test")
+    state["known_topics"] = list(known)
+    return SimpleNamespace(state=state)
+
+
+def test_write_tools_add_new_topics_and_suggest_similar():
+    context = tool_context("BFS", "Dynamic Programming")
+    result = learned("DFS", context)
+    assert result["message"] == "Marked 'DFS' as learned."
+    assert "similar_topics" not in result
+    assert sorted(context.state["known_topics"]) == ["BFS", "DFS", "Dynamic Programming"]
+
+    result = add_prerequisite("Dynamic Programing", "Recursion", context)
+    assert result["similar_topics"] == ["Dynamic Programming"]
+    assert context.state["prereq_map"] == {"Dynamic Programing": ["Recursion"]}
+
+    result = add_task("Revise", "01-01-2030", context, topic="dynamic programming")
+    assert "similar_topics" not in result
+    assert context.state["learning_tasks"]["revise"]["topic"] == "Dynamic Programming"
+
+
+def test_other_processes_see_new_topics(monkeypatch):
+    context = tool_context("Graphs")
+    add_prerequisite("Graphs", "Sets", context)
+    first = topic_registry._registries
+    # A second process caches the registry for the same stamp
+    second = OrderedDict()
+    monkeypatch.setattr(topic_registry, "_registries", second)
+    assert get_registry(context.state).lookup("Trees") is None
+
+    monkeypatch.setattr(topic_registry, "_registries", first)
+    learned("Trees", context)
+
+    monkeypatch.setattr(topic_registry, "_registries", second)
+    assert get_registry(context.state).lookup("tree") == "Trees"
+    learned("trees", context)
+    assert sorted(context.state["known_topics"]) == ["Graphs", "Trees"]
+
+
+@pytest.mark.parametrize("stamped", [False, True])
+def test_read_only_tools_leave_the_stamp_alone(monkeypatch, stamped):
+    context = tool_context("Graphs")
+    if stamped:
+        add_prerequisite("Graphs", "Sets", context)
+    stamp = context.state.get("topic_index")
+    # A process that hasn't built this registry yet
+    monkeypatch.setattr(topic_registry, "_registries", OrderedDict())
+    can_learn("Graphs", context)
+    can_learn("Grahps", context)
+    list_known(context)
+    assert context.state.get("topic_index") == stamp
@@ -0,0 +1,245 @@
+"""
+Per-turn latency tracing.
+
+Spans cover the whole turn, each runner event, model calls, tool calls,
+session-store reads/writes and terminal rendering. Each finished turn appends
+its spans to a JSONL trace file, and span durations are aggregated into a
+Prometheus text-format histogram file.
+
+Off by default; set LEARNING_MAS_TRACE=1 to enable it. The files default to
+./traces.jsonl and ./metrics.prom (LEARNING_MAS_TRACE_FILE and
+LEARNING_MAS_METRICS_FILE). When disabled, span() returns a shared no-op
+context manager and nothing is instrumented.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import time
+import uuid
+
+# Histogram bucket bounds, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# The metrics file is rewritten at most this often (and on close)
+METRICS_INTERVAL = 5.0
+
+NOOP_SPAN = contextlib.nullcontext()
+
+# Spans of the turn running in the current task
+_current_turn = contextvars.ContextVar("current_turn", default=None)
+
+
+class TurnTrace:
+    def __init__(self, label: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.spans = []
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += seconds
+
+
+class Tracer:
+    """
+    Collects spans per turn; see the module docstring.
+    """
+
+    def __init__(self, enabled: bool = False, trace_path: str = "./traces.jsonl", metrics_path: str = "./metrics.prom"):
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self.histograms = {}
+        self._pending = {}
+        self._metrics_written = 0.0
+
+    # --- Recording ---
+
+    def record(self, name: str, seconds: float, target: str = "", **attrs):
+        if not self.enabled:
+            return
+        self.histograms.setdefault((name, target), Histogram()).observe(seconds)
+        turn = _current_turn.get()
+        if turn is not None:
+            turn.spans.append({"name": name, "target": target, "ms": round(seconds * 1000, 3), **attrs})
+
+    @contextlib.contextmanager
+    def _span(self, name, target, attrs):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, target, **attrs)
+
+    def span(self, name: str, target: str = "", **attrs):
+        """
+        Context manager timing a block as one span.
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        return self._span(name, target, attrs)
+
+    def start(self, key):
+        if self.enabled:
+            self._pending[key] = time.perf_counter()
+
+    def finish(self, key, name: str, target: str = "", **attrs):
+        start = self._pending.pop(key, None)
+        if start is not None:
+            self.record(name, time.perf_counter() - start, target, **attrs)
+
+    @contextlib.contextmanager
+    def turn(self, label: str = ""):
+        """
+        Groups the spans recorded inside it into one trace line. Nested
+        turns belong to the outer one.
+        """
+        if not self.enabled or _current_turn.get() is not None:
+            yield
+            return
+        trace = TurnTrace(label)
+        token = _current_turn.set(trace)
+        start, wall = time.perf_counter(), time.time()
+        try:
+            yield
+        finally:
+            _current_turn.reset(token)
+            elapsed = time.perf_counter() - start
+            self.histograms.setdefault(("turn", ""), Histogram()).observe(elapsed)
+            self._write_trace(trace, wall, elapsed)
+            if time.monotonic() - self._metrics_written >= METRICS_INTERVAL:
+                self.write_metrics()
+
+    # --- Export ---
+
+    def _write_trace(self, trace: TurnTrace, wall: float, elapsed: float):
+        line = {
+            "turn": trace.id,
+            "label": trace.label,
+            "start": wall,
+            "ms": round(elapsed * 1000, 3),
+            "spans": trace.spans,
+        }
+        try:
+            with open(self.trace_path, "a") as f:
+                f.write(json.dumps(line, default=str) + "\n")
+        except OSError as e:
+            print(f"❌ Error writing trace: {e}")
+
+    def write_metrics(self):
+        lines = [
+            "# HELP learning_mas_span_seconds Time spent per span.",
+            "# TYPE learning_mas_span_seconds histogram",
+        ]
+        for (name, target), h in sorted(self.histograms.items()):
+            labels = f'span="{name}",target="{target}"'
+            total = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), h.counts):
+                total += count
+                lines.append(f'learning_mas_span_seconds_bucket{{{labels},le="{bound}"}} {total}')
+            lines.append(f"learning_mas_span_seconds_sum{{{labels}}} {h.sum:.6f}")
+            lines.append(f"learning_mas_span_seconds_count{{{labels}}} {total}")
+        try:
+            with open(self.metrics_path, "w") as f:
+                f.write("\n".join(lines) + "\n")
+            self._metrics_written = time.monotonic()
+        except OSError as e:
+            print(f"❌ Error writing metrics: {e}")
+
+    def close(self):
+        if self.enabled:
+            self.write_metrics()
+
+    # --- Instrumentation ---
+
+    def instrument_session_service(self, session_service):
+        """
+        Wraps the session service's read and write methods in spans.
+        """
+        if not self.enabled:
+            return
+        methods = {
+            "get_session": "session.read",
+            "list_sessions": "session.read",
+            "create_session": "session.write",
+            "append_event": "session.write",
+            "delete_session": "session.write",
+            "commit_turn": "session.write",
+        }
+        for method, name in methods.items():
+            if hasattr(session_service, method):
+                setattr(session_service, method, self._wrap(getattr(session_service, method), name, method))
+
+    def _wrap(self, fn, name, target):
+        def wrapper(*args, **kwargs):
+            with self.span(name, target):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def instrument_agents(self, agent):
+        """
+        Adds model and tool timing callbacks to an agent, its sub-agents and
+        agents wrapped as tools.
+        """
+        if not self.enabled:
+            return
+        seen, stack = set(), [agent]
+        while stack:
+            a = stack.pop()
+            if id(a) in seen or not hasattr(a, "before_model_callback"):
+                continue
+            seen.add(id(a))
+            self._instrument_agent(a)
+            stack.extend(a.sub_agents)
+            stack.extend(t.agent for t in a.tools if hasattr(t, "agent"))
+
+    def _instrument_agent(self, agent):
+        def before_model(callback_context, llm_request):
+            self.start(("model", callback_context.invocation_id, callback_context.agent_name))
+
+        def after_model(callback_context, llm_response):
+            key = ("model", callback_context.invocation_id, callback_context.agent_name)
+            self.finish(key, "model", callback_context.agent_name)
+
+        # Model timing goes last before the call and first after it, so it
+        # excludes other callbacks
+        agent.before_model_callback = _as_list(agent.before_model_callback) + [before_model]
+        agent.after_model_callback = [after_model] + _as_list(agent.after_model_callback)
+
+        before_tool, after_tool = agent.before_tool_callback, agent.after_tool_callback
+
+        def traced_before_tool(tool, args, tool_context):
+            result = before_tool(tool, args, tool_context) if before_tool else None
+            if result is None:
+                self.start(("tool", tool_context.function_call_id))
+            return result
+
+        def traced_after_tool(tool, args, tool_context, tool_response):
+            self.finish(("tool", tool_context.function_call_id), "tool", tool.name, agent=tool_context.agent_name)
+            return after_tool(tool, args, tool_context, tool_response) if after_tool else None
+
+        agent.before_tool_callback = traced_before_tool
+        agent.after_tool_callback = traced_after_tool
+
+
+def _as_list(callback) -> list:
+    if not callback:
+        return []
+    return list(callback) if isinstance(callback, list) else [callback]
+
+
+tracer = Tracer(
+    enabled=os.getenv("LEARNING_MAS_TRACE", "0") == "1",
+    trace_path=os.getenv("LEARNING_MAS_TRACE_FILE", "./traces.jsonl"),
+    metrics_path=os.getenv("LEARNING_MAS_METRICS_FILE", "./metrics.prom"),
+)
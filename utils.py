@@ -1,52 +1,48 @@
+import asyncio
+import json
+import os
+import time
 from datetime import datetime
 from google.genai import types
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from colours_utils import Colours
+from context_window import SUMMARY_KEY
+from state_store import get_state_store
+from fast_router import fast_router, ROUTER_AGENT
+from tracing import tracer
+from manager_agent.state_schema import Progress, SCHEMA_VERSION, MIGRATED_KEYS, ensure_schema
+from manager_agent.topic_registry import get_registry, save_registry
 
-def update_interaction_history(session_service, app_name, user_id, session_id, entry):
+def update_interaction_history(session_service, app_name, user_id, session_id, entry, turn=None):
     try:
-        session = session_service.get_session(
-            app_name=app_name,
-            user_id=user_id,
-            session_id=session_id
-        )
-        interaction_history = session.state.get("interaction_history", []) if session.state else []
-
         if "timestamp" not in entry:
             entry["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        interaction_history.append(entry)
-        updated_state = session.state.copy() if session.state else {}
-        updated_state["interaction_history"] = interaction_history
-
-        # Delete the old session
-        session_service.delete_session(
-            app_name=app_name,
-            user_id=user_id,
-            session_id=session_id
-        )
+        # Inside a turn, the entry is committed together with the turn's other writes
+        if turn is not None:
+            turn.append("interaction_history", entry)
+            return
 
-        # Recreate session with updated state
-        session_service.create_session(
-            app_name=app_name,
-            user_id=user_id,
-            session_id=session_id,
-            state=updated_state,
+        # Append as a single row instead of rewriting the whole session
+        get_state_store(session_service).append(
+            app_name, user_id, session_id, "interaction_history", entry
         )
     except Exception as e:
         print(f"Error updating interaction history: {e}")
 
 
-def add_user_query_to_history(session_service, app_name, user_id, session_id, query):
+def add_user_query_to_history(session_service, app_name, user_id, session_id, query, turn=None):
     update_interaction_history(
         session_service,
         app_name,
         user_id,
         session_id,
         {"action": "user_query", "query": query},
+        turn=turn,
     )
 
 
-def add_agent_response_to_history(session_service, app_name, user_id, session_id, agent_name, response):
+def add_agent_response_to_history(session_service, app_name, user_id, session_id, agent_name, response, turn=None):
     update_interaction_history(
         session_service,
         app_name,
@@ -57,170 +53,430 @@ def add_agent_response_to_history(session_service, app_name, user_id, session_id
             "agent": agent_name,
             "response": response,
         },
+        turn=turn,
     )
 
+def migrate_session_state(session_service, app_name, user_id, session_id):
+    """
+    Upgrades a stored session to the current state schema, once.
+    """
+    try:
+        session = session_service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        if session.state.get("schema_version") == SCHEMA_VERSION:
+            return
+        state = {key: session.state.get(key) for key in MIGRATED_KEYS if key in session.state}
+        ensure_schema(state)
+        get_state_store(session_service).set_keys(app_name, user_id, session_id, state)
+        print(f"🔄 Migrated session state to schema version {SCHEMA_VERSION}")
+    except Exception as e:
+        print(f"❌ Error migrating session state: {e}")
+
+
 def update_study_progress(session_service, app_name, user_id, session_id, topic: str, percent: int):
     try:
         session = session_service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
-        progress = session.state.get("study_progress", [])
-            
-        # Check if topic already exists
-        topic_entry = next((t for t in progress if t["topic"] == topic), None)
-        if topic_entry:
-            topic_entry["percent"] = percent
-            topic_entry["completed"] = percent >= 100
-        else:
-            topic_entry = {
-                "topic": topic,
-                "percent": percent,
-                "completed": percent >= 100
-            }
-            progress.append(topic_entry)
+        ensure_schema(session.state)
+        stamp = session.state.get("topic_index")
+        registry = get_registry(session.state)
+        topic = registry.resolve(topic)
+        save_registry(session.state, registry)
+        progress = session.state.get("study_progress", {})
+
+        topic_entry = Progress.load(progress[topic]) if topic in progress else Progress(topic, 0, False)
+        topic_entry.percent = percent
+        topic_entry.completed = percent >= 100
+        progress[topic] = topic_entry.dump()
 
-        updated_state = session.state.copy()
-        updated_state["study_progress"] = progress
+        updated = {"study_progress": progress}
+        if session.state["topic_index"] != stamp:
+            # The registry gained the topic; other processes must rebuild it
+            updated["topic_index"] = session.state["topic_index"]
 
         # Update known topics if this topic is completed
-        if topic_entry["completed"] and topic not in session.state.get("known_topics", []):
+        if topic_entry.completed and topic not in session.state.get("known_topics", []):
             known = session.state.get("known_topics", [])
             known.append(topic)
-            updated_state["known_topics"] = known
+            updated["known_topics"] = known
             print(f"🎓 Added '{topic}' to known topics as it's now 100% complete.")
 
-        session_service.delete_session(
-            app_name=app_name, 
-            user_id=user_id, 
-            session_id=session_id
-        )
-        # Recreate session with updated state
-        session_service.create_session(
-            app_name=app_name,
-            user_id=user_id,
-            session_id=session_id,
-            state=updated_state
-        )
+        # Patch only the changed keys in one transaction
+        get_state_store(session_service).set_keys(app_name, user_id, session_id, updated)
         print(f"✅ Updated study progress for '{topic}' to {percent}%")
     except Exception as e:
         print(f"❌ Error updating study progress: {e}")
 
 
-def display_state(session_service, app_name, user_id, session_id, label="Current State"):
-    try:
-        session = session_service.get_session(
-            app_name=app_name,
-            user_id=user_id,
-            session_id=session_id
-        )
+# Items of a collection shown when rendering state
+STATE_ITEMS = int(os.getenv("LEARNING_MAS_STATE_ITEMS", "10"))
+
+# Bookkeeping keys (indexes rebuilt from other keys, and the conversation
+# summary sent to the model); never shown
+HIDDEN_KEYS = ("prereq_index", "topic_index", "review_due_heap", SUMMARY_KEY)
+
+
+def _clip(value, limit=80) -> str:
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def _item_key(item):
+    # Lists of dicts (e.g. history entries) are compared by their JSON
+    return item if isinstance(item, (str, int, float)) else json.dumps(item, sort_keys=True, default=str)
+
+
+def _progress_line(mark, item) -> str:
+    percent = item.get("percent", 0)
+    status = "✅" if item.get("completed") else "🟡"
+    color = Colours.GREEN if percent >= 70 else Colours.YELLOW if percent >= 30 else Colours.RED
+    return f"  {mark} {status} {item.get('topic', 'Unknown')}: {color}{percent}%{Colours.RESET}"
+
+
+class StateView:
+    """
+    Renders a session's state in the terminal.
+
+    show() prints every key, with collections cut to `limit` items.
+    show_changes() prints only what a turn changed since the last render,
+    with counts of added, changed and removed entries. Both keep the last
+    rendered state in memory; after a turn it is updated from the values the
+    turn committed, so the database is only read for the first render.
+    """
+
+    def __init__(self, limit: int = STATE_ITEMS):
+        self.limit = limit
+        self.snapshot = None
+
+    def _load(self, session_service, app_name, user_id, session_id):
+        session = session_service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        self.snapshot = dict(session.state.items())
+
+    def show(self, session_service, app_name, user_id, session_id, label="Current State"):
+        if self.snapshot is None:
+            self._load(session_service, app_name, user_id, session_id)
         print(f"\n{'-' * 10} {label} {'-' * 10}")
-        user_name = session.state.get("user_name", "Unknown")
-        print(f"👤 User: {user_name}")
+        print(f"👤 User: {self.snapshot.get('user_name', 'Unknown')}")
+        for key, value in self.snapshot.items():
+            if key in HIDDEN_KEYS or key in ("user_name", "interaction_history"):
+                continue
+            self._print_value(key, value)
+        self._print_history(self.snapshot.get("interaction_history", []), [])
+        print("-" * (22 + len(label)))
+
+    def update(self, turn):
+        """
+        Applies the values a turn committed to the rendered state, without
+        printing anything.
+        """
+        if self.snapshot is not None and turn is not None:
+            self.snapshot.update(turn.written)
+
+    def show_changes(self, session_service, app_name, user_id, session_id, turn=None, label="State Changes"):
+        """
+        Prints the keys `turn` changed. Without a rendered state to compare
+        against (or a turn), prints the whole state instead.
+        """
+        if self.snapshot is None or turn is None:
+            self.snapshot = None
+            return self.show(session_service, app_name, user_id, session_id)
 
-        for key, value in session.state.items():
+        changed = {
+            key: value for key, value in turn.written.items()
+            if key not in HIDDEN_KEYS and self.snapshot.get(key) != value
+        }
+        if not changed:
+            print(f"{label}: none")
+            return
+        print(f"\n{'-' * 10} {label} {'-' * 10}")
+        for key, value in changed.items():
+            old = self.snapshot.get(key)
             if key == "interaction_history":
-                continue
-            elif key == "study_progress":
-                print("📊 Study Progress:")
-                if value:
-                    for item in value:
-                        topic = item.get("topic", "Unknown")
-                        percent = item.get("percent", "?")
-                        status = "✅" if item.get("completed") else "🟡"
-                        color = Colours.GREEN if percent >= 70 else Colours.YELLOW if percent >= 30 else Colours.RED
-                        print(f"  - {status} {topic}: {color}{percent}%{Colours.RESET}")
-                else:
-                    print("  (no progress tracked yet)")
+                self._print_history(value, old or [])
             else:
-                print(f"🔑 {key}: {value}")
-
-        interactions = session.state.get("interaction_history", [])
-        if interactions:
-            print("📝 Interaction History:")
-            for i, event in enumerate(interactions[-5:], 1):
-                action = event.get("action", "?")
-                ts = event.get("timestamp", "?")
-                details = event.get("query") or event.get("response") or str(event)
-                print(f"  {i}. [{ts}] {action}: {details[:80]}")
+                self._print_diff(key, old, value)
+            self.snapshot[key] = value
+        print("-" * (22 + len(label)))
+
+    def _print_value(self, key, value):
+        if key == "study_progress":
+            print("📊 Study Progress:")
+            if not value:
+                print("  (no progress tracked yet)")
+            for item in list(value.values())[:self.limit]:
+                print(_progress_line("-", item))
+            self._print_more(len(value))
+        elif isinstance(value, dict):
+            print(f"🔑 {key} ({len(value)} entries)")
+            for k, v in list(value.items())[:self.limit]:
+                print(f"  - {k}: {_clip(v)}")
+            self._print_more(len(value))
+        elif isinstance(value, list):
+            items = ", ".join(_clip(v, 40) for v in value[:self.limit])
+            more = f" … +{len(value) - self.limit} more" if len(value) > self.limit else ""
+            print(f"🔑 {key} ({len(value)} items): {items}{more}")
         else:
-            print("📝 Interaction History: None")
+            print(f"🔑 {key}: {_clip(value)}")
 
-        print("-" * (22 + len(label)))
+    def _print_diff(self, key, old, new):
+        if isinstance(old, dict) and isinstance(new, dict):
+            added = [k for k in new if k not in old]
+            updated = [k for k in new if k in old and old[k] != new[k]]
+            removed = [k for k in old if k not in new]
+            print(f"🔑 {key}: +{len(added)} ~{len(updated)} -{len(removed)} ({len(new)} entries)")
+            lines = [("+", k) for k in added] + [("~", k) for k in updated]
+            for mark, k in lines[:self.limit]:
+                if key == "study_progress":
+                    print(_progress_line(mark, new[k]))
+                else:
+                    print(f"  {mark} {k}: {_clip(new[k])}")
+            for k in removed[:max(0, self.limit - len(lines))]:
+                print(f"  - {k}")
+            self._print_more(len(lines) + len(removed))
+        elif isinstance(old, list) and isinstance(new, list):
+            before, after = {_item_key(v) for v in old}, {_item_key(v) for v in new}
+            added = [v for v in new if _item_key(v) not in before]
+            removed = [v for v in old if _item_key(v) not in after]
+            print(f"🔑 {key}: +{len(added)} -{len(removed)} ({len(new)} items)")
+            marked = [("+", v) for v in added] + [("-", v) for v in removed]
+            for mark, v in marked[:self.limit]:
+                print(f"  {mark} {_clip(v)}")
+            self._print_more(len(marked))
+        elif old is None:
+            self._print_value(key, new)
+        else:
+            print(f"🔑 {key}: {_clip(old, 40)} → {_clip(new, 40)}")
+
+    def _print_more(self, count):
+        if count > self.limit:
+            print(f"  … {count - self.limit} more")
+
+    def _print_history(self, tail, old_tail):
+        # Session state only holds the newest entries; the full log is in state_log
+        seen = {_item_key(e) for e in old_tail}
+        entries = [e for e in tail if _item_key(e) not in seen][-5:]
+        if not entries:
+            if not old_tail:
+                print("📝 Interaction History: None")
+            return
+        print("📝 Interaction History:" if not old_tail else "📝 New Interactions:")
+        for i, event in enumerate(entries, 1):
+            action = event.get("action", "?")
+            ts = event.get("timestamp", "?")
+            details = event.get("query") or event.get("response") or str(event)
+            print(f"  {i}. [{ts}] {action}: {details[:80]}")
+
+
+state_view = StateView()
+
+
+def display_state(session_service, app_name, user_id, session_id, label="Current State"):
+    try:
+        state_view.show(session_service, app_name, user_id, session_id, label)
     except Exception as e:
         print(f"Error displaying state: {e}")
 
 
-async def process_agent_response(event):
+def display_state_changes(session_service, app_name, user_id, session_id, turn=None):
+    try:
+        state_view.show_changes(session_service, app_name, user_id, session_id, turn)
+    except Exception as e:
+        print(f"Error displaying state: {e}")
+
+
+def print_agent_response(text):
+    print(f"\n{Colours.BG_BLUE}{Colours.WHITE}{Colours.BOLD}╔══ AGENT RESPONSE ════════════════════{Colours.RESET}")
+    print(f"{Colours.CYAN}{Colours.BOLD}{text}{Colours.RESET}")
+    print(f"{Colours.BG_BLUE}{Colours.WHITE}{Colours.BOLD}╚══════════════════════════════════════{Colours.RESET}\n")
+
+
+class ResponseStream:
+    """
+    Prints a streamed response's partial chunks as they arrive.
+    """
+
+    def __init__(self):
+        self.open = False
+
+    def chunk(self, text):
+        if not self.open:
+            print(f"\n{Colours.BG_BLUE}{Colours.WHITE}{Colours.BOLD}╔══ AGENT RESPONSE ════════════════════{Colours.RESET}")
+            self.open = True
+        print(f"{Colours.CYAN}{Colours.BOLD}{text}{Colours.RESET}", end="", flush=True)
+
+    def close(self) -> bool:
+        # Returns whether a streamed response was shown
+        if not self.open:
+            return False
+        print(f"\n{Colours.BG_BLUE}{Colours.WHITE}{Colours.BOLD}╚══════════════════════════════════════{Colours.RESET}\n")
+        self.open = False
+        return True
+
+
+async def process_agent_response(event, stream=None):
+    if event.partial:
+        if stream is not None and event.content and event.content.parts:
+            for part in event.content.parts:
+                if part.text:
+                    stream.chunk(part.text)
+        return None
+
+    # The complete event repeats the streamed text; don't print it again
+    streamed = stream is not None and stream.close()
     print(f"Event ID: {event.id}, Author: {event.author}")
 
     final_response = None
-    if event.content and event.content.parts:
+    if event.content and event.content.parts and not streamed:
         for part in event.content.parts:
             if hasattr(part, "text") and part.text and not part.text.isspace():
                 print(f"  Text: '{part.text.strip()}'")
 
     if event.is_final_response():
-        if (
-            event.content
-            and event.content.parts
-            and hasattr(event.content.parts[0], "text")
-            and event.content.parts[0].text
-        ):
-            final_response = event.content.parts[0].text.strip()
-            print(f"\n{Colours.BG_BLUE}{Colours.WHITE}{Colours.BOLD}╔══ AGENT RESPONSE ════════════════════{Colours.RESET}")
-            print(f"{Colours.CYAN}{Colours.BOLD}{final_response}{Colours.RESET}")
-            print(f"{Colours.BG_BLUE}{Colours.WHITE}{Colours.BOLD}╚══════════════════════════════════════{Colours.RESET}\n")
-        else:
+        final_response = final_response_text(event)
+        if final_response is None:
             print(f"\n{Colours.BG_RED}{Colours.WHITE}Final Agent Response: No text found.{Colours.RESET}\n")
+        elif not streamed:
+            print_agent_response(final_response)
 
     return final_response
 
 
-async def call_agent_async(runner, user_id, session_id, query):
+def final_response_text(event):
+    if (
+        event.is_final_response()
+        and event.content
+        and event.content.parts
+        and hasattr(event.content.parts[0], "text")
+        and event.content.parts[0].text
+    ):
+        return event.content.parts[0].text.strip()
+    return None
+
+
+class TurnOutput:
+    """
+    Where a turn's output goes. This one prints to the terminal; the server
+    swaps in a quiet one that sends replies to the client instead.
+    """
+
+    def __init__(self, stream=False):
+        self.stream = ResponseStream() if stream else None
+
+    def query(self, query):
+        print(f"\n{Colours.BG_GREEN}{Colours.BLACK}{Colours.BOLD}--- Running Query: {query} ---{Colours.RESET}")
+
+    async def event(self, event):
+        # Returns the final response text, if this event carries it
+        return await process_agent_response(event, self.stream)
+
+    def reply(self, text):
+        print_agent_response(text)
+
+    def error(self, message):
+        print(f"{Colours.BG_RED}{Colours.WHITE}{message}{Colours.RESET}")
+
+
+async def call_agent_async(runner, user_id, session_id, query, router=fast_router, stream=False, output=None):
+    """
+    Runs one user turn. With stream=True the model is called in SSE mode and
+    partial text is printed as it arrives (or passed to `output`).
+
+    The runner's session service must be a ShardedSessionService: the turn's
+    writes are buffered with its begin_turn/commit_turn.
+    """
+    # Fails here, with a clear error, for any other session service
+    get_state_store(runner.session_service)
+    with tracer.turn(query):
+        return await _run_turn(runner, user_id, session_id, query, router, stream, output or TurnOutput(stream))
+
+
+async def _run_turn(runner, user_id, session_id, query, router, stream, output):
     content = types.Content(role="user", parts=[types.Part(text=query)])
-    print(f"\n{Colours.BG_GREEN}{Colours.BLACK}{Colours.BOLD}--- Running Query: {query} ---{Colours.RESET}")
+    output.query(query)
+
+    # Buffer every state write of this turn and commit them once at the end
+    turn = runner.session_service.begin_turn(runner.app_name, user_id, session_id)
 
     add_user_query_to_history(
     runner.session_service,
     runner.app_name,
     user_id,
     session_id,
-    query
+    query,
+    turn=turn,
     )
 
-    final_response_text = None
-    agent_name = None
-
+    # The turn is committed however it ends
     try:
-        async for event in runner.run_async(
-            user_id=user_id, session_id=session_id, new_message=content
-        ):
-            if event.author:
-                agent_name = event.author
-            response = await process_agent_response(event)
-            if response:
-                final_response_text = response
-    except Exception as e:
-        error_msg = f"ERROR during agent run: {e}"
-        print(f"{Colours.BG_RED}{Colours.WHITE}{error_msg}{Colours.RESET}")
-
-        # ✅ Log the error to history so the user sees it later
-        add_agent_response_to_history(
-            runner.session_service,
-            runner.app_name,
-            user_id,
-            session_id,
-            "manager_agent",
-            f"[Error] {str(e)}"
-        )
-        return None
+        # Structured requests are answered straight from state when the router is on
+        try:
+            with tracer.span("router"):
+                reply = router.handle(runner.session_service, runner.app_name, user_id, session_id, query, turn)
+        except Exception as e:
+            # A failing tool leaves the query to the agents
+            tracer.record("router_error", 0.0, type(e).__name__, error=str(e))
+            reply = None
+        if reply is not None:
+            output.reply(reply)
+            add_agent_response_to_history(
+                runner.session_service,
+                runner.app_name,
+                user_id,
+                session_id,
+                ROUTER_AGENT,
+                reply,
+                turn=turn,
+            )
+            return reply
 
-    if final_response_text and agent_name:
-        add_agent_response_to_history(
-            runner.session_service,
-            runner.app_name,
-            user_id,
-            session_id,
-            agent_name,
-            final_response_text,
-        )
+        final_response_text = None
+        agent_name = None
+        started = time.perf_counter()
+
+        try:
+            run_config = RunConfig(streaming_mode=StreamingMode.SSE if stream else StreamingMode.NONE)
+            waited = time.perf_counter()
+            async for event in runner.run_async(
+                user_id=user_id, session_id=session_id, new_message=content, run_config=run_config
+            ):
+                # Time from the previous event until this one was produced
+                tracer.record(
+                    "event", time.perf_counter() - waited, event.author or "",
+                    final=event.is_final_response(), partial=bool(event.partial),
+                )
+                if event.author:
+                    agent_name = event.author
+                with tracer.span("render", "process_agent_response"):
+                    response = await output.event(event)
+                if response:
+                    final_response_text = response
+                waited = time.perf_counter()
+        except Exception as e:
+            output.error(f"ERROR during agent run: {e}")
+
+            # ✅ Log the error to history so the user sees it later
+            add_agent_response_to_history(
+                runner.session_service,
+                runner.app_name,
+                user_id,
+                session_id,
+                "manager_agent",
+                f"[Error] {str(e)}",
+                turn=turn,
+            )
+            return None
+
+        router.record_llm_turn(time.perf_counter() - started)
+
+        if final_response_text and agent_name:
+            add_agent_response_to_history(
+                runner.session_service,
+                runner.app_name,
+                user_id,
+                session_id,
+                agent_name,
+                final_response_text,
+                turn=turn,
+            )
 
-    return final_response_text
\ No newline at end of file
+        return final_response_text
+    finally:
+        await asyncio.to_thread(runner.session_service.commit_turn, turn)